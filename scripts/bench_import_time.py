@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+# ==========================================
+# ⏱️ IMPORT-TIME BENCHMARK
+# ==========================================
+# Imports each entry point in a fresh interpreter under `python -X importtime`
+# and fails when one of them eagerly pulls in a heavy dependency or blows the
+# time budget. Run it after touching imports:
+#   python scripts/bench_import_time.py [--budget-ms 150] [--json]
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must only be imported by the code paths that use them
+HEAVY_MODULES = ("pymongo", "bson", "openai", "bs4", "PyPDF2", "requests", "dotenv", "numpy", "pyarrow", "tiktoken",
+                 "sentence_transformers", "torch")
+
+ENTRY_POINTS = (
+    "railnology_ingest.cli",
+    "rail_data_scraper",
+    "ingest_rail_content",
+    "scrape_jobs",
+    "test_search",
+    "eval_search",
+    "search_server",
+    "load_test_search",
+)
+
+DEFAULT_BUDGET_MS = 150
+DEFAULT_REPEAT = 5
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module, repeat=DEFAULT_REPEAT):
+    """Returns (best total ms, imported module names) over `repeat` fresh interpreters."""
+    best_ms = None
+    imported = set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SCRIPTS_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+        total_us = 0
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+            imported.add(name)
+            # Interpreter startup (site, encodings) is excluded: only count what
+            # the entry point itself pulled in, parent packages included
+            if len(indent) == 1 and (name == module or module.startswith(name + ".")):
+                total_us += cumulative_us
+
+        total_ms = total_us / 1000.0
+        best_ms = total_ms if best_ms is None else min(best_ms, total_ms)
+    return best_ms, imported
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time regression check for the Railnology scripts.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Max import time per entry point (default {DEFAULT_BUDGET_MS}ms).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Fresh interpreters per entry point; the best run counts (default {DEFAULT_REPEAT}).")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Entry points to check.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.modules:
+        try:
+            total_ms, imported = measure(module, args.repeat)
+        except RuntimeError as e:
+            results.append({'module': module, 'ms': None, 'heavy': [], 'ok': False, 'error': str(e)})
+            continue
+        heavy = sorted(name for name in imported if name.split(".")[0] in HEAVY_MODULES and "." not in name)
+        results.append({'module': module, 'ms': total_ms, 'heavy': heavy,
+                        'ok': not heavy and total_ms <= args.budget_ms, 'error': None})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"--- ⏱️ Import time (best of {args.repeat}, budget {args.budget_ms:.0f}ms) ---")
+        for result in results:
+            status = "✅" if result['ok'] else "❌"
+            if result['error']:
+                print(f"   {status} {result['module']:<24} {result['error']}")
+                continue
+            eager = f"  eager: {', '.join(result['heavy'])}" if result['heavy'] else ""
+            print(f"   {status} {result['module']:<24} {result['ms']:>8.1f}ms{eager}")
+
+    return 0 if all(result['ok'] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import sys
+import json
+import time
+import argparse
+
+from railnology_ingest.config import RERANK_CANDIDATES, SEARCH_GOLDEN_SET
+from railnology_ingest.swap import resolve_active_collection_name, collection_model
+import test_search
+
+# ==========================================
+# 🎯 SEARCH QUALITY CHECK (GOLDEN SET)
+# ==========================================
+# Runs every labelled query in search_golden.json against the live index and
+# compares top-3 precision of the raw vector search with the reranked result,
+# plus the latency the reranker adds:
+#   python scripts/eval_search.py [--candidates 50] [--json]
+# Each golden entry lists "relevant" specs; a hit counts when it matches every
+# field of one spec ("section": "213.9" matches any chunk of § 213.9).
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[int(share * (len(ordered) - 1))] if ordered else 0.0
+
+def evaluate(collection, embed_query, golden, candidates):
+    from railnology_ingest.search.rerank import rerank, precision_at_k
+
+    rows = []
+    for case in golden:
+        query_vector = embed_query(case['query'])
+        hits = test_search.vector_search(collection, query_vector, limit=candidates,
+                                         num_candidates=max(100, candidates * 4), query=case['query'])
+        started = time.perf_counter()
+        reranked = rerank(case['query'], hits, top_k=3)
+        rerank_ms = (time.perf_counter() - started) * 1000
+
+        rows.append({
+            'query': case['query'],
+            'raw_p3': precision_at_k(hits[:3], case['relevant']),
+            'reranked_p3': precision_at_k(reranked, case['relevant']),
+            'rerank_ms': rerank_ms,
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top-3 precision of raw vs reranked search on the golden set.")
+    parser.add_argument("--golden", default=SEARCH_GOLDEN_SET, help="Golden set JSON (default: scripts/search_golden.json).")
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES,
+                        help=f"Vector search candidates handed to the reranker (default {RERANK_CANDIDATES}).")
+    parser.add_argument("--json", action="store_true", help="Print per-query results as JSON.")
+    args = parser.parse_args(argv)
+
+    from pymongo import MongoClient
+    from railnology_ingest.layout import chunk_collection
+
+    test_search.load_environment()
+    test_search.check_environment(openai=False)
+    with open(args.golden, 'r', encoding='utf-8') as file:
+        golden = json.load(file)
+
+    db = MongoClient(test_search.MONGO_URI)[test_search.DB_NAME]
+    collection = chunk_collection(db, resolve_active_collection_name(db))
+    recorded = collection_model(db, collection.name) or {}
+    embed_query = test_search.get_query_embedder(recorded.get('model'), recorded.get('dimensions'))
+    rows = evaluate(collection, embed_query, golden, args.candidates)
+
+    summary = {
+        'queries': len(rows),
+        'raw_p3': sum(r['raw_p3'] for r in rows) / len(rows),
+        'reranked_p3': sum(r['reranked_p3'] for r in rows) / len(rows),
+        'rerank_ms_avg': sum(r['rerank_ms'] for r in rows) / len(rows),
+        'rerank_ms_p95': percentile([r['rerank_ms'] for r in rows], 0.95),
+    }
+    if args.json:
+        print(json.dumps({'summary': summary, 'queries': rows}, indent=2))
+        return 0
+
+    print(f"\n--- 🎯 Golden set: {len(rows)} queries, {args.candidates} candidates ---")
+    for row in rows:
+        print(f"   P@3 {row['raw_p3']:.2f} → {row['reranked_p3']:.2f}  ({row['rerank_ms']:.1f}ms)  {row['query']}")
+    print(f"\n   Mean P@3: raw {summary['raw_p3']:.3f}, reranked {summary['reranked_p3']:.3f}")
+    print(f"   Rerank latency: avg {summary['rerank_ms_avg']:.1f}ms, p95 {summary['rerank_ms_p95']:.1f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
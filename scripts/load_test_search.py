@@ -0,0 +1,133 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+
+from railnology_ingest.config import SEARCH_GOLDEN_SET, SWAP_SAMPLE_QUERIES, SEARCH_SERVER_HOST, SEARCH_SERVER_PORT
+
+# ==========================================
+# 🔥 SEARCH SERVER LOAD TEST
+# ==========================================
+# Fires concurrent /search requests at search_server.py from N keep-alive
+# client threads and reports throughput and tail latency:
+#   python scripts/load_test_search.py [--concurrency 32] [--requests 2000] [--json]
+# Queries come from the golden set (plus the swap sample queries); --vectors
+# sends random query vectors instead, measuring scoring without embedding.
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[int(share * (len(ordered) - 1))] if ordered else 0.0
+
+def load_queries(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            queries = [case['query'] for case in json.load(file)]
+    except (OSError, ValueError):
+        queries = []
+    return queries + list(SWAP_SAMPLE_QUERIES)
+
+def random_vector(rng, dimensions):
+    return [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+
+def run_client(url, payloads, latencies, errors, lock):
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    for payload in payloads:
+        started = time.perf_counter()
+        try:
+            connection.request("POST", "/search", body=payload, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            ok = False
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+    connection.close()
+
+def run_load_test(url, concurrency, requests, payload_factory):
+    payloads = [payload_factory(i) for i in range(requests)]
+    latencies, errors, lock = [], [], threading.Lock()
+    threads = [
+        threading.Thread(target=run_client, args=(url, payloads[i::concurrency], latencies, errors, lock))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'duration_seconds': duration,
+        'qps': len(latencies) / duration if duration else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test search_server.py: QPS and p50/p95/p99 latency.")
+    parser.add_argument("--url", default=f"http://{SEARCH_SERVER_HOST}:{SEARCH_SERVER_PORT}",
+                        help="Search server base URL.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections (default 32).")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests (default 2000).")
+    parser.add_argument("--top-k", type=int, default=3, help="Results per request (default 3).")
+    parser.add_argument("--vectors", action="store_true",
+                        help="Send random query vectors (no embedding or reranking) to measure scoring alone.")
+    parser.add_argument("--golden", default=SEARCH_GOLDEN_SET, help="Query source (default: scripts/search_golden.json).")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+    args = parser.parse_args(argv)
+
+    url = urlparse(args.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    try:
+        connection.request("GET", "/health")
+        health = json.loads(connection.getresponse().read())
+    except (OSError, ValueError) as e:
+        print(f"❌ Search server not reachable at {args.url}: {e}")
+        return 1
+    finally:
+        connection.close()
+
+    if args.vectors:
+        # Only the dimensions matter; the server normalizes query vectors
+        rng = random.Random(7)
+        dimensions = health.get('dimensions') or 1536
+        vectors = [random_vector(rng, dimensions) for _ in range(64)]
+        payload_factory = lambda i: json.dumps({'vector': vectors[i % len(vectors)], 'top_k': args.top_k})
+    else:
+        queries = load_queries(args.golden)
+        payload_factory = lambda i: json.dumps({'query': queries[i % len(queries)], 'top_k': args.top_k})
+
+    if not args.json:
+        print(f"--- 🔥 {args.requests} requests, {args.concurrency} connections against {args.url} "
+              f"({health.get('index')}, {health.get('rows')} chunks) ---")
+    result = run_load_test(url, args.concurrency, args.requests, payload_factory)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        errors = f" ({result['errors']} errors)" if result['errors'] else ""
+        print(f"   Throughput: {result['qps']:.1f} QPS over {result['duration_seconds']:.1f}s{errors}")
+        print(f"   Latency: p50 {result['p50_ms']:.1f}ms, p95 {result['p95_ms']:.1f}ms, "
+              f"p99 {result['p99_ms']:.1f}ms, max {result['max_ms']:.1f}ms")
+    return 1 if result['errors'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
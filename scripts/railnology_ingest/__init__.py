@@ -0,0 +1,12 @@
+"""
+Shared ingestion core for the Railnology knowledge corpus.
+
+Every ingestion path is a Pipeline of pluggable stages:
+    Source (sources.py) → Parser (parsers.py) → Chunker (chunking.py)
+    → Embedder (embedding.py) → Sink (sinks.py)
+
+Run it with ``python -m railnology_ingest ingest`` (see cli.py).
+"""
+
+# Submodules are imported explicitly (e.g. ``from railnology_ingest.metrics import run_metrics``)
+# so lightweight consumers such as scrape_jobs.py don't pull in pymongo/openai/PyPDF2.
@@ -0,0 +1,207 @@
+import re
+import difflib
+import hashlib
+from datetime import datetime, timezone
+
+from .config import REGULATION_SECTIONS_COLLECTION, REGULATION_CHANGES_COLLECTION, CHANGE_DIFF_MAX_CHARS
+from .metrics import run_metrics
+
+# ==========================================
+# 📰 REGULATORY CHANGE FEED (49 CFR)
+# ==========================================
+# Every CFR sync against MongoDB hashes each fetched section and compares it
+# with the copy last seen (regulation_sections: one small doc per section with
+# its hash, text and valid_from date). Each added, modified or removed section
+# becomes one event in the append-only regulation_changes log:
+#   {part, section_id, change, ecfr_date, detected_at, hash, previous_hash, diff}
+# `diff` is a unified diff over the section's paragraphs ((a), (1), (i)...).
+# Both collections are indexed by part and date, so "what changed in Part 236
+# this month" is a range scan rather than a corpus comparison:
+#   python -m railnology_ingest changes --parts 236 --since 2026-10-01
+# With `ingest --incremental`, parts where nothing changed are not re-embedded.
+# Before a changed part is rewritten, the chunks of its modified and removed
+# sections are kept as superseded versions (versions.py). A part's new state is
+# only committed after its job succeeded, so a failed run is compared against
+# the old text again next time. In a --swap rebuild (`deferred`), nothing is
+# retired or committed until the staging build has replaced the live one: a
+# rejected build must leave the feed describing what readers still see.
+
+CHANGE_TYPES = ("added", "modified", "removed")
+CHANGE_INDEXES = [
+    [("part", 1), ("ecfr_date", -1)],
+    [("ecfr_date", -1)],
+    [("section_id", 1), ("ecfr_date", -1)],
+]
+
+
+def normalize_section_text(text):
+    return re.sub(r'\s+', ' ', text or "").strip()
+
+def section_hash(text):
+    """Whitespace-insensitive content hash of a section (eCFR reflows text between renders)."""
+    return hashlib.blake2b(normalize_section_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+def section_lines(text):
+    """One diff line per paragraph, so a reworded (b)(2) shows up as exactly that paragraph."""
+    from .chunking import split_cfr_paragraphs
+
+    return [normalize_section_text(paragraph) for _, paragraph in split_cfr_paragraphs(text or "")]
+
+def section_diff(old_text, new_text, max_chars=CHANGE_DIFF_MAX_CHARS):
+    lines = difflib.unified_diff(section_lines(old_text), section_lines(new_text), lineterm="", n=1)
+    # Drop the ---/+++ file header; the event already names the section
+    diff = "\n".join(line for line in lines if not line.startswith(("---", "+++")))
+    if len(diff) > max_chars:
+        diff = diff[:max_chars] + "\n... (diff truncated)"
+    return diff
+
+def sections_by_id(records):
+    """{section_id: text} of a part's Regulation records; repeated ids are joined in order."""
+    sections = {}
+    for record in records:
+        section_id = record['section_id']
+        sections[section_id] = f"{sections[section_id]}\n{record['text']}" if section_id in sections else record['text']
+    return sections
+
+
+class PartChanges:
+    """
+    Section events of one CFR part plus the state to store once the part has been re-indexed
+    (see IngestJob.detect_changes): prepare() runs before the part's chunks are replaced.
+    """
+
+    def __init__(self, log, part, events, upserts, removed):
+        self.log = log
+        self.part = part
+        self.events = events
+        self.upserts = upserts
+        self.removed = removed
+
+    @property
+    def unchanged(self):
+        return not self.events and not self.upserts and not self.removed
+
+    def prepare(self):
+        if not self.log.deferred:
+            self.retire()
+
+    def retire(self):
+        superseded = [event['section_id'] for event in self.events if event['change'] != "added"]
+        if superseded and self.log.versions is not None:
+            from .versions import ecfr_datetime
+
+            self.log.versions.retire(self.part, superseded, ecfr_datetime(self.log.ecfr_date))
+
+    def commit(self):
+        if self.log.deferred:
+            self.log.pending.append(self)
+        else:
+            self.log.commit(self)
+
+
+class CfrChangeLog:
+    """Diffs fetched CFR parts against regulation_sections and appends events to regulation_changes."""
+
+    def __init__(self, db, ecfr_date, versions=None, deferred=False):
+        self.sections = db[REGULATION_SECTIONS_COLLECTION]
+        self.changes = db[REGULATION_CHANGES_COLLECTION]
+        self.ecfr_date = ecfr_date
+        # versions.RegulationVersions that keeps the superseded chunks, if any
+        self.versions = versions
+        # Held back until commit_pending(), once a --swap build is live
+        self.deferred = deferred
+        self.pending = []
+        # The first sync only seeds the section state: every section would otherwise be "added"
+        self.baseline = self.sections.estimated_document_count() == 0
+        ensure_change_indexes(db)
+
+    def diff(self, part, records):
+        """
+        Compares one part's freshly parsed records with the stored sections. Nothing is written
+        yet; records of unchanged sections get back the valid_from they were first seen with.
+        """
+        from .versions import ecfr_datetime
+
+        with run_metrics.stage("diff_cfr_sections", items=len(records)):
+            known = {doc['section_id']: doc for doc in self.sections.find({"part": part})}
+            now = datetime.now(timezone.utc)
+            events, upserts, valid_from = [], [], {}
+
+            for section_id, text in sections_by_id(records).items():
+                digest = section_hash(text)
+                previous = known.pop(section_id, None)
+                if previous and previous['hash'] == digest:
+                    valid_from[section_id] = previous['valid_from']
+                    continue
+                upserts.append({"_id": f"{part}:{section_id}", "part": part, "section_id": section_id, "hash": digest,
+                                "text": text, "valid_from": self.ecfr_date, "updated_at": now})
+                if not self.baseline:
+                    events.append(self.event(part, section_id, "modified" if previous else "added", digest,
+                                             previous and previous['hash'], section_diff(previous and previous['text'], text), now))
+
+            # Whatever is left was indexed before and is gone from the part now
+            removed = sorted(known)
+            for section_id in removed:
+                events.append(self.event(part, section_id, "removed", None, known[section_id]['hash'],
+                                         section_diff(known[section_id]['text'], ""), now))
+
+            for record in records:
+                record['valid_from'] = ecfr_datetime(valid_from.get(record['section_id'], self.ecfr_date))
+
+        return PartChanges(self, part, events, upserts, removed)
+
+    def event(self, part, section_id, change, digest, previous_hash, diff, detected_at):
+        return {"part": part, "section_id": section_id, "change": change, "ecfr_date": self.ecfr_date,
+                "detected_at": detected_at, "hash": digest, "previous_hash": previous_hash, "diff": diff,
+                "run_id": run_metrics.run_id}
+
+    def commit(self, changes):
+        from pymongo import ReplaceOne
+
+        if changes.events:
+            self.changes.insert_many(changes.events, ordered=True)
+            counts = {change: sum(1 for event in changes.events if event['change'] == change) for change in CHANGE_TYPES}
+            for change, count in counts.items():
+                if count:
+                    run_metrics.incr(f"cfr_sections_{change}", count)
+            print(f"   📰 Part {changes.part}: " + ", ".join(f"{count} {change}" for change, count in counts.items() if count))
+        if changes.upserts:
+            self.sections.bulk_write([ReplaceOne({"_id": doc['_id']}, doc, upsert=True) for doc in changes.upserts],
+                                     ordered=False)
+        if changes.removed:
+            self.sections.delete_many({"part": changes.part, "section_id": {"$in": changes.removed}})
+
+    def commit_pending(self):
+        """Retires and commits the parts held back by a deferred log. Returns how many there were."""
+        pending, self.pending = self.pending, []
+        for changes in pending:
+            # versions.active is still the generation that was just replaced (kept for rollback)
+            changes.retire()
+            self.commit(changes)
+        return len(pending)
+
+
+def ensure_change_indexes(db):
+    db[REGULATION_SECTIONS_COLLECTION].create_index([("part", 1), ("section_id", 1)])
+    for keys in CHANGE_INDEXES:
+        db[REGULATION_CHANGES_COLLECTION].create_index(keys)
+
+def find_changes(db, parts=None, since=None, until=None, section_id=None, limit=100):
+    """Change events newest first; `since`/`until` are inclusive eCFR dates (YYYY-MM-DD)."""
+    query = {}
+    if parts:
+        query['part'] = parts[0] if len(parts) == 1 else {"$in": parts}
+    if section_id:
+        query['section_id'] = section_id
+    if since or until:
+        query['ecfr_date'] = {**({"$gte": since} if since else {}), **({"$lte": until} if until else {})}
+    cursor = db[REGULATION_CHANGES_COLLECTION].find(query, {"_id": 0}).sort([("ecfr_date", -1), ("detected_at", -1)])
+    return list(cursor.limit(limit)) if limit else list(cursor)
+
+def recently_changed_parts(db, since):
+    """{part: latest eCFR date} of parts with a section event on or after `since` (YYYY-MM-DD)."""
+    cursor = db[REGULATION_CHANGES_COLLECTION].aggregate([
+        {"$match": {"ecfr_date": {"$gte": since}}},
+        {"$group": {"_id": "$part", "latest": {"$max": "$ecfr_date"}}},
+    ])
+    return {doc['_id']: doc['latest'] for doc in cursor}
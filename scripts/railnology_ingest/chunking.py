@@ -0,0 +1,226 @@
+import re
+
+from .config import MAX_TOKENS_PER_CHUNK, CHUNK_TARGET_TOKENS, CHUNK_MAX_TOKENS
+from .tokens import count_tokens
+
+# ==========================================
+# ✂️ CHUNKER STAGE
+# ==========================================
+# A chunker turns one primary record into a list of chunks. A chunk is either
+# a plain string or a dict {'text', 'context', 'paragraph'}: `context` is a
+# header (section heading, parent paragraph lead-ins) embedded together with
+# the text but stored separately, so search can show the small chunk and expand
+# it to its whole parent section (see search/expand.py).
+
+# Paragraph marker runs like "(a)", "(b)(1)(i)" at the start of a line or a sentence.
+# Inline references ("paragraph (b) of this section") are not at either, so they never split.
+CFR_MARKER_RUN = re.compile(r'(?:^|(?<=[.;:]) )[ \t]*((?:\((?:[a-z]{1,2}|\d{1,2}|[ivxl]{1,6}|[A-Z])\))+)(?=\s)', re.M)
+# Sub-rules inside an operating rule: "A. ", "1. ", "a) " at the start of a line
+SUBRULE_MARKER = re.compile(r'^[ \t]*(?:([A-Z])|(\d{1,2})|([a-z]))[.)][ \t]+', re.M)
+
+ROMAN_NUMERALS = ["i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x", "xi", "xii", "xiii", "xiv", "xv",
+                  "xvi", "xvii", "xviii", "xix", "xx", "xxi", "xxii", "xxiii", "xxiv", "xxv"]
+# Headers never grow past this, however deep the paragraph
+MAX_CONTEXT_CHARS = 600
+INTRO_CHARS = 160
+
+def record_text(record):
+    """Returns the text to embed for a primary record, based on its document type."""
+    if record['document_type'] == 'Regulation':
+        return record.get('text', '')
+    return record.get('rule_text') or record.get('hazard_summary', '') + ' ' + record.get('recommended_action', '')
+
+def split_large_text(text, limit):
+    """
+    Splits text into chunks of at most `limit` characters.
+    If text exceeds the limit, it finds the nearest sentence ending to split safely.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    while len(text) > limit:
+        # Look backwards from the limit for a period, newline or space to split naturally
+        split_idx = text.rfind('.', 0, limit)
+        if split_idx == -1: split_idx = text.rfind('\n', 0, limit)
+        if split_idx == -1: split_idx = text.rfind(' ', 0, limit)
+        # Hard split if no punctuation found (extremely rare)
+        if split_idx == -1: split_idx = limit
+
+        chunk = text[:split_idx+1].strip()
+        if chunk: chunks.append(chunk)
+        text = text[split_idx+1:].strip()
+
+    if text: chunks.append(text)
+    return chunks
+
+def split_to_token_limit(text, max_tokens=MAX_TOKENS_PER_CHUNK):
+    """
+    Splits text into as few sentence-aligned pieces as possible, each at most `max_tokens`
+    tokens. Character limits come from the text's own chars-per-token ratio and every
+    piece is re-counted, so dense text (citations, tables) is never oversized.
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return [text]
+
+    # Aim slightly under the limit so most pieces pass on the first count
+    char_limit = max(1, int(max_tokens * len(text) / tokens * 0.95))
+    pieces = []
+    for piece in split_large_text(text, char_limit):
+        # Pieces are always shorter than `text`, so this terminates
+        if count_tokens(piece) > max_tokens:
+            pieces.extend(split_to_token_limit(piece, max_tokens))
+        else:
+            pieces.append(piece)
+    return pieces
+
+
+class CharacterChunker:
+    """Default chunker: one chunk per record unless it exceeds the token budget."""
+
+    def __init__(self, max_tokens=MAX_TOKENS_PER_CHUNK):
+        self.max_tokens = max_tokens
+
+    def chunk(self, record):
+        text = record_text(record)
+        if not text:
+            return []
+        return split_to_token_limit(text, self.max_tokens)
+
+
+def cfr_marker_level(token, path):
+    """
+    Nesting level of a CFR paragraph marker: (a)=0, (1)=1, (i)=2, (A)=3, italic (1)=4.
+    (i), (v), (x) are read as roman numerals only where the next roman numeral is due.
+    """
+    if token.isdigit():
+        return 4 if len(path) >= 4 else 1
+    if token.isupper():
+        return 3
+    if token in ROMAN_NUMERALS and len(path) >= 2:
+        current = path[2] if len(path) > 2 else None
+        expected = ROMAN_NUMERALS[ROMAN_NUMERALS.index(current) + 1] if current in ROMAN_NUMERALS[:-1] else "i"
+        if token == expected:
+            return 2
+    return 0
+
+def split_cfr_paragraphs(text):
+    """Splits a section into (path, text) paragraphs; path is a tuple of markers, () for the heading/preamble."""
+    segments = []
+    path = []
+    last_start, last_path = 0, ()
+    for match in CFR_MARKER_RUN.finditer(text):
+        tokens = re.findall(r'\(([^)]+)\)', match.group(1))
+        level = cfr_marker_level(tokens[0], path)
+        path = path[:level] + tokens
+
+        start = match.start(1)
+        if text[last_start:start].strip():
+            segments.append((last_path, text[last_start:start].strip()))
+        last_start, last_path = start, tuple(path)
+
+    if text[last_start:].strip():
+        segments.append((last_path, text[last_start:].strip()))
+    return segments
+
+def split_subrules(text):
+    """Splits an operating rule at its sub-rule markers (A., 1., a)) into (path, text) segments."""
+    segments = []
+    path = []
+    last_start, last_path = 0, ()
+    for match in SUBRULE_MARKER.finditer(text):
+        level = 0 if match.group(1) else 1 if match.group(2) else 2
+        path = path[:level] + [match.group(1) or match.group(2) or match.group(3)]
+
+        if text[last_start:match.start()].strip():
+            segments.append((last_path, text[last_start:match.start()].strip()))
+        last_start, last_path = match.start(), tuple(path)
+
+    if text[last_start:].strip():
+        segments.append((last_path, text[last_start:].strip()))
+    return segments
+
+def paragraph_label(path, cfr=True):
+    if not path:
+        return None
+    return "".join(f"({token})" for token in path) if cfr else ".".join(path)
+
+
+class StructuredChunker:
+    """
+    Hierarchy-aware chunker: regulations split at paragraph markers, operating rules at
+    sub-rules. Paragraphs are packed into chunks of about `target_tokens`, starting a new
+    chunk at top-level paragraphs, and each chunk carries its section heading and the
+    lead-in text of parent paragraphs it does not itself contain. Other records fall back
+    to the character chunker.
+    """
+
+    def __init__(self, target_tokens=CHUNK_TARGET_TOKENS, max_tokens=CHUNK_MAX_TOKENS, record_max_tokens=MAX_TOKENS_PER_CHUNK):
+        self.target_tokens = target_tokens
+        self.max_tokens = max_tokens
+        self.record_max_tokens = record_max_tokens
+
+    def chunk(self, record):
+        text = record_text(record)
+        if not text:
+            return []
+
+        if record['document_type'] == 'Regulation':
+            segments = split_cfr_paragraphs(text)
+            heading = text.split("\n", 1)[0].strip()
+            title = f"{record.get('title') or ''} {heading}".strip()
+            cfr = True
+        elif record['document_type'] == 'Operating Rule':
+            segments = split_subrules(text)
+            title = f"{record.get('rule_system')} Rule {record.get('rule_number')} {record.get('rule_title') or ''}".strip()
+            cfr = False
+        else:
+            return split_to_token_limit(text, self.record_max_tokens)
+
+        return self.pack(segments, title, cfr)
+
+    def pack(self, segments, title, cfr=True):
+        """Greedily packs (path, text) segments into chunk dicts of about target_tokens."""
+        intros = {path: seg_text[:INTRO_CHARS] for path, seg_text in segments if path}
+        chunks = []
+        current = []
+        current_tokens = 0
+
+        def flush():
+            if not current:
+                return
+            paths = [path for path, _ in current]
+            # Section heading, plus the lead-ins of parent paragraphs whose own text is in another chunk
+            first = paths[0]
+            header = [title]
+            for depth in range(1, len(first)):
+                parent = first[:depth]
+                if parent in intros and parent not in paths:
+                    intro = intros[parent]
+                    header.append(intro + ("..." if len(intro) == INTRO_CHARS else ""))
+
+            labels = [paragraph_label(path, cfr) for path in paths if path]
+            label = None
+            if labels:
+                label = labels[0] if labels[0] == labels[-1] else f"{labels[0]}-{labels[-1]}"
+
+            chunks.append({
+                'text': "\n".join(piece for _, piece in current),
+                'context': "\n".join(header)[:MAX_CONTEXT_CHARS] or None,
+                'paragraph': label,
+            })
+            current.clear()
+
+        for path, seg_text in segments:
+            for piece in split_to_token_limit(seg_text, self.max_tokens):
+                tokens = count_tokens(piece)
+                top_level = len(path) == 1
+                if current and (current_tokens + tokens > self.target_tokens
+                                or (top_level and current_tokens >= self.target_tokens // 2)):
+                    flush()
+                    current_tokens = 0
+                current.append((path, piece))
+                current_tokens += tokens
+        flush()
+        return chunks
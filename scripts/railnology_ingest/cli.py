@@ -0,0 +1,730 @@
+import os
+import sys
+import argparse
+
+from .config import (
+    MONGO_URI, OPENAI_API_KEY, TARGET_PARTS, ECFR_REQUEST_DELAY_SECONDS, RULEBOOK_WORKERS, LOCAL_DATASET_DIR,
+    WRITE_BATCH_SIZE, WRITER_WORKERS, CHUNKERS, DEFAULT_CHUNKER, DEDUP_ENABLED, DEAD_LETTER_DIR, DEAD_LETTER_POLL_SECONDS,
+    EMBEDDERS, DEFAULT_EMBEDDER, SNAPSHOT_DIR, SNAPSHOT_KEEP, ECFR_HISTORY_START, SCHEDULER_TASKS, SCHEDULER_MAX_RUNNING,
+    CHUNK_LAYOUTS, CHUNK_LAYOUT, REGULATION_VERSIONS_COLLECTION,
+    get_db_name, get_mongo_client,
+)
+from .metrics import run_metrics
+from .profiling import add_profile_arguments, profile_run
+
+# ==========================================
+# 🖥️ SINGLE CLI ENTRY POINT
+# ==========================================
+#   python -m railnology_ingest ingest [--only cfr,guidance,rulebooks] [--parts 213,236] [--swap]
+#   python -m railnology_ingest ingest --sink local [--local-format parquet] [--embedder stub]
+#   python -m railnology_ingest ingest --chunker structured
+#   python -m railnology_ingest ingest --embedder local --swap    (LOCAL_EMBEDDING_MODEL_PATH)
+#   python -m railnology_ingest ingest --only cfr --incremental   (re-index changed parts only)
+#   python -m railnology_ingest changes [--parts 236] [--since 2026-10-01] [--diff]
+#   python -m railnology_ingest history [--parts 236] [--since 2020-01-01]   (point-in-time backfill)
+#   python -m railnology_ingest load scripts/datasets/<run_id> [--drop-existing] [--rebuild-indexes]
+#   python -m railnology_ingest snapshot [--from-dataset scripts/datasets/<run_id>]
+#   python -m railnology_ingest retry [--loop]
+#   python -m railnology_ingest schedule [--only cfr_hot,jobs] [--once] [--status]   (ingestion daemon)
+#   python -m railnology_ingest migrate [--layout compact|legacy]   (chunk document layout, blue/green)
+#   python -m railnology_ingest rollback
+#   python -m railnology_ingest index-definition [--apply]
+# rail_data_scraper.py and ingest_rail_content.py are thin wrappers around this.
+# Only argparse and stdlib helpers load up front; each command imports its
+# stages (and pymongo/openai/bs4/PyPDF2/requests) when it actually runs.
+# scripts/bench_import_time.py guards this.
+
+DOMAINS = ("cfr", "guidance", "rulebooks")
+
+
+def parse_parts(value):
+    """Parses '213', '213,236' or '200-299' into a list of part numbers."""
+    parts = []
+    for token in value.split(","):
+        token = token.strip()
+        if not token: continue
+        if "-" in token:
+            start, end = token.split("-", 1)
+            parts.extend(range(int(start), int(end) + 1))
+        else:
+            parts.append(int(token))
+    return parts
+
+def parse_domains(value):
+    domains = [d.strip() for d in value.split(",") if d.strip()]
+    unknown = [d for d in domains if d not in DOMAINS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown domain(s): {', '.join(unknown)} (choose from {', '.join(DOMAINS)})")
+    return domains
+
+def parse_tasks(value):
+    tasks = [t.strip() for t in value.split(",") if t.strip()]
+    unknown = [t for t in tasks if t not in SCHEDULER_TASKS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown task(s): {', '.join(unknown)} (choose from {', '.join(SCHEDULER_TASKS)})")
+    return tasks
+
+def add_report_arguments(parser):
+    parser.add_argument("--report", metavar="PATH",
+                        help="Where to write the JSON run report (default: scripts/run_reports/).")
+    parser.add_argument("--prometheus-textfile", metavar="PATH", default=os.getenv("PROMETHEUS_TEXTFILE"),
+                        help="Also write run metrics in node_exporter textfile format.")
+    add_profile_arguments(parser)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="railnology_ingest", description="Railnology external knowledge ingestion engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Fetch, chunk, embed and index the knowledge corpus.")
+    ingest.add_argument("--only", type=parse_domains, default=list(DOMAINS), metavar="DOMAIN[,DOMAIN]",
+                        help=f"Restrict the run to some of: {', '.join(DOMAINS)}.")
+    ingest.add_argument("--parts", type=parse_parts, default=TARGET_PARTS, metavar="PARTS",
+                        help="49 CFR parts to ingest, e.g. 213,236 or 200-299 (default: 200-299).")
+    ingest.add_argument("--swap", action="store_true",
+                        help="Build into a staging collection, validate it, then atomically switch readers to it.")
+    ingest.add_argument("--incremental", action="store_true",
+                        help="Skip CFR parts whose sections are unchanged since the last sync (MongoDB sink, no --swap).")
+    ingest.add_argument("--chunker", choices=CHUNKERS, default=DEFAULT_CHUNKER,
+                        help="character = whole sections up to MAX_TOKENS_PER_CHUNK; structured = paragraph-sized "
+                             "chunks with context headers and parent links (default: $CHUNKER or character).")
+    ingest.add_argument("--dedup", choices=["job", "run", "off"], default="job" if DEDUP_ENABLED else "off",
+                        help="Collapse near-duplicate chunks within each job (default), across the whole run "
+                             "(full --swap rebuilds only: a later --parts re-run could drop shared copies), or not at all.")
+    ingest.add_argument("--sink", choices=["mongo", "local"], default="mongo",
+                        help="Write to MongoDB (default) or to a local chunk dataset (no MongoDB needed).")
+    ingest.add_argument("--local-path", metavar="DIR",
+                        help="Dataset directory for --sink local (default: scripts/datasets/<run_id>).")
+    ingest.add_argument("--local-format", choices=["jsonl", "parquet"], default="jsonl",
+                        help="jsonl (+ float32 .f32 sidecars) or parquet (needs pyarrow).")
+    ingest.add_argument("--embedder", choices=EMBEDDERS, default=DEFAULT_EMBEDDER,
+                        help="openai (default: $EMBEDDER or openai); local = sentence-transformers model at "
+                             "LOCAL_EMBEDDING_MODEL_PATH on CPU; stub = deterministic hash vectors, no API key or "
+                             "cost (benchmarks/dry runs). Changing models needs --swap.")
+    add_report_arguments(ingest)
+
+    load = commands.add_parser("load", help="Bulk-load a local chunk dataset into knowledge_chunks (no scraping or embedding).")
+    load.add_argument("path", help="Dataset directory written by `ingest --sink local` (contains manifest.json).")
+    load.add_argument("--collection", metavar="NAME",
+                      help="Target collection (default: the one currently serving knowledge_chunks).")
+    load.add_argument("--drop-existing", action="store_true",
+                      help="Delete every document in the target collection first (seeding a fresh environment).")
+    load.add_argument("--rebuild-indexes", action="store_true",
+                      help="Drop secondary indexes before the load and rebuild them once afterwards.")
+    load.add_argument("--workers", type=int, default=WRITER_WORKERS,
+                      help=f"Parallel insert_many writers (default {WRITER_WORKERS}).")
+    load.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE,
+                      help=f"Documents per unordered insert_many (default {WRITE_BATCH_SIZE}).")
+    add_report_arguments(load)
+
+    snapshot = commands.add_parser("snapshot", help="Export the live generation as an immutable memory-mapped search snapshot.")
+    snapshot.add_argument("--from-dataset", metavar="DIR",
+                          help="Export a local chunk dataset instead of the collection serving knowledge_chunks.")
+    snapshot.add_argument("--out", metavar="DIR", default=SNAPSHOT_DIR,
+                          help="Snapshot root holding the snapshots and CURRENT (default: scripts/snapshots/).")
+    snapshot.add_argument("--keep", type=int, default=SNAPSHOT_KEEP,
+                          help=f"Snapshots to keep after the export (default {SNAPSHOT_KEEP}).")
+    add_report_arguments(snapshot)
+
+    retry = commands.add_parser("retry", help="Re-embed dead-lettered chunks (failed embeddings) that are due for a retry.")
+    retry.add_argument("--loop", action="store_true",
+                       help=f"Keep draining: sleep until the next entry is due (at most {DEAD_LETTER_POLL_SECONDS}s) and retry again.")
+    retry.add_argument("--dead-letter-dir", metavar="DIR", default=DEAD_LETTER_DIR,
+                       help="Dead-letter store (default: scripts/dead_letters/).")
+    retry.add_argument("--dataset-out", metavar="DIR",
+                       help="Retry chunks of `--sink local` runs into this new dataset (load it afterwards) "
+                            "instead of chunks bound for MongoDB.")
+    retry.add_argument("--embedder", choices=EMBEDDERS, default=DEFAULT_EMBEDDER,
+                       help="Backend to re-embed with; only entries recorded with its model are retried.")
+    add_report_arguments(retry)
+
+    changes = commands.add_parser("changes", help="List 49 CFR section changes recorded by past syncs, newest first.")
+    changes.add_argument("--parts", type=parse_parts, metavar="PARTS", help="Only these parts, e.g. 236 or 213,236.")
+    changes.add_argument("--section", metavar="ID", help="Only this section, e.g. 236.1005.")
+    changes.add_argument("--since", metavar="YYYY-MM-DD", help="eCFR date on or after.")
+    changes.add_argument("--until", metavar="YYYY-MM-DD", help="eCFR date on or before.")
+    changes.add_argument("--limit", type=int, default=100, help="Most events to show (default 100, 0 = all).")
+    changes.add_argument("--diff", action="store_true", help="Print each event's paragraph diff.")
+    changes.add_argument("--json", action="store_true", help="Print the events as JSON.")
+
+    history = commands.add_parser("history", help="Backfill superseded 49 CFR section versions from the eCFR "
+                                                  "versioned endpoints (for as_of searches).")
+    history.add_argument("--parts", type=parse_parts, default=TARGET_PARTS, metavar="PARTS",
+                         help="49 CFR parts, e.g. 213,236 or 200-299 (default: 200-299).")
+    history.add_argument("--since", metavar="YYYY-MM-DD", default=ECFR_HISTORY_START,
+                         help=f"Oldest date to reconstruct (default {ECFR_HISTORY_START}, where eCFR history starts).")
+    history.add_argument("--chunker", choices=CHUNKERS, default=DEFAULT_CHUNKER,
+                         help="Chunker for the old versions; use the one the live generation was built with.")
+    history.add_argument("--embedder", choices=EMBEDDERS, default=DEFAULT_EMBEDDER,
+                         help="Must be the live generation's model, so as_of searches can compare vectors.")
+    add_report_arguments(history)
+
+    schedule = commands.add_parser("schedule", help="Run the ingestion scheduler: each source on its own cadence, "
+                                                    "hot CFR parts more often.")
+    schedule.add_argument("--only", type=parse_tasks, default=list(SCHEDULER_TASKS), metavar="TASK[,TASK]",
+                          help=f"Tasks to schedule (default: {','.join(SCHEDULER_TASKS)}).")
+    schedule.add_argument("--max-running", type=int, default=SCHEDULER_MAX_RUNNING,
+                          help=f"Runs in flight at once (default {SCHEDULER_MAX_RUNNING}).")
+    schedule.add_argument("--once", action="store_true", help="Start every selected task now, wait for them and exit.")
+    schedule.add_argument("--dry-run", action="store_true",
+                          help="Print what --once would start (including the hot parts) without running anything.")
+    schedule.add_argument("--status", action="store_true", help="Print each task's last run and next due time.")
+
+    migrate = commands.add_parser("migrate", help="Rebuild the live generation in another chunk document layout "
+                                                  "(copies embeddings, then swaps).")
+    migrate.add_argument("--layout", choices=CHUNK_LAYOUTS, default=CHUNK_LAYOUT,
+                         help=f"Target layout (default {CHUNK_LAYOUT}).")
+    migrate.add_argument("--workers", type=int, default=WRITER_WORKERS,
+                         help=f"Parallel insert_many writers (default {WRITER_WORKERS}).")
+    migrate.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE,
+                         help=f"Documents per unordered insert_many (default {WRITE_BATCH_SIZE}).")
+    add_report_arguments(migrate)
+
+    commands.add_parser("rollback", help="Point readers back at the previous knowledge_chunks generation.")
+
+    index = commands.add_parser("index-definition",
+                                help="Print the vector index definition with every metadata filter field declared.")
+    index.add_argument("--apply", action="store_true",
+                       help="Create or update the index on the collection currently serving knowledge_chunks.")
+    return parser
+
+def write_run_report(args):
+    """Prints the stage summary and writes the JSON (and optional Prometheus) run report."""
+    run_metrics.print_summary()
+    try:
+        print(f"   📝 Run report: {run_metrics.write_json(args.report)}")
+        if args.prometheus_textfile:
+            print(f"   📝 Prometheus textfile: {run_metrics.write_prometheus(args.prometheus_textfile)}")
+    except OSError as e:
+        print(f"   ⚠️ Could not write run report: {e}")
+
+def print_banner(db_name):
+    node_env = os.getenv("NODE_ENV", "production")
+    print("==================================================")
+    print(f"   RAILLY: EXTERNAL KNOWLEDGE INGESTION ENGINE ({node_env.upper()})")
+    print(f"   Target Database: {db_name}")
+    print("==================================================")
+
+def require_environment(mongo=True, openai=True):
+    missing = [name for name, needed, value in (("MONGO_URI", mongo, MONGO_URI), ("OPENAI_API_KEY", openai, OPENAI_API_KEY))
+               if needed and not value]
+    if missing:
+        print(f"❌ CRITICAL ERROR: {' and '.join(missing)} environment variable(s) missing.")
+        sys.exit(1)
+
+def take_run_locks(names):
+    """Takes a slot of each upstream lock, or exits with EXIT_LOCKED when one is fully in use."""
+    from .locks import acquire_run_locks, print_lock_busy, EXIT_LOCKED
+
+    locks, busy = acquire_run_locks(names)
+    if busy:
+        print_lock_busy(busy)
+        sys.exit(EXIT_LOCKED)
+    return locks
+
+def run_ingestion(args):
+    """Runs the selected ingestion domains (CFR, FRA guidance, rulebooks). Exits non-zero after a fatal error."""
+    from .sources import CfrSource, FraGuidanceSource, RulebookSource, fetch_ecfr_date
+    from .chunking import CharacterChunker, StructuredChunker
+    from .embedding import get_embedder
+    from .sinks import MongoSink, LocalDatasetSink
+    from .pipeline import Pipeline
+    from .deadletter import DeadLetterStore
+    from .changes import CfrChangeLog
+    from .locks import release_run_locks
+    from .layout import chunk_collection
+    from .versions import RegulationVersions
+    from .swap import (
+        resolve_active_collection_name, create_staging_collection, validate_staging_collection,
+        swap_active_collection, bump_index_generation, check_collection_model, record_collection_model,
+    )
+
+    use_mongo = args.sink == "mongo"
+    if args.swap and not use_mongo:
+        print("❌ --swap needs the MongoDB sink.")
+        sys.exit(2)
+    if args.incremental and (args.swap or not use_mongo):
+        print("❌ --incremental needs the MongoDB sink without --swap: skipped parts must already be indexed.")
+        sys.exit(2)
+    if args.dedup == "run" and not args.swap:
+        print("❌ --dedup run needs --swap: run-wide duplicates are only safe in a full rebuild.")
+        sys.exit(2)
+    db_name = get_db_name()
+    print_banner(db_name if use_mongo else f"local dataset ({args.local_format})")
+    require_environment(mongo=use_mongo, openai=args.embedder == "openai")
+
+    db = None
+    dead_letters = None
+    change_log = None
+    ok = False
+    # One slot per upstream this run hits, shared with manual runs and the scheduler (locks.py)
+    locks = take_run_locks(args.only)
+    try:
+        embedder = get_embedder(args.embedder)
+        print(f"✅ Embedding with {embedder.model} ({embedder.dimensions} dims).")
+
+        if use_mongo:
+            mongo = get_mongo_client()
+            db = mongo[db_name]
+            print(f"✅ Connected to MongoDB ({db_name}).")
+
+            if args.swap:
+                # Build-then-swap: live readers keep the current generation until validation passes
+                staging = create_staging_collection(db, run_metrics.run_id, dimensions=embedder.dimensions)
+                collection = chunk_collection(db, staging.name)
+            else:
+                collection = chunk_collection(db, resolve_active_collection_name(db))
+                problem = check_collection_model(db, collection, embedder)
+                if problem:
+                    raise ValueError(problem)
+            record_collection_model(db, collection.name, embedder.model, embedder.dimensions)
+            print(f"✅ Writing {collection.layout.name} chunk documents to {collection.name}.")
+
+            # One sink (and writer stage) for the whole run so inserts overlap with fetching and embedding
+            sink = MongoSink(collection)
+            dead_letters = DeadLetterStore(run_id=run_metrics.run_id, target={"collection": collection.name})
+        else:
+            local_path = args.local_path or os.path.join(LOCAL_DATASET_DIR, run_metrics.run_id)
+            sink = LocalDatasetSink(local_path, args.local_format, model=embedder.model)
+            dead_letters = DeadLetterStore(run_id=run_metrics.run_id, target={"dataset": local_path})
+            print(f"✅ Writing chunks to local dataset at {local_path}.")
+
+        chunker = StructuredChunker() if args.chunker == "structured" else CharacterChunker()
+        pipeline = Pipeline(chunker, embedder, sink, dedup=None if args.dedup == "off" else args.dedup,
+                            dead_letters=dead_letters, incremental=args.incremental)
+
+        # =======================================================
+        # 1. INGEST 49 CFR REGULATIONS (MANDATE, DIRECTIVES)
+        # =======================================================
+        if "cfr" in args.only:
+            print(f"\n--- 🏛️  Ingesting FRA Regulations (49 CFR, Parts {args.parts[0]} - {args.parts[-1]}) ---")
+            ecfr_date = fetch_ecfr_date()
+            if db is not None:
+                # Section-level change feed (regulation_changes); also what --incremental skips by.
+                # Superseded sections are kept from the generation readers see now. With --swap,
+                # both wait until the staging build is live.
+                versions = RegulationVersions(db, chunk_collection(db, resolve_active_collection_name(db)))
+                change_log = CfrChangeLog(db, ecfr_date, versions, deferred=args.swap)
+                print(f"   📰 eCFR date {ecfr_date}"
+                      f"{' (first sync: recording the section baseline)' if change_log.baseline else ''}.")
+            pipeline.run(CfrSource(args.parts, change_log, ecfr_date).jobs(), delay=ECFR_REQUEST_DELAY_SECONDS)
+
+        # =======================================================
+        # 2. INGEST FRA SAFETY GUIDANCE (ADVISORIES/BULLETINS)
+        # =======================================================
+        if "guidance" in args.only:
+            print(f"\n--- ⚠️  Ingesting FRA Safety Guidance (Advisories/Bulletins) ---")
+            pipeline.run(FraGuidanceSource().jobs())
+
+        # =======================================================
+        # 3. INGEST PROPRIETARY OPERATING RULES (RULEBOOK REGISTRY)
+        # =======================================================
+        if "rulebooks" in args.only:
+            print(f"\n--- 📜 Ingesting Proprietary Operating Rules ---")
+            pipeline.run(RulebookSource().jobs(), workers=RULEBOOK_WORKERS)
+
+        sink.close()
+
+        # =======================================================
+        # 4. PROMOTE STAGING BUILD (--swap only)
+        # =======================================================
+        if args.swap:
+            print(f"\n--- 🔁 Validating staging collection {collection.name} ---")
+            if validate_staging_collection(db, collection, embedder):
+                swap_active_collection(db, collection.name)
+                committed = change_log.commit_pending() if change_log is not None else 0
+                if committed:
+                    print(f"   📰 Change feed updated for {committed} part(s) of the new generation.")
+            else:
+                print(f"   Live collection untouched. Staging build kept as {collection.name} for inspection.")
+                if change_log is not None and change_log.pending:
+                    print(f"   📰 Change feed not updated for {len(change_log.pending)} part(s).")
+                # A rejected rebuild is a failed run (the scheduler only sees the exit code)
+                raise RuntimeError(f"staging collection {collection.name} failed validation; not swapped")
+
+        print("\n==================================================")
+        print("   INGESTION COMPLETE")
+        print("==================================================")
+        ok = True
+
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR during main execution: {e}")
+        run_metrics.incr("fatal_errors")
+
+    finally:
+        if dead_letters is not None:
+            pending = dead_letters.close()
+            if pending:
+                print(f"   📮 {pending} dead-lettered chunk(s) pending; `python -m railnology_ingest retry` restores them.")
+        if db is not None:
+            # Readers' query caches key on this, so they drop results from before the run
+            try:
+                bump_index_generation(db)
+            except Exception as e:
+                print(f"   ⚠️ Could not bump the index generation: {e}")
+        write_run_report(args)
+        release_run_locks(locks)
+
+    if not ok:
+        sys.exit(1)
+
+def run_load(args):
+    """Seeds the target collection from a local dataset. Exits non-zero when verification fails."""
+    from .loader import load_dataset
+    from .dataset import read_manifest
+    from .layout import chunk_collection
+    from .swap import resolve_active_collection_name, bump_index_generation, collection_model, record_collection_model
+
+    db_name = get_db_name()
+    print_banner(db_name)
+    require_environment(openai=False)
+
+    ok = False
+    try:
+        db = get_mongo_client()[db_name]
+        collection = chunk_collection(db, args.collection or resolve_active_collection_name(db))
+        print(f"✅ Connected to MongoDB ({db_name}). Loading into {collection.name} ({collection.layout.name} layout).")
+
+        manifest = read_manifest(args.path)
+        recorded = None if args.drop_existing else collection_model(db, collection.name)
+        if recorded and recorded['model'] != manifest['model']:
+            raise ValueError(f"{collection.name} was embedded with {recorded['model']} but the dataset with "
+                             f"{manifest['model']}; load into a new collection or use --drop-existing.")
+
+        print(f"\n--- 📦 Bulk loading {args.path} ---")
+        ok = load_dataset(collection, args.path, workers=args.workers, batch_size=args.batch_size,
+                          drop_existing=args.drop_existing, rebuild_indexes=args.rebuild_indexes)
+        if ok:
+            record_collection_model(db, collection.name, manifest['model'], manifest['dimensions'])
+        bump_index_generation(db)
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR during load: {e}")
+        run_metrics.incr("fatal_errors")
+    finally:
+        write_run_report(args)
+
+    if not ok:
+        sys.exit(1)
+
+def run_snapshot(args):
+    """Exports a snapshot from MongoDB (or a dataset), verifies it and prunes old ones. Exits non-zero on failure."""
+    from .snapshot import export_snapshot, prune_snapshots
+
+    ok = False
+    try:
+        if args.from_dataset:
+            from .dataset import read_manifest, iter_dataset
+
+            manifest = read_manifest(args.from_dataset)
+            print(f"\n--- 🧊 Snapshotting dataset {args.from_dataset} ---")
+            snapshot = export_snapshot(iter_dataset(args.from_dataset, manifest), args.out, model=manifest['model'],
+                                       source={"dataset": os.path.abspath(args.from_dataset)},
+                                       generation=manifest['created_at'], total=manifest['total_rows'])
+        else:
+            from .swap import resolve_active_collection_name, current_index_generation, collection_model
+            from .layout import chunk_collection
+
+            db_name = get_db_name()
+            print_banner(db_name)
+            require_environment(openai=False)
+            db = get_mongo_client()[db_name]
+            collection = chunk_collection(db, resolve_active_collection_name(db))
+            layout = collection.layout
+            generation = current_index_generation(db)
+            recorded = collection_model(db, collection.name) or {}
+            print(f"\n--- 🧊 Snapshotting {db_name}.{collection.name} (generation {generation}) ---")
+            # Snapshots hold legacy-shaped chunks whatever the collection's layout
+            docs = (layout.decode(doc) for doc in collection.find({}, layout.projection({"_id": 0}), batch_size=1000))
+            snapshot = export_snapshot(docs, args.out,
+                                       snapshot_id=f"{run_metrics.run_id}-g{generation}", model=recorded.get('model'),
+                                       source={"collection": collection.name}, generation=generation,
+                                       total=collection.estimated_document_count())
+
+        if snapshot is not None:
+            ok = True
+            prune_snapshots(args.out, args.keep)
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR during snapshot export: {e}")
+        run_metrics.incr("fatal_errors")
+    finally:
+        write_run_report(args)
+
+    if not ok:
+        sys.exit(1)
+
+def run_retry(args):
+    """Drains the dead-letter store once, or forever with --loop."""
+    import time
+    from datetime import datetime, timezone
+    from .deadletter import DeadLetterStore, retry_dead_letters
+    from .embedding import get_embedder
+
+    store = DeadLetterStore(args.dead_letter_dir)
+    print(f"\n--- 📮 Retrying dead-lettered chunks ({store.pending()} pending in {store.root}) ---")
+    require_environment(mongo=not args.dataset_out, openai=args.embedder == "openai")
+    embedder = get_embedder(args.embedder)
+
+    db = sink = None
+    if args.dataset_out:
+        from .sinks import LocalDatasetSink
+
+        sink = LocalDatasetSink(args.dataset_out, model=embedder.model)
+        accepts = lambda target: "dataset" in target
+        is_obsolete = None
+        write = lambda docs: [sink.write(doc) for doc in docs]
+    else:
+        from pymongo import ReplaceOne
+        from .swap import resolve_active_collection_name, bump_index_generation
+        from .layout import chunk_collection
+
+        db = get_mongo_client()[get_db_name()]
+        accepts = lambda target: "collection" in target
+
+        def is_obsolete(entry):
+            # The section was re-ingested after the failure, so this chunk is out of date
+            failed_at = datetime.fromtimestamp(entry['failed_at'], timezone.utc)
+            return collection.find_one(collection.layout.query({"parent_section_id": entry['parent_section_id'],
+                                                                "last_updated": {"$gt": failed_at}}), {"_id": 1}) is not None
+
+        def write(docs):
+            # Upsert by section_id so a retry that partly landed before is not duplicated
+            layout = collection.layout
+            with run_metrics.stage("insert_many", items=len(docs)):
+                collection.bulk_write([ReplaceOne(layout.query({"section_id": doc['section_id']}), layout.replacement(doc),
+                                                  upsert=True) for doc in docs], ordered=False)
+
+    try:
+        while True:
+            if db is not None:
+                # Chunks go to whichever generation readers see now, even if a swap happened since the failure
+                collection = chunk_collection(db, resolve_active_collection_name(db))
+            stats = retry_dead_letters(store, embedder, write, is_obsolete=is_obsolete, accepts=accepts)
+            print(f"   ✅ Recovered {stats['recovered']}, failed again {stats['failed']}, obsolete {stats['obsolete']}, "
+                  f"not yet due {stats['not_due']}, for another target/model {stats['skipped']}.")
+            if stats['recovered'] and db is not None:
+                bump_index_generation(db)
+            if not args.loop:
+                break
+            wait = DEAD_LETTER_POLL_SECONDS
+            if stats['next_attempt_at'] is not None:
+                wait = min(wait, max(1, stats['next_attempt_at'] - time.time()))
+            time.sleep(wait)
+    except KeyboardInterrupt:
+        print("\n   Stopped.")
+    finally:
+        if sink is not None:
+            sink.close()
+        write_run_report(args)
+
+def run_history(args):
+    """
+    Backfills regulation_versions for the selected parts into the versions store of the live generation.
+    Exits non-zero after a fatal error.
+    """
+    from .sources import CfrHistorySource
+    from .chunking import CharacterChunker, StructuredChunker
+    from .embedding import get_embedder
+    from .sinks import MongoSink
+    from .pipeline import Pipeline
+    from .versions import RegulationVersions
+    from .locks import release_run_locks
+    from .layout import chunk_collection
+    from .swap import (
+        resolve_active_collection_name, collection_model, check_collection_model, record_collection_model,
+        apply_vector_index_definition, bump_index_generation,
+    )
+
+    db_name = get_db_name()
+    print_banner(db_name)
+    require_environment(openai=args.embedder == "openai")
+    ok = False
+    # Backfills fetch from eCFR too: they count against the same concurrency as CFR syncs
+    locks = take_run_locks(["cfr"])
+    try:
+        embedder = get_embedder(args.embedder)
+        db = get_mongo_client()[db_name]
+        versions = RegulationVersions(db, chunk_collection(db, resolve_active_collection_name(db)))
+        live = collection_model(db, versions.active.name)
+        if live and live['model'] != embedder.model:
+            raise ValueError(f"{versions.active.name} was embedded with {live['model']}, not {embedder.model}; "
+                             f"as_of searches could not compare old and new versions.")
+        problem = check_collection_model(db, versions.collection, embedder)
+        if problem:
+            raise ValueError(problem)
+        record_collection_model(db, versions.collection.name, embedder.model, embedder.dimensions)
+
+        print(f"\n--- 📅 Backfilling 49 CFR versions since {args.since} (Parts {args.parts[0]} - {args.parts[-1]}) "
+              f"into {versions.collection.name} ---")
+        sink = MongoSink(versions.collection)
+        chunker = StructuredChunker() if args.chunker == "structured" else CharacterChunker()
+        # No dedup: near-identical versions of a section are exactly what must be kept apart.
+        # No dead letters: `retry` writes to the live generation; re-running history fills the gaps.
+        pipeline = Pipeline(chunker, embedder, sink)
+        pipeline.run(CfrHistorySource(versions, args.parts, args.since).jobs(), delay=ECFR_REQUEST_DELAY_SECONDS)
+        sink.close()
+
+        apply_vector_index_definition(versions.collection, dimensions=embedder.dimensions)
+        bump_index_generation(db)
+        ok = True
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR during history backfill: {e}")
+        run_metrics.incr("fatal_errors")
+    finally:
+        write_run_report(args)
+        release_run_locks(locks)
+
+    if not ok:
+        sys.exit(1)
+
+def run_changes(args):
+    import json
+    from .changes import find_changes
+
+    require_environment(openai=False)
+    db = get_mongo_client()[get_db_name()]
+    events = find_changes(db, parts=args.parts, since=args.since, until=args.until, section_id=args.section,
+                          limit=args.limit)
+    if args.json:
+        print(json.dumps(events, indent=2, default=str))
+        return
+
+    print(f"--- 📰 {len(events)} 49 CFR section change(s) ---")
+    symbols = {"added": "➕", "modified": "✏️", "removed": "➖"}
+    for event in events:
+        print(f"{event['ecfr_date']}  {symbols.get(event['change'], '•')} Part {event['part']} § {event['section_id']} "
+              f"{event['change']} (detected {event['detected_at']:%Y-%m-%d %H:%M})")
+        if args.diff and event.get('diff'):
+            print("    " + event['diff'].replace("\n", "\n    "))
+
+def run_schedule(args):
+    from .scheduler import Scheduler
+
+    scheduler = Scheduler(args.only, max_running=args.max_running, dry_run=args.dry_run)
+    if args.status:
+        scheduler.print_status()
+        return
+    scheduler.run(once=args.once or args.dry_run)
+
+def run_migrate(args):
+    """
+    Copies the live generation into a staging collection in the target layout, validates it and swaps.
+    Exits non-zero when the copy or its validation fails.
+    """
+    from .layout import ChunkCollection, chunk_collection, layout_for, migrate_chunks, storage_stats
+    from .embedding import embedder_for_model
+    from .swap import (
+        resolve_active_collection_name, collection_model, record_collection_model, record_collection_layout,
+        create_staging_collection, validate_staging_collection, swap_active_collection, bump_index_generation,
+    )
+
+    db_name = get_db_name()
+    print_banner(db_name)
+    require_environment(openai=False)
+
+    ok = False
+    try:
+        db = get_mongo_client()[db_name]
+        active = chunk_collection(db, resolve_active_collection_name(db))
+        if active.layout.name == args.layout:
+            print(f"✅ {active.name} already uses the {args.layout} layout.")
+            ok = True
+            return
+        recorded = collection_model(db, active.name) or {}
+        # Validation embeds the sample queries with the generation's own model
+        require_environment(openai=(recorded.get('model') or "text-embedding-").startswith("text-embedding-"))
+        embedder = embedder_for_model(recorded.get('model'), recorded.get('dimensions'))
+
+        print(f"\n--- 🗜️ Migrating {active.name} from the {active.layout.name} to the {args.layout} layout ---")
+        staging = create_staging_collection(db, run_metrics.run_id, dimensions=recorded.get('dimensions'))
+        target = ChunkCollection(staging, layout_for(db, args.layout))
+        stats = migrate_chunks(active, target, batch_size=args.batch_size, workers=args.workers)
+        run_metrics.incr("documents_migrated", stats['inserted'])
+
+        # Nothing about the staging collection is recorded until the copy is known to be complete
+        copied, expected = staging.count_documents({}), active.count_documents({})
+        if stats['failed'] or copied != expected:
+            staging.drop()
+            raise RuntimeError(f"copied {copied} of {expected} chunks ({stats['failed']} failed inserts); "
+                               f"dropped {staging.name}")
+        record_collection_layout(db, staging.name, args.layout)
+        record_collection_model(db, staging.name, embedder.model, recorded.get('dimensions') or embedder.dimensions)
+
+        before, after = storage_stats(db, active.name), storage_stats(db, staging.name)
+        if before and after and before[1]:
+            print(f"   📏 Average chunk: {before[1] / 1024:.1f} KB -> {after[1] / 1024:.1f} KB "
+                  f"({(1 - after[1] / before[1]):.0%} smaller, embeddings included)")
+
+        print(f"\n--- 🔁 Validating staging collection {staging.name} ---")
+        if validate_staging_collection(db, target, embedder):
+            swap_active_collection(db, staging.name)
+            bump_index_generation(db)
+            ok = True
+        else:
+            print(f"   Live collection untouched. Staging build kept as {staging.name} for inspection.")
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR during migration: {e}")
+        run_metrics.incr("fatal_errors")
+    finally:
+        write_run_report(args)
+
+    if not ok:
+        sys.exit(1)
+
+def run_rollback():
+    """Points knowledge_chunks back at the previous generation. Exits non-zero when there is none."""
+    from .swap import rollback_active_collection
+
+    # Only repoints the alias: must work when the embedding side is what broke
+    require_environment(openai=False)
+    db = get_mongo_client()[get_db_name()]
+    if not rollback_active_collection(db):
+        sys.exit(1)
+
+def run_index_definition(args):
+    import json
+    from .search.filters import vector_index_definition
+
+    if not args.apply:
+        print(json.dumps(vector_index_definition(), indent=2))
+        return
+
+    from .swap import resolve_active_collection_name, apply_vector_index_definition
+
+    require_environment(openai=False)
+    db = get_mongo_client()[get_db_name()]
+    print(json.dumps(apply_vector_index_definition(db[resolve_active_collection_name(db)]), indent=2))
+    # Superseded regulation versions are searched with the same index for as_of queries
+    if REGULATION_VERSIONS_COLLECTION in db.list_collection_names():
+        apply_vector_index_definition(db[REGULATION_VERSIONS_COLLECTION])
+        print(f"   🗂️ Applied to {REGULATION_VERSIONS_COLLECTION} as well.")
+
+def main(argv=None, run_name="railnology_ingest"):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "rollback":
+        run_rollback()
+        return
+    if args.command == "index-definition":
+        run_index_definition(args)
+        return
+    if args.command == "changes":
+        run_changes(args)
+        return
+    if args.command == "schedule":
+        # Every run it starts writes its own run report
+        run_schedule(args)
+        return
+
+    run_metrics.run_name = run_name
+    with profile_run(args, run_name):
+        if args.command == "load":
+            run_load(args)
+        elif args.command == "snapshot":
+            run_snapshot(args)
+        elif args.command == "retry":
+            run_retry(args)
+        elif args.command == "history":
+            run_history(args)
+        elif args.command == "migrate":
+            run_migrate(args)
+        else:
+            run_ingestion(args)
@@ -0,0 +1,267 @@
+import os
+
+# ==========================================
+# 🧱 CONFIGURATION
+# ==========================================
+# Single source of truth for every ingestion path. Everything is read from
+# the environment so the Windows .bat launchers and cron keep working.
+# Keep this module stdlib-only: heavy clients are imported on first use.
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Database and AI Configuration
+MONGO_URI = (os.getenv("MONGO_URI") or "").strip()
+DB_NAME_PROD = "railnology"
+DB_NAME_QA = "railnology_qa"
+COLLECTION_NAME = "knowledge_chunks"
+OPENAI_API_KEY = (os.getenv("OPENAI_API_KEY") or "").strip()
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+VECTOR_INDEX_NAME = "default"
+
+# --- EMBEDDING BACKENDS (embedding.py) ---
+# openai = EMBEDDING_MODEL over the API; local = a sentence-transformers model
+# on this machine's CPU (pip install sentence-transformers, plus optimum/onnxruntime
+# for the onnx backend); stub = hash vectors for dry runs. Each collection
+# generation records its model, and searches embed queries with that same model.
+EMBEDDERS = ("openai", "local", "stub")
+DEFAULT_EMBEDDER = (os.getenv("EMBEDDER") or "openai").strip()
+# Directory of a downloaded sentence-transformers model, e.g. all-MiniLM-L6-v2
+LOCAL_EMBEDDING_MODEL_PATH = (os.getenv("LOCAL_EMBEDDING_MODEL_PATH") or "").strip()
+LOCAL_EMBEDDING_BACKEND = (os.getenv("LOCAL_EMBEDDING_BACKEND") or "torch").strip()
+# Texts per forward pass, and forward passes run in parallel on a thread pool
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE") or 32)
+LOCAL_EMBEDDING_WORKERS = int(os.getenv("LOCAL_EMBEDDING_WORKERS") or 2)
+# Metadata the vector index can pre-filter on ($vectorSearch `filter`); see search/filters.py
+VECTOR_FILTER_FIELDS = ("document_type", "source", "part", "rule_system", "category")
+
+# --- TOKEN BUDGETS (tokens.py) ---
+# Tokens are counted with tiktoken's encoding for the embedding model; without it
+# (or offline without TIKTOKEN_CACHE_DIR) a conservative 3-chars-per-token estimate is used
+TOKENIZER_ENCODING = "cl100k_base"
+# The model rejects inputs over 8191 tokens
+EMBEDDING_MAX_TOKENS = 8191
+# Character chunker budget per chunk, with headroom under EMBEDDING_MAX_TOKENS
+MAX_TOKENS_PER_CHUNK = int(os.getenv("MAX_TOKENS_PER_CHUNK") or 8000)
+# One embeddings request carries up to this many inputs / total tokens (API caps: 2048 / 300k)
+EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS") or 2048)
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS") or 100000)
+
+# --- STRUCTURED CHUNKING (--chunker structured) ---
+# Splits regulations at paragraph markers ((a), (1), (i), (A)) and operating rules
+# at sub-rules, packing paragraphs into retrieval units of about this many tokens
+CHUNKERS = ("character", "structured")
+DEFAULT_CHUNKER = (os.getenv("CHUNKER") or "character").strip()
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS") or 350)
+# A single paragraph longer than this is split on sentence boundaries
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS") or 800)
+
+# --- NEAR-DUPLICATE COLLAPSING (dedup.py) ---
+# Chunks whose word shingles overlap at least this much (estimated Jaccard) are
+# embedded once; the kept chunk lists every place the text appears in `citations`
+DEDUP_ENABLED = (os.getenv("DEDUP") or "1").strip().lower() not in ("0", "false", "no", "off")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD") or 0.9)
+DEDUP_SHINGLE_WORDS = 5
+
+# --- FRA 49 CFR REGULATION BASELINE ---
+# Renderer endpoint for the text in force on a date (YYYY-MM-DD) or "current"
+ECFR_RENDERER_URL = "https://www.ecfr.gov/api/renderer/v1/content/enhanced/{date}/title-49"
+ECFR_API_URL = ECFR_RENDERER_URL.format(date="current")
+# Scope: ENTIRE FRA (Chapter II, Parts 200 through 299)
+TARGET_PARTS = list(range(200, 300))
+# Short sleep between parts to be polite to the government API
+ECFR_REQUEST_DELAY_SECONDS = 0.5
+
+# eCFR "up to date as of" date for title 49, stamped on change events and chunk versions
+ECFR_TITLES_URL = "https://www.ecfr.gov/api/versioner/v1/titles.json"
+# Dates on which sections of a part changed (?part=236), for point-in-time backfills
+ECFR_VERSIONS_URL = "https://www.ecfr.gov/api/versioner/v1/versions/title-49.json"
+# eCFR point-in-time history starts here
+ECFR_HISTORY_START = "2017-01-03"
+
+# Public FRA Data Sources (for Safety Guidance)
+FRA_ADVISORY_URL = "https://railroads.dot.gov/safety-data-analysis/safety/safety-advisories"
+FRA_BULLETIN_URL = "https://railroads.dot.gov/safety/technical-advisories-bulletins-notices"
+
+# --- CHUNK DOCUMENT LAYOUT (layout.py) ---
+# compact: per-source strings (title, url, effective date...) live once in KNOWLEDGE_SOURCES_COLLECTION
+# and hot fields get short names; legacy: every chunk carries everything. Each generation records its
+# layout; new generations (--swap, `migrate`, an empty collection) get CHUNK_LAYOUT.
+CHUNK_LAYOUTS = ("legacy", "compact")
+CHUNK_LAYOUT = (os.getenv("CHUNK_LAYOUT") or "compact").strip()
+KNOWLEDGE_SOURCES_COLLECTION = "knowledge_sources"
+
+# --- REGULATORY CHANGE FEED (changes.py) ---
+# Last seen text/hash of every CFR section, and the append-only section change log
+REGULATION_SECTIONS_COLLECTION = "regulation_sections"
+REGULATION_CHANGES_COLLECTION = "regulation_changes"
+# Unified diffs are cut here so one rewritten part cannot bloat the log
+CHANGE_DIFF_MAX_CHARS = int(os.getenv("CHANGE_DIFF_MAX_CHARS") or 20000)
+
+# --- POINT-IN-TIME REGULATIONS (versions.py) ---
+# Regulation chunks carry valid_from (and content_hash). Superseded versions move to
+# this collection with their valid_to, so `as_of` searches can read the text of any date
+# while the live generation stays current-only. One chunk set per distinct section text.
+REGULATION_VERSIONS_COLLECTION = "regulation_versions"
+# Range-filtered by $vectorSearch, so the vector index declares them next to VECTOR_FILTER_FIELDS
+VERSION_FILTER_FIELDS = ("valid_from", "valid_to")
+
+# --- INGESTION SCHEDULER (scheduler.py) ---
+# Lock files, run state and per-task logs of `python -m railnology_ingest schedule`
+SCHEDULER_DIR = (os.getenv("SCHEDULER_DIR") or os.path.join(SCRIPTS_DIR, "scheduler")).strip()
+# How often the scheduler wakes up to reap finished runs and start due ones
+SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS") or 30)
+# Scheduled runs in flight at once, whatever their task
+SCHEDULER_MAX_RUNNING = int(os.getenv("SCHEDULER_MAX_RUNNING") or 2)
+
+def _scheduled_task(name, every_hours, jitter_minutes, lock, priority):
+    # SCHEDULE_<NAME>_EVERY_HOURS / SCHEDULE_<NAME>_JITTER_MINUTES override the defaults
+    prefix = f"SCHEDULE_{name.upper()}"
+    return {
+        "every_hours": float(os.getenv(f"{prefix}_EVERY_HOURS") or every_hours),
+        "jitter_minutes": float(os.getenv(f"{prefix}_JITTER_MINUTES") or jitter_minutes),
+        "lock": lock,
+        "priority": priority,
+    }
+
+# Cadence, random extra delay (spreads runs so restarts don't fire everything at once),
+# the lock they take, and priority (lower first when SCHEDULER_MAX_RUNNING is reached)
+SCHEDULER_TASKS = {
+    "cfr_hot": _scheduled_task("cfr_hot", 3, 15, "cfr", 0),
+    "cfr": _scheduled_task("cfr", 24, 60, "cfr", 1),
+    "guidance": _scheduled_task("guidance", 12, 30, "guidance", 2),
+    "jobs": _scheduled_task("jobs", 6, 20, "jobs", 2),
+    "rulebooks": _scheduled_task("rulebooks", 168, 120, "rulebooks", 3),
+}
+# Runs (scheduled or by hand) holding the same lock at once, i.e. concurrent load on one upstream
+INGEST_CONCURRENCY = {
+    "cfr": int(os.getenv("CFR_CONCURRENCY") or 1),
+    "guidance": int(os.getenv("GUIDANCE_CONCURRENCY") or 1),
+    "rulebooks": int(os.getenv("RULEBOOKS_CONCURRENCY") or 1),
+    "jobs": int(os.getenv("JOBS_CONCURRENCY") or 1),
+}
+# A failed run is retried this soon (or at its next cadence, if sooner); a locked one sooner still
+SCHEDULER_RETRY_MINUTES = float(os.getenv("SCHEDULER_RETRY_MINUTES") or 30)
+SCHEDULER_LOCKED_RETRY_MINUTES = float(os.getenv("SCHEDULER_LOCKED_RETRY_MINUTES") or 5)
+# Hot CFR parts (refreshed by cfr_hot): amended within this many days, or queried at least
+# SCHEDULER_HOT_MIN_QUERIES times in that window (server.js counts regulation hits per part and day)
+SCHEDULER_HOT_DAYS = int(os.getenv("SCHEDULER_HOT_DAYS") or 30)
+SCHEDULER_HOT_MIN_QUERIES = int(os.getenv("SCHEDULER_HOT_MIN_QUERIES") or 25)
+SCHEDULER_HOT_MAX_PARTS = int(os.getenv("SCHEDULER_HOT_MAX_PARTS") or 12)
+REGULATION_QUERY_STATS_COLLECTION = "regulation_query_stats"
+
+# --- 📚 RULEBOOK REGISTRY ---
+# Each *.json file in this directory describes one rulebook (GCOR, NORAC, CROR,
+# carrier timetables...). Add a file there instead of editing code.
+RULEBOOK_CONFIG_DIR = (os.getenv("RULEBOOK_CONFIG_DIR") or os.path.join(SCRIPTS_DIR, "rulebooks")).strip()
+RULEBOOK_REQUIRED_KEYS = ('system_name', 'title', 'effective_date', 'pdf_path')
+# Rulebooks are processed as independent jobs in a worker pool
+RULEBOOK_WORKERS = int(os.getenv("RULEBOOK_WORKERS") or 4)
+
+# --- WRITER STAGE (see sinks.BulkWriter) ---
+# A batch is flushed when it reaches either limit; 16MB is the hard MongoDB message ceiling
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE") or 500)
+WRITE_BATCH_BYTES = int(os.getenv("WRITE_BATCH_BYTES") or 8 * 1024 * 1024)
+WRITER_WORKERS = int(os.getenv("WRITER_WORKERS") or 3)
+# Optional relaxed write concern for bulk loads, e.g. BULK_WRITE_CONCERN=1 (w=1, no journal wait)
+BULK_WRITE_CONCERN = (os.getenv("BULK_WRITE_CONCERN") or "").strip()
+
+# --- LOCAL SINK (--sink local) ---
+# Runs are written to <LOCAL_DATASET_DIR>/<run_id> unless --local-path is given
+LOCAL_DATASET_DIR = (os.getenv("LOCAL_DATASET_DIR") or os.path.join(SCRIPTS_DIR, "datasets")).strip()
+
+# --- SEARCH SNAPSHOTS (snapshot.py) ---
+# Immutable, memory-mappable exports of a generation for search nodes:
+# <SNAPSHOT_DIR>/<snapshot_id>/ plus a CURRENT file naming the one to serve
+SNAPSHOT_DIR = (os.getenv("SNAPSHOT_DIR") or os.path.join(SCRIPTS_DIR, "snapshots")).strip()
+# Older snapshots beyond this many are pruned after an export (CURRENT is always kept)
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP") or 3)
+
+# --- SEARCH SERVER (scripts/search_server.py) ---
+# Pre-forked worker processes sharing one snapshot mapping; each coalesces its
+# concurrent requests into micro-batches (search/batching.py)
+SEARCH_SERVER_HOST = (os.getenv("SEARCH_SERVER_HOST") or "127.0.0.1").strip()
+SEARCH_SERVER_PORT = int(os.getenv("SEARCH_SERVER_PORT") or 8765)
+SEARCH_SERVER_WORKERS = int(os.getenv("SEARCH_SERVER_WORKERS") or os.cpu_count() or 1)
+# Most queries scored by one matrix product, and how long the first one waits for company
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX") or 64)
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("SEARCH_BATCH_WINDOW_MS") or 2)
+
+# --- DEAD LETTERS (deadletter.py) ---
+# Chunks whose embedding failed after all retries, one JSONL file per run, drained by `retry`
+DEAD_LETTER_DIR = (os.getenv("DEAD_LETTER_DIR") or os.path.join(SCRIPTS_DIR, "dead_letters")).strip()
+# Retry n of an entry waits BACKOFF * 2^n seconds (capped), so an outage is not hammered
+DEAD_LETTER_BACKOFF_SECONDS = int(os.getenv("DEAD_LETTER_BACKOFF_SECONDS") or 60)
+DEAD_LETTER_MAX_BACKOFF_SECONDS = int(os.getenv("DEAD_LETTER_MAX_BACKOFF_SECONDS") or 6 * 3600)
+# How often `retry --loop` wakes up when nothing is due sooner
+DEAD_LETTER_POLL_SECONDS = int(os.getenv("DEAD_LETTER_POLL_SECONDS") or 300)
+
+# --- BULK LOAD (load command) ---
+# Regular indexes on knowledge_chunks, matching the scopes ingestion deletes by.
+# `load --rebuild-indexes` drops them before the load and builds them once afterwards.
+SECONDARY_INDEXES = [
+    [("part", 1), ("source", 1), ("document_type", 1)],
+    [("rule_system", 1)],
+    [("document_type", 1)],
+    [("section_id", 1)],
+    # search.expand: all chunks of one section, in order
+    [("parent_section_id", 1), ("chunk_index", 1)],
+]
+
+# --- BLUE/GREEN REBUILDS (--swap) ---
+# Readers resolve COLLECTION_NAME through this alias document; see swap.resolve_active_collection_name()
+ALIAS_COLLECTION_NAME = "collection_aliases"
+# Previous generations kept around for --rollback
+KEEP_GENERATIONS = int(os.getenv("KEEP_GENERATIONS") or 2)
+# A staging build must hold at least this share of the live chunk count to be promoted
+SWAP_MIN_COUNT_RATIO = float(os.getenv("SWAP_MIN_COUNT_RATIO") or 0.9)
+SEARCH_INDEX_TIMEOUT_SECONDS = 600
+SWAP_SAMPLE_QUERIES = [
+    "What is the maximum allowable speed for Class 3 track?",
+    "Hours of service limits for train employees",
+    "Requirements for a job briefing before switching",
+]
+
+# --- SEARCH RERANKING (search/rerank.py) ---
+# Candidates fetched from $vectorSearch for the second-stage reranker to reorder
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES") or 50)
+# Weight of each reranker feature; all features are scaled to 0..1
+RERANK_WEIGHTS = {
+    "vector": 1.0,      # $vectorSearch score, relative to the best candidate
+    "lexical": 0.35,    # IDF-weighted share of query terms found in the chunk
+    "citation": 0.5,    # query names this part/section/rule
+    "recency": 0.05,    # effective_date / last_updated, newest candidate = 1
+    "prior": 1.0,       # RERANK_DOCUMENT_TYPE_PRIORS
+}
+RERANK_DOCUMENT_TYPE_PRIORS = {"Regulation": 0.03, "Operating Rule": 0.03, "Safety Guidance": 0.0}
+# Labelled queries for scripts/eval_search.py (top-3 precision, raw vs reranked)
+SEARCH_GOLDEN_SET = os.path.join(SCRIPTS_DIR, "search_golden.json")
+
+# --- SEARCH SNIPPETS (search/snippets.py) ---
+# Characters of each hit's text $vectorSearch returns unless full text is asked for,
+# cut by Atlas around the first query term; the reranker reads 3000 (LEXICAL_CHARS)
+SEARCH_TEXT_CHARS = int(os.getenv("SEARCH_TEXT_CHARS") or 3000)
+# Characters kept before that first match
+SNIPPET_LEAD_CHARS = int(os.getenv("SNIPPET_LEAD_CHARS") or 200)
+# Length of the highlighted snippet shown (and served) per hit
+SNIPPET_CHARS = int(os.getenv("SNIPPET_CHARS") or 240)
+
+# --- QUERY RESULT CACHE (search/cache.py) ---
+# Entries are keyed on the index generation, which every ingest/load/rollback bumps;
+# readers re-check the generation at most this often
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE") or 1024)
+GENERATION_CHECK_SECONDS = float(os.getenv("GENERATION_CHECK_SECONDS") or 5)
+
+
+def get_mongo_client():
+    from pymongo import MongoClient
+    return MongoClient(MONGO_URI)
+
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+def get_db_name():
+    """Determines database name based on environment variable."""
+    node_env = os.getenv("NODE_ENV", "production")
+    return DB_NAME_QA if node_env == 'qa' else DB_NAME_PROD
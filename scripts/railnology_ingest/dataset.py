@@ -0,0 +1,264 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import threading
+from array import array
+from datetime import datetime, timezone
+
+# ==========================================
+# 💾 LOCAL CHUNK DATASET
+# ==========================================
+# On-disk copy of exactly what MongoSink would insert, so ingestion can run
+# without MongoDB and an existing run can be bulk-loaded later. Layout:
+#
+#   <root>/manifest.json
+#   <root>/document_type=Regulation/source=FRA/part-00000.jsonl   one document per line
+#   <root>/document_type=Regulation/source=FRA/part-00000.f32     embeddings, float32 row-major
+#
+# or part-00000.parquet (embedding as a fixed_size_list<float32> column) with
+# --local-format parquet. Row i of a .jsonl file is row i of its .f32 file.
+# Datetimes are stored as MongoDB Extended JSON ({"$date": ...}).
+
+DATASET_FORMATS = ("jsonl", "parquet")
+MANIFEST_NAME = "manifest.json"
+PARTITION_KEYS = ("document_type", "source")
+ROWS_PER_FILE = 50000
+
+
+def partition_dir(doc):
+    """Hive-style partition path for a chunk document, e.g. document_type=Regulation/source=FRA."""
+    parts = []
+    for key in PARTITION_KEYS:
+        value = re.sub(r'[^A-Za-z0-9._-]+', '_', str(doc.get(key) or 'unknown'))
+        parts.append(f"{key}={value}")
+    return os.path.join(*parts)
+
+def to_json_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def from_json_value(value):
+    if isinstance(value, dict) and set(value) == {"$date"}:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def parquet_columns(rows):
+    """
+    (arrays, schema) over the union of the rows' keys, each column typed from all its values.
+    Optional fields (context, citations, valid_from...) are null where a row lacks them, rather
+    than dropped for the whole file when the first row does; iter_dataset() leaves nulls out.
+    """
+    import pyarrow as pa
+
+    keys = list(dict.fromkeys(key for row in rows for key in row))
+    arrays = [pa.array([row.get(key) for row in rows]) for key in keys]
+    return arrays, pa.schema([(key, column.type) for key, column in zip(keys, arrays)])
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Partition:
+    def __init__(self, directory):
+        self.directory = directory
+        self.file_index = 0
+        self.rows = 0
+        self.docs = None
+        self.vectors = None
+        self.buffer = []
+
+
+class DatasetWriter:
+    """Streams chunk documents into a partitioned JSONL+float32 or Parquet dataset."""
+
+    def __init__(self, root, fmt="jsonl", rows_per_file=ROWS_PER_FILE, model=None):
+        if fmt not in DATASET_FORMATS:
+            raise ValueError(f"Unknown dataset format '{fmt}' (choose from {', '.join(DATASET_FORMATS)})")
+        if os.path.isdir(root) and os.listdir(root):
+            raise FileExistsError(f"Dataset directory is not empty: {root}")
+        if fmt == "parquet":
+            # Fail at startup, not after an hour of embedding
+            import pyarrow  # noqa: F401
+
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.format = fmt
+        self.rows_per_file = rows_per_file
+        self.model = model
+        self.dimensions = None
+        self.partitions = {}
+        self.files = []
+        self.lock = threading.Lock()
+
+    def write(self, doc):
+        vector = doc.get('embedding') or []
+        with self.lock:
+            if self.dimensions is None:
+                self.dimensions = len(vector)
+            elif len(vector) != self.dimensions:
+                raise ValueError(f"Embedding has {len(vector)} dimensions, dataset has {self.dimensions}")
+
+            key = partition_dir(doc)
+            partition = self.partitions.get(key)
+            if partition is None:
+                partition = self.partitions[key] = _Partition(os.path.join(self.root, key))
+                os.makedirs(partition.directory, exist_ok=True)
+
+            if self.format == "parquet":
+                partition.buffer.append(doc)
+                if len(partition.buffer) >= self.rows_per_file:
+                    self._flush_parquet(partition)
+            else:
+                self._write_jsonl(partition, doc, vector)
+
+    def _write_jsonl(self, partition, doc, vector):
+        if partition.docs is None:
+            base = os.path.join(partition.directory, f"part-{partition.file_index:05d}")
+            partition.docs = open(f"{base}.jsonl", 'w', encoding='utf-8')
+            partition.vectors = open(f"{base}.f32", 'wb')
+
+        row = {k: to_json_value(v) for k, v in doc.items() if k not in ('embedding', '_id')}
+        partition.docs.write(json.dumps(row, ensure_ascii=False) + "\n")
+        partition.vectors.write(array('f', vector).tobytes())
+        partition.rows += 1
+
+        if partition.rows >= self.rows_per_file:
+            self._close_jsonl(partition)
+
+    def _close_jsonl(self, partition):
+        if partition.docs is None:
+            return
+        docs_path, vectors_path = partition.docs.name, partition.vectors.name
+        partition.docs.close()
+        partition.vectors.close()
+        self.files.append({
+            'path': os.path.relpath(docs_path, self.root),
+            'embeddings_path': os.path.relpath(vectors_path, self.root),
+            'rows': partition.rows,
+            'sha256': file_sha256(docs_path),
+            'embeddings_sha256': file_sha256(vectors_path),
+        })
+        partition.docs = partition.vectors = None
+        partition.rows = 0
+        partition.file_index += 1
+
+    def _flush_parquet(self, partition):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not partition.buffer:
+            return
+        rows = [{k: v for k, v in doc.items() if k not in ('embedding', '_id')} for doc in partition.buffer]
+        flat = array('f')
+        for doc in partition.buffer:
+            flat.extend(doc['embedding'])
+
+        arrays, schema = parquet_columns(rows)
+        table = pa.Table.from_arrays(arrays, schema=schema)
+        embeddings = pa.FixedSizeListArray.from_arrays(pa.array(flat, type=pa.float32()), self.dimensions)
+        table = table.append_column('embedding', embeddings)
+
+        path = os.path.join(partition.directory, f"part-{partition.file_index:05d}.parquet")
+        pq.write_table(table, path)
+        self.files.append({
+            'path': os.path.relpath(path, self.root),
+            'embeddings_path': None,
+            'rows': len(rows),
+            'sha256': file_sha256(path),
+            'embeddings_sha256': None,
+        })
+        partition.buffer = []
+        partition.file_index += 1
+
+    def close(self):
+        """Flushes every partition and writes manifest.json. Returns the manifest."""
+        with self.lock:
+            for partition in self.partitions.values():
+                if self.format == "parquet":
+                    self._flush_parquet(partition)
+                else:
+                    self._close_jsonl(partition)
+
+            manifest = {
+                'format': self.format,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'model': self.model,
+                'dimensions': self.dimensions,
+                'dtype': 'float32',
+                'byteorder': sys.byteorder,
+                'partition_keys': list(PARTITION_KEYS),
+                'total_rows': sum(f['rows'] for f in self.files),
+                'files': sorted(self.files, key=lambda f: f['path']),
+            }
+            with open(os.path.join(self.root, MANIFEST_NAME), 'w', encoding='utf-8') as file:
+                json.dump(manifest, file, indent=2)
+            return manifest
+
+
+# --- Reading (bulk loader, snapshots) ---
+
+def read_manifest(root):
+    with open(os.path.join(root, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def verify_files(root, manifest):
+    """Returns a list of problems (missing files, checksum mismatches); empty when the dataset is intact."""
+    problems = []
+    for entry in manifest['files']:
+        for key, checksum_key in (('path', 'sha256'), ('embeddings_path', 'embeddings_sha256')):
+            if not entry.get(key):
+                continue
+            path = os.path.join(root, entry[key])
+            if not os.path.exists(path):
+                problems.append(f"missing {entry[key]}")
+            elif file_sha256(path) != entry[checksum_key]:
+                problems.append(f"checksum mismatch in {entry[key]}")
+    return problems
+
+def iter_dataset(root, manifest=None):
+    """Yields the dataset's chunk documents (embedding as a list of floats), file by file."""
+    manifest = manifest or read_manifest(root)
+    dimensions = manifest['dimensions']
+    swap_bytes = manifest.get('byteorder', sys.byteorder) != sys.byteorder
+
+    for entry in manifest['files']:
+        path = os.path.join(root, entry['path'])
+        if manifest['format'] == "parquet":
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches():
+                for row in batch.to_pylist():
+                    yield {k: v for k, v in row.items() if v is not None}
+            continue
+
+        with open(path, 'r', encoding='utf-8') as docs, open(os.path.join(root, entry['embeddings_path']), 'rb') as vectors:
+            for line in docs:
+                doc = {k: from_json_value(v) for k, v in json.loads(line).items()}
+                vector = array('f')
+                vector.fromfile(vectors, dimensions)
+                if swap_bytes:
+                    vector.byteswap()
+                doc['embedding'] = vector.tolist()
+                yield doc
+
+
+class ContentDigest:
+    """Order-independent digest of (section_id, text) pairs, comparable between a dataset and a collection."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def add(self, doc):
+        key = f"{doc.get('section_id')}\x00{doc.get('text')}".encode('utf-8')
+        self.total = (self.total + int.from_bytes(hashlib.sha256(key).digest()[:8], 'big')) % (1 << 64)
+        self.count += 1
+
+    def hexdigest(self):
+        return f"{self.total:016x}"
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timezone
+
+from .config import DEAD_LETTER_DIR, DEAD_LETTER_BACKOFF_SECONDS, DEAD_LETTER_MAX_BACKOFF_SECONDS
+from .dataset import to_json_value, from_json_value
+from .metrics import run_metrics
+
+# ==========================================
+# 📮 DEAD-LETTER STORE (failed embeddings)
+# ==========================================
+# A chunk whose embedding still fails after generate_embeddings' retries is
+# not dropped: the pipeline writes it here (document, embed text, reason) and
+# `python -m railnology_ingest retry [--loop]` embeds it again later, in
+# token-packed batches with per-entry exponential backoff.
+#
+#   <DEAD_LETTER_DIR>/<run_id>.jsonl.partial   still being written by a run
+#   <DEAD_LETTER_DIR>/<run_id>.jsonl           closed, owned by the retry worker
+#
+# The retry worker only rewrites closed files, so it can run while an ingest
+# is appending to its own .partial file.
+
+PARTIAL_SUFFIX = ".partial"
+
+
+def backoff_seconds(attempts):
+    return min(DEAD_LETTER_BACKOFF_SECONDS * 2 ** attempts, DEAD_LETTER_MAX_BACKOFF_SECONDS)
+
+def encode_doc(doc):
+    return {key: to_json_value(value) for key, value in doc.items() if key != 'embedding'}
+
+def decode_doc(doc):
+    return {key: from_json_value(value) for key, value in doc.items()}
+
+
+class DeadLetterStore:
+    """
+    Append-only JSONL dead letters for one run (add/close), plus the reader/rewriter side
+    used by the retry worker (pending/files/rewrite). Thread-safe for concurrent jobs.
+    """
+
+    def __init__(self, root=DEAD_LETTER_DIR, run_id=None, target=None):
+        self.root = root
+        self.run_id = run_id
+        # Where the chunks belonged: {"collection": name} or {"dataset": path}
+        self.target = target or {}
+        self.added = 0
+        self.file = None
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.root, f"{self.run_id}.jsonl")
+
+    def add(self, doc, embed_text, reason, model, token_count=None):
+        now = time.time()
+        entry = {
+            'section_id': doc.get('section_id'),
+            'parent_section_id': doc.get('parent_section_id'),
+            'reason': reason or "empty embedding",
+            'model': model,
+            'target': self.target,
+            'failed_at': now,
+            'attempts': 0,
+            'next_attempt_at': now + backoff_seconds(0),
+            'token_count': token_count,
+            'embed_text': embed_text,
+            'doc': encode_doc(doc),
+        }
+        with self.lock:
+            if self.file is None:
+                os.makedirs(self.root, exist_ok=True)
+                self.file = open(self.path + PARTIAL_SUFFIX, 'a', encoding='utf-8')
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            # Flush per entry: a crashed run must not lose its dead letters
+            self.file.flush()
+            self.added += 1
+        run_metrics.incr("embedding_dead_lettered")
+
+    def close(self):
+        """Hands the run's dead letters to the retry worker and returns how many are pending overall."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                os.replace(self.path + PARTIAL_SUFFIX, self.path)
+        if self.added:
+            print(f"   📮 {self.added} chunk(s) failed to embed and were dead-lettered to {self.path}.")
+        pending = self.pending()
+        run_metrics.set("dead_letters_pending", pending)
+        return pending
+
+    def files(self):
+        """Closed dead-letter files, oldest run first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".jsonl"))
+
+    def pending(self):
+        """Entries waiting in every file, including runs still in progress."""
+        if not os.path.isdir(self.root):
+            return 0
+        total = 0
+        for name in os.listdir(self.root):
+            if name.endswith(".jsonl") or name.endswith(".jsonl" + PARTIAL_SUFFIX):
+                with open(os.path.join(self.root, name), 'r', encoding='utf-8') as file:
+                    total += sum(1 for line in file if line.strip())
+        return total
+
+    def read(self, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def rewrite(self, path, entries):
+        """Atomically replaces a closed file with the entries still pending (removes it when none are)."""
+        if not entries:
+            os.remove(path)
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+
+def retry_dead_letters(store, embedder, write, is_obsolete=None, accepts=None, now=None):
+    """
+    Re-embeds every due entry of the closed dead-letter files in packed batches.
+    `write(docs)` stores recovered documents; `is_obsolete(entry)` drops entries whose section
+    was re-ingested since; `accepts(target)` skips entries meant for another destination.
+    Failed entries are rescheduled with exponential backoff. Returns a stats dict.
+    """
+    from .embedding import pack_batches, last_embedding_error
+    from .tokens import count_tokens
+
+    now = now or time.time()
+    stats = {'recovered': 0, 'failed': 0, 'obsolete': 0, 'not_due': 0, 'skipped': 0, 'next_attempt_at': None}
+
+    for path in store.files():
+        entries = store.read(path)
+        keep, due = [], []
+        for entry in entries:
+            if entry['model'] != embedder.model or (accepts and not accepts(entry['target'])):
+                # Vectors from another model would not be comparable with the index
+                stats['skipped'] += 1
+                keep.append(entry)
+            elif is_obsolete and is_obsolete(entry):
+                stats['obsolete'] += 1
+            elif entry['next_attempt_at'] > now:
+                stats['not_due'] += 1
+                keep.append(entry)
+            else:
+                due.append(entry)
+
+        token_counts = [entry.get('token_count') or count_tokens(entry['embed_text']) for entry in due]
+        for batch in pack_batches(due, token_counts):
+            with run_metrics.stage("retry_embedding", items=len(batch)):
+                vectors = embedder.embed_batch([entry['embed_text'] for entry in batch])
+
+            recovered = []
+            for entry, vector in zip(batch, vectors):
+                if vector:
+                    doc = decode_doc(entry['doc'])
+                    doc['embedding'] = vector
+                    doc['last_updated'] = datetime.now(timezone.utc)
+                    recovered.append(doc)
+                else:
+                    entry['attempts'] += 1
+                    entry['reason'] = last_embedding_error() or entry['reason']
+                    entry['next_attempt_at'] = now + backoff_seconds(entry['attempts'])
+                    keep.append(entry)
+                    stats['failed'] += 1
+            if recovered:
+                write(recovered)
+                stats['recovered'] += len(recovered)
+
+        store.rewrite(path, keep)
+        for entry in keep:
+            if stats['next_attempt_at'] is None or entry['next_attempt_at'] < stats['next_attempt_at']:
+                stats['next_attempt_at'] = entry['next_attempt_at']
+
+    run_metrics.incr("dead_letters_recovered", stats['recovered'])
+    run_metrics.incr("dead_letters_obsolete", stats['obsolete'])
+    run_metrics.set("dead_letters_pending", store.pending())
+    return stats
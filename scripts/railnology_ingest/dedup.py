@@ -0,0 +1,94 @@
+import re
+import hashlib
+import threading
+
+from .config import DEDUP_THRESHOLD, DEDUP_SHINGLE_WORDS
+
+# ==========================================
+# 🪞 NEAR-DUPLICATE DETECTION (MinHash + LSH)
+# ==========================================
+# Boilerplate repeats across sections and rulebooks (shared definitions,
+# appendix text). Before embedding, the pipeline looks every chunk up here and
+# collapses near-duplicates into the first copy, which keeps a citation for
+# every place the text appears.
+#
+# Signatures are one-permutation MinHash (one hash per shingle, min per bin,
+# empty bins densified from their right neighbour), so they cost O(shingles)
+# in pure Python. LSH splits a signature into BANDS bands of ROWS rows;
+# chunks sharing any band are candidates, confirmed against DEDUP_THRESHOLD.
+
+NUM_BINS = 64
+BANDS = 8
+ROWS = NUM_BINS // BANDS
+HASH_SPACE = 1 << 64
+BIN_WIDTH = HASH_SPACE // NUM_BINS
+# Densified bins are offset so they only match bins densified the same way
+DENSIFY_STEP = 1 << 58
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def shingles(text, size=DEDUP_SHINGLE_WORDS):
+    words = TOKEN_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(text):
+    """One-permutation MinHash signature (NUM_BINS ints) of the word shingles of `text`."""
+    signature = [None] * NUM_BINS
+    for shingle in shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        bin_index, offset = divmod(value, BIN_WIDTH)
+        if signature[bin_index] is None or offset < signature[bin_index]:
+            signature[bin_index] = offset
+
+    for i in range(NUM_BINS):
+        if signature[i] is None:
+            for distance in range(1, NUM_BINS):
+                neighbour = signature[(i + distance) % NUM_BINS]
+                if neighbour is not None and neighbour < DENSIFY_STEP:
+                    signature[i] = neighbour + distance * DENSIFY_STEP
+                    break
+            else:
+                signature[i] = 0
+    return signature
+
+def estimated_similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_BINS
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over chunk signatures. match() returns the entry of an earlier near-duplicate
+    (or None), add() registers a new canonical chunk. Safe to share between job threads.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bands(self, signature):
+        for band in range(BANDS):
+            yield band, tuple(signature[band * ROWS:(band + 1) * ROWS])
+
+    def match(self, signature):
+        best, best_similarity = None, 0.0
+        seen = set()
+        for key in self._bands(signature):
+            for entry in self.buckets.get(key, ()):
+                if id(entry) in seen:
+                    continue
+                seen.add(id(entry))
+                similarity = estimated_similarity(signature, entry['signature'])
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+        return best
+
+    def add(self, signature, entry):
+        entry['signature'] = signature
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, []).append(entry)
+        return entry
@@ -0,0 +1,197 @@
+import os
+import math
+import time
+import struct
+import hashlib
+import threading
+
+from .config import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_BATCH_MAX_INPUTS, EMBEDDING_BATCH_MAX_TOKENS,
+    LOCAL_EMBEDDING_MODEL_PATH, LOCAL_EMBEDDING_BACKEND, LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_WORKERS,
+    get_openai_client,
+)
+from .metrics import run_metrics
+from .tokens import count_tokens
+
+# ==========================================
+# 🧠 EMBEDDER STAGE
+# ==========================================
+# An embedder is any object with `model`, `dimensions`, embed(text) -> vector
+# and embed_batch(texts) -> vectors, where a failed text comes back as [].
+# get_embedder() builds one by backend name for ingestion; embedder_for_model()
+# rebuilds the one a collection or dataset was produced with, for queries.
+
+# Final error of the calling thread's last failed request, for the dead-letter store
+_last_error = threading.local()
+
+def last_embedding_error():
+    return getattr(_last_error, 'message', None)
+
+def generate_embeddings(client, texts, model=EMBEDDING_MODEL):
+    """
+    Embeds several texts in one API request with retry logic.
+    Returns one vector per text, or None when the request keeps failing.
+    """
+    texts = [text.replace("\n", " ") for text in texts]
+    retries = 3
+    for attempt in range(retries):
+        try:
+            # Slight delay to respect OpenAI Rate Limits (RPM)
+            time.sleep(0.05)
+            response = client.embeddings.create(input=texts, model=model)
+            # Prefer the billed token count; fall back to our own count
+            usage = getattr(response, 'usage', None)
+            run_metrics.record_embedding_tokens(model, usage.total_tokens if usage else sum(count_tokens(t) for t in texts))
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            if attempt < retries - 1:
+                run_metrics.incr("embedding_retries")
+                time.sleep(1)
+                continue
+            # Note: We do not exit here to allow other ingestion processes to continue
+            print(f"   ⚠️ Embedding API Error (Final, {len(texts)} input(s)): {e}")
+            _last_error.message = f"{e.__class__.__name__}: {e}"
+            return None
+
+def generate_embedding(client, text, model=EMBEDDING_MODEL):
+    """Generates a vector embedding for a given text string with retry logic."""
+    vectors = generate_embeddings(client, [text], model)
+    if vectors is None:
+        run_metrics.incr("embedding_failures")
+        return []
+    return vectors[0]
+
+def pack_batches(items, token_counts, max_inputs=EMBEDDING_BATCH_MAX_INPUTS, max_tokens=EMBEDDING_BATCH_MAX_TOKENS):
+    """Groups items, in order, into batches under both the input and the total-token cap."""
+    batches = []
+    current, current_tokens = [], 0
+    for item, tokens in zip(items, token_counts):
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class OpenAIEmbedder:
+    """Embeds chunks through the OpenAI embeddings API, one chunk or one packed batch per request."""
+
+    def __init__(self, client=None, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+        self.client = client or get_openai_client()
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, text):
+        """Returns the vector for `text`, or [] when the API keeps failing."""
+        return generate_embedding(self.client, text, self.model)
+
+    def embed_batch(self, texts):
+        """
+        One request for a packed batch (see pack_batches). If the whole batch fails, each text
+        is retried on its own so one bad input cannot cost the others; failures come back as [].
+        """
+        vectors = generate_embeddings(self.client, texts, self.model)
+        if vectors is not None:
+            return vectors
+        if len(texts) == 1:
+            run_metrics.incr("embedding_failures")
+            return [[]]
+        run_metrics.incr("embedding_batch_failures")
+        return [self.embed(text) for text in texts]
+
+
+class StubEmbedder:
+    """
+    Offline embedder: deterministic, unit-length hash vectors (same text, same vector).
+    For throughput benchmarks and dry runs only; the vectors carry no meaning.
+    """
+
+    def __init__(self, dimensions=EMBEDDING_DIMENSIONS, model="stub-shake256"):
+        self.dimensions = dimensions
+        self.model = model
+
+    def embed(self, text):
+        text = text.replace("\n", " ")
+        digest = hashlib.shake_256(text.encode("utf-8")).digest(self.dimensions * 4)
+        values = [v / 2147483648.0 - 1.0 for v in struct.unpack(f"<{self.dimensions}I", digest)]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def embed_batch(self, texts):
+        return [self.embed(text) for text in texts]
+
+
+class LocalEmbedder:
+    """
+    CPU embedder around a sentence-transformers model loaded from a local directory (no network).
+    embed_batch() splits the texts into forward passes of `batch_size` and runs them on a thread
+    pool; torch and onnxruntime release the GIL during inference, so passes overlap.
+    """
+
+    def __init__(self, model_path=LOCAL_EMBEDDING_MODEL_PATH, backend=LOCAL_EMBEDDING_BACKEND,
+                 batch_size=LOCAL_EMBEDDING_BATCH_SIZE, workers=LOCAL_EMBEDDING_WORKERS):
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(f"LOCAL_EMBEDDING_MODEL_PATH must point to a sentence-transformers model directory (got '{model_path}').")
+        from concurrent.futures import ThreadPoolExecutor
+        from sentence_transformers import SentenceTransformer
+
+        kwargs = {"backend": backend} if backend != "torch" else {}
+        self.encoder = SentenceTransformer(model_path, device="cpu", local_files_only=True, **kwargs)
+        self.model = f"local:{os.path.basename(os.path.normpath(model_path))}"
+        self.dimensions = self.encoder.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="local-embed")
+
+    def _encode(self, texts):
+        vectors = self.encoder.encode(texts, batch_size=len(texts), normalize_embeddings=True,
+                                      convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        passes = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors = []
+        try:
+            for result in self.executor.map(self._encode, passes):
+                vectors.extend(result)
+        except Exception as e:
+            print(f"   ⚠️ Local embedding error ({len(texts)} input(s)): {e}")
+            _last_error.message = f"{e.__class__.__name__}: {e}"
+            run_metrics.incr("embedding_failures", len(texts))
+            return [[] for _ in texts]
+        # No API bill, but the token volume is still worth reporting
+        run_metrics.record_embedding_tokens(self.model, sum(count_tokens(text) for text in texts))
+        return vectors
+
+
+def get_embedder(name):
+    """Builds the ingestion embedder for a backend name in config.EMBEDDERS."""
+    if name == "openai":
+        return OpenAIEmbedder(get_openai_client())
+    if name == "local":
+        return LocalEmbedder()
+    if name == "stub":
+        return StubEmbedder()
+    raise ValueError(f"Unknown embedder '{name}'")
+
+def embedder_for_model(model, dimensions=None):
+    """
+    The embedder that produced vectors recorded as `model`, so queries land in the same space.
+    Generations from before models were recorded (model None) used EMBEDDING_MODEL.
+    """
+    if not model or model.startswith("text-embedding-"):
+        return OpenAIEmbedder(get_openai_client(), model=model or EMBEDDING_MODEL)
+    if model.startswith("stub"):
+        return StubEmbedder(dimensions=dimensions or EMBEDDING_DIMENSIONS, model=model)
+    if model.startswith("local:"):
+        embedder = LocalEmbedder()
+        if embedder.model != model:
+            raise ValueError(f"Index was embedded with {model}, but LOCAL_EMBEDDING_MODEL_PATH holds {embedder.model}.")
+        return embedder
+    raise ValueError(f"Don't know how to embed queries for model '{model}'")
@@ -0,0 +1,257 @@
+import os
+import json
+import struct
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from .config import CHUNK_LAYOUT, KNOWLEDGE_SOURCES_COLLECTION
+
+# ==========================================
+# 🗜️ CHUNK DOCUMENT LAYOUTS
+# ==========================================
+# legacy   every chunk repeats its source's strings ("49 CFR", the eCFR url,
+#          the rulebook title and effective date...) and a last_updated date.
+# compact  those strings are stored once in knowledge_sources under a short
+#          id (a hash of the source's identity) that chunks reference as `src`.
+#          Hot per-chunk fields get short names (text -> t, section_id -> sid...).
+#          The write time is the chunk's ObjectId, not a last_updated field,
+#          except on documents rewritten in place (replacement()): ReplaceOne
+#          keeps, or on upsert generates, an _id that is not their write time.
+# Filter fields (VECTOR_FILTER_FIELDS, valid_from/valid_to) keep their names
+# on every chunk: $vectorSearch can only pre-filter on fields of the indexed
+# document, and server.js builds its domain filters on them.
+#
+# Each generation records its layout in the alias doc (swap.collection_layout).
+# Code outside this module only sees legacy-shaped chunks: ChunkCollection
+# carries a collection's layout, encode()/decode() convert documents at the
+# MongoDB boundary, and query()/projection()/field() translate field names.
+#   python -m railnology_ingest migrate [--layout compact|legacy]   (rebuilds the live generation, blue/green)
+
+# Legacy name -> compact name of the per-chunk fields read on every hit
+COMPACT_FIELDS = {
+    "text": "t",
+    "section_id": "sid",
+    "parent_section_id": "psid",
+    "chunk_index": "ci",
+    "chunk_count": "cc",
+    "context": "ctx",
+    "paragraph": "para",
+    "content_hash": "h",
+    "rule_number": "rn",
+}
+LEGACY_FIELDS = {short: name for name, short in COMPACT_FIELDS.items()}
+# What identifies a source (its id is a hash of these) and what moves off the chunks into it
+SOURCE_KEY_FIELDS = ("document_type", "source", "title", "url", "rule_system", "part", "effective_date")
+SOURCE_FIELDS = ("title", "url", "effective_date", "doc_type", "date_issued", "applicable_49cfr")
+
+
+def object_id_at(moment):
+    """A fresh ObjectId whose timestamp is `moment`, so compact chunks keep their original write time."""
+    from bson import ObjectId
+
+    return ObjectId(struct.pack(">I", int(moment.timestamp())) + os.urandom(8))
+
+def source_id(fields):
+    key = {field: fields[field] for field in SOURCE_KEY_FIELDS if fields.get(field) is not None}
+    return hashlib.blake2b(json.dumps(key, sort_keys=True, default=str).encode('utf-8'), digest_size=5).hexdigest()
+
+
+class SourceRegistry:
+    """knowledge_sources, cached in memory: a few hundred small documents shared by every generation."""
+
+    def __init__(self, db):
+        self.collection = db[KNOWLEDGE_SOURCES_COLLECTION]
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def register(self, fields):
+        """Stores a chunk's source fields once per process and returns the source id."""
+        sid = source_id(fields)
+        source = {field: fields[field] for field in SOURCE_KEY_FIELDS + SOURCE_FIELDS if fields.get(field) is not None}
+        with self.lock:
+            if self.cache.get(sid) == source:
+                return sid
+            self.cache[sid] = source
+        # Attributes outside the key (e.g. a guidance doc's date_issued) follow the latest write
+        self.collection.update_one({"_id": sid}, {"$set": {**source, "last_updated": datetime.now(timezone.utc)}},
+                                   upsert=True)
+        return sid
+
+    def get(self, sid):
+        if sid is None:
+            return {}
+        with self.lock:
+            if sid in self.cache:
+                return self.cache[sid]
+        source = self.collection.find_one({"_id": sid}, {"_id": 0, "last_updated": 0}) or {}
+        with self.lock:
+            self.cache[sid] = source
+        return source
+
+
+class ChunkLayout:
+    """The legacy layout: documents are stored exactly as built."""
+
+    name = "legacy"
+
+    def encode(self, doc):
+        return doc
+
+    def decode(self, doc):
+        return doc
+
+    def query(self, query):
+        return query
+
+    def projection(self, projection):
+        return projection
+
+    def field(self, name):
+        return name
+
+    def index_keys(self, keys):
+        return [(self.field(name), direction) for name, direction in keys]
+
+    def replacement(self, doc):
+        """encode() for ReplaceOne, which may not change the _id of the document it replaces."""
+        return {key: value for key, value in self.encode(doc).items() if key != "_id"}
+
+
+class CompactLayout(ChunkLayout):
+    name = "compact"
+
+    def __init__(self, sources):
+        self.sources = sources
+
+    def encode(self, doc):
+        stored = {}
+        for key, value in doc.items():
+            if key in SOURCE_FIELDS:
+                continue
+            if key == "last_updated":
+                stored["_id"] = object_id_at(value)
+                continue
+            stored[COMPACT_FIELDS.get(key, key)] = value
+        stored["src"] = self.sources.register(doc)
+        return stored
+
+    def decode(self, doc):
+        chunk = {LEGACY_FIELDS.get(key, key): value for key, value in doc.items()}
+        object_id = chunk.pop("_id", None)
+        if hasattr(object_id, "generation_time"):
+            # A stored last_updated (replacement()) wins over the ObjectId's time
+            chunk.setdefault("last_updated", object_id.generation_time)
+        elif object_id is not None:
+            chunk["_id"] = object_id
+        for key, value in self.sources.get(chunk.pop("src", None)).items():
+            chunk.setdefault(key, value)
+        return chunk
+
+    def replacement(self, doc):
+        replacement = super().replacement(doc)
+        if doc.get("last_updated") is not None:
+            replacement["last_updated"] = doc["last_updated"]
+        return replacement
+
+    def field(self, name):
+        if name in SOURCE_FIELDS:
+            raise ValueError(f"'{name}' is stored per source ({KNOWLEDGE_SOURCES_COLLECTION}) in the compact layout")
+        if name == "last_updated":
+            return "_id"
+        return COMPACT_FIELDS.get(name, name)
+
+    def query(self, query):
+        translated = {}
+        for key, value in query.items():
+            if key in ("$and", "$or", "$nor"):
+                translated[key] = [self.query(clause) for clause in value]
+            elif key == "last_updated":
+                translated["_id"] = self._object_id_bounds(value)
+            else:
+                translated[self.field(key)] = value
+        return translated
+
+    def _object_id_bounds(self, value):
+        # last_updated ranges become _id ranges: ObjectIds sort by their timestamp first
+        if isinstance(value, dict):
+            return {op: self._object_id_bounds(operand) for op, operand in value.items()}
+        if isinstance(value, datetime):
+            from bson import ObjectId
+
+            return ObjectId.from_datetime(value)
+        return value
+
+    def projection(self, projection):
+        translated = {}
+        for key, value in projection.items():
+            if key == "_id":
+                continue
+            if key in SOURCE_FIELDS or key == "last_updated":
+                # Inclusions only: decode() fills these in from the source and the ObjectId
+                if value == 1:
+                    translated["src"] = 1
+                    if key == "last_updated":
+                        translated["last_updated"] = 1
+                continue
+            translated[COMPACT_FIELDS.get(key, key)] = value
+        # Exclusion projections keep _id as well: it is the write time
+        return translated
+
+
+LEGACY = ChunkLayout()
+
+
+class ChunkCollection:
+    """A chunk collection together with its layout; everything else is the pymongo collection's."""
+
+    def __init__(self, collection, layout=LEGACY):
+        self.collection = collection
+        self.layout = layout
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def layout_for(db, name):
+    if name not in (None, "legacy", "compact"):
+        raise ValueError(f"unknown chunk layout '{name}'")
+    return CompactLayout(SourceRegistry(db)) if name == "compact" else LEGACY
+
+def chunk_collection(db, collection_name, default=CHUNK_LAYOUT):
+    """
+    Wraps db[collection_name] with its recorded layout. A collection with no layout recorded is
+    legacy when it holds chunks; an empty one gets `default` recorded, so new data starts out compact.
+    """
+    from .swap import collection_layout, record_collection_layout
+
+    collection = db[collection_name]
+    recorded = collection_layout(db, collection_name)
+    if recorded is None:
+        recorded = "legacy" if collection.count_documents({}, limit=1) else default
+        record_collection_layout(db, collection_name, recorded)
+    return ChunkCollection(collection, layout_for(db, recorded))
+
+def layout_of(collection):
+    return getattr(collection, 'layout', LEGACY)
+
+def migrate_chunks(source, target, batch_size=None, workers=None):
+    """
+    Copies every chunk of `source` into `target` (both ChunkCollections), embeddings included,
+    re-encoded in the target's layout. Returns the BulkWriter stats.
+    """
+    from .config import WRITE_BATCH_SIZE, WRITER_WORKERS
+    from .sinks import BulkWriter
+
+    writer = BulkWriter(target, batch_size=batch_size or WRITE_BATCH_SIZE, workers=workers or WRITER_WORKERS)
+    for doc in source.find({}, batch_size=1000):
+        writer.add(target.layout.encode(source.layout.decode(doc)))
+    return writer.report()
+
+def storage_stats(db, collection_name):
+    """(document count, average document bytes) from collStats, or None where that is not available."""
+    try:
+        stats = db.command("collStats", collection_name)
+        return stats.get('count', 0), stats.get('avgObjSize', 0)
+    except Exception:
+        return None
@@ -0,0 +1,104 @@
+import time
+
+from .config import SECONDARY_INDEXES, WRITE_BATCH_SIZE, WRITER_WORKERS
+from .dataset import read_manifest, verify_files, iter_dataset, ContentDigest
+from .metrics import run_metrics
+from .sinks import BulkWriter
+from .layout import layout_of
+
+# ==========================================
+# 📦 BULK LOADER (local dataset -> MongoDB)
+# ==========================================
+# Seeds a knowledge_chunks collection from a dataset written by `ingest --sink local`
+# without re-scraping or re-embedding:
+#   python -m railnology_ingest load scripts/datasets/<run_id> [--drop-existing] [--rebuild-indexes]
+# Files are checked against the manifest checksums before anything is written,
+# and the collection is checked against the manifest counts afterwards.
+# Rows are written in the target collection's layout (see layout.py).
+
+def drop_secondary_indexes(collection):
+    """Drops every regular index except _id. Atlas Search/vector indexes are managed separately and survive."""
+    dropped = [name for name in collection.index_information() if name != "_id_"]
+    for name in dropped:
+        collection.drop_index(name)
+    return dropped
+
+def create_secondary_indexes(collection):
+    from pymongo import IndexModel
+
+    with run_metrics.stage("create_indexes", items=len(SECONDARY_INDEXES)):
+        return collection.create_indexes([IndexModel(layout_of(collection).index_keys(keys)) for keys in SECONDARY_INDEXES])
+
+def collection_digest(collection):
+    layout = layout_of(collection)
+    digest = ContentDigest()
+    with run_metrics.stage("verify_digest"):
+        for doc in collection.find({}, layout.projection({"_id": 0, "section_id": 1, "text": 1}), batch_size=2000):
+            digest.add(layout.decode(doc))
+    return digest
+
+def load_dataset(collection, root, workers=WRITER_WORKERS, batch_size=WRITE_BATCH_SIZE,
+                 drop_existing=False, rebuild_indexes=False):
+    """
+    Streams the dataset at `root` into `collection` through the parallel unordered BulkWriter.
+    Returns True when the dataset verified and every row landed.
+    """
+    manifest = read_manifest(root)
+    print(f"   Dataset: {manifest['total_rows']} docs in {len(manifest['files'])} file(s) "
+          f"({manifest['format']}, {manifest['model']}, {manifest['dimensions']} dims)")
+
+    print("   Verifying file checksums...", end=" ", flush=True)
+    with run_metrics.stage("verify_checksums", items=len(manifest['files'])):
+        problems = verify_files(root, manifest)
+    if problems:
+        print(f"\n   ❌ Dataset is damaged, nothing loaded: {'; '.join(problems)}")
+        return False
+    print("ok.")
+
+    if drop_existing:
+        # delete_many keeps the collection (and its vector index definition); drop() would not
+        deleted = collection.delete_many({}).deleted_count
+        print(f"   🧹 Removed {deleted} existing docs from {collection.name}.")
+
+    if rebuild_indexes:
+        dropped = drop_secondary_indexes(collection)
+        print(f"   Dropped {len(dropped)} secondary index(es) for the load: {', '.join(dropped) or 'none'}")
+
+    count_before = collection.count_documents({})
+    layout = layout_of(collection)
+    digest = ContentDigest()
+    writer = BulkWriter(collection, batch_size=batch_size, workers=workers)
+    started = time.time()
+    for doc in iter_dataset(root, manifest):
+        digest.add(doc)
+        writer.add(layout.encode(doc))
+    stats = writer.report()
+    run_metrics.incr("documents_loaded", stats['inserted'])
+    print(f"   Loaded in {time.time() - started:.1f}s.")
+
+    if rebuild_indexes:
+        print(f"   Building secondary indexes: {', '.join(create_secondary_indexes(collection))}")
+
+    # --- Verification ---
+    ok = True
+    count_after = collection.count_documents({})
+    if digest.count != manifest['total_rows']:
+        print(f"   ❌ Read {digest.count} rows but the manifest lists {manifest['total_rows']}.")
+        ok = False
+    if stats['failed'] or count_after - count_before != manifest['total_rows']:
+        print(f"   ❌ Count mismatch: collection grew by {count_after - count_before}, "
+              f"expected {manifest['total_rows']} ({stats['failed']} failed inserts).")
+        ok = False
+
+    if ok and count_before == 0:
+        # The collection holds exactly the dataset, so the content digests must agree
+        loaded = collection_digest(collection)
+        if loaded.hexdigest() != digest.hexdigest():
+            print(f"   ❌ Content digest mismatch: collection {loaded.hexdigest()}, dataset {digest.hexdigest()}.")
+            ok = False
+        else:
+            print(f"   ✅ Content digest verified ({digest.hexdigest()}).")
+
+    if ok:
+        print(f"   ✅ {manifest['total_rows']} docs loaded into {collection.name} and verified.")
+    return ok
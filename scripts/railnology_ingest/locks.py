@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import socket
+from datetime import datetime, timezone
+
+from .config import SCHEDULER_DIR, INGEST_CONCURRENCY
+
+# ==========================================
+# 🔒 RUN LOCKS (one upstream, N runs at most)
+# ==========================================
+# Every run that hits an upstream takes a slot of its lock first:
+#   cfr (eCFR), guidance (railroads.dot.gov), rulebooks, jobs (RapidAPI)
+# A lock has INGEST_CONCURRENCY[name] slot files, <SCHEDULER_DIR>/locks/<name>.<slot>.lock,
+# held with an OS advisory lock (fcntl, msvcrt on Windows). The OS drops it when
+# the process exits, even on a crash or kill -9, so there are no stale locks to
+# clean up. The file only says who holds it (pid, host, command).
+# Manual runs and the scheduler share these slots, so a hand-started ingest
+# and a scheduled one never double the load on the same site. A run that
+# finds every slot taken exits with EXIT_LOCKED and the scheduler tries again later.
+
+LOCK_DIR = os.path.join(SCHEDULER_DIR, "locks")
+# EX_TEMPFAIL: "try again later"
+EXIT_LOCKED = 75
+
+
+def _try_lock(fd):
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd):
+    if os.name == "nt":
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class RunLock:
+    """One of the INGEST_CONCURRENCY[name] slots of an upstream; acquire() never blocks."""
+
+    def __init__(self, name, slots=None, lock_dir=LOCK_DIR):
+        self.name = name
+        self.slots = max(1, slots or INGEST_CONCURRENCY.get(name, 1))
+        self.lock_dir = lock_dir
+        self.fd = None
+        self.path = None
+
+    def slot_paths(self):
+        return [os.path.join(self.lock_dir, f"{self.name}.{slot}.lock") for slot in range(self.slots)]
+
+    def acquire(self):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        for path in self.slot_paths():
+            # Never truncated or deleted by a contender: the holder rewrites it once it owns the lock
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if not _try_lock(fd):
+                os.close(fd)
+                continue
+            owner = {"pid": os.getpid(), "host": socket.gethostname(), "command": " ".join(sys.argv),
+                     "locked_at": datetime.now(timezone.utc).isoformat()}
+            os.ftruncate(fd, 0)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, json.dumps(owner).encode('utf-8'))
+            self.fd, self.path = fd, path
+            return True
+        return False
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            os.ftruncate(self.fd, 0)
+            _unlock(self.fd)
+        finally:
+            os.close(self.fd)
+            self.fd = self.path = None
+
+    def available(self):
+        """True when a slot is free right now (probes by taking and releasing it)."""
+        if not self.acquire():
+            return False
+        self.release()
+        return True
+
+    def holders(self):
+        """Owner info of the slots currently held by other processes."""
+        holders = []
+        for path in self.slot_paths():
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    content = file.read().strip()
+                if content:
+                    holders.append(json.loads(content))
+            except (OSError, ValueError):
+                # Missing, just released, or unreadable while locked (Windows)
+                continue
+        return holders
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def acquire_run_locks(names):
+    """
+    Takes one slot of each named lock, all or nothing. Returns (held locks, None) or
+    ([], name of the busy lock) after releasing whatever was taken.
+    """
+    held = []
+    for name in names:
+        lock = RunLock(name)
+        if not lock.acquire():
+            release_run_locks(held)
+            return [], name
+        held.append(lock)
+    return held, None
+
+def release_run_locks(locks):
+    for lock in locks:
+        lock.release()
+
+def print_lock_busy(name):
+    holders = RunLock(name).holders()
+    owner = f" (pid {holders[0].get('pid')} on {holders[0].get('host')}: {holders[0].get('command')})" if holders else ""
+    print(f"⏳ A {name} run is already in progress{owner}; not starting another.")
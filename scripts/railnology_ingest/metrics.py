@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# ==========================================
+# 📊 INGESTION RUN METRICS
+# ==========================================
+# Context-manager timers and counters shared by the ingestion scripts.
+# Stage timings are inclusive (fetch_and_process_cfr_part contains the
+# clean/split/embed stages it calls), so compare sibling stages, not totals.
+
+# USD per 1M tokens (https://openai.com/api/pricing)
+EMBEDDING_PRICES_PER_1M_TOKENS = {
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "text-embedding-ada-002": 0.10,
+}
+
+REPORT_DIR = (os.getenv("INGEST_REPORT_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run_reports")).strip()
+PROMETHEUS_PREFIX = "railnology_ingest"
+
+
+class RunMetrics:
+    """Thread-safe accumulator for per-stage timings, throughput counters and embedding spend."""
+
+    def __init__(self, run_name="ingest"):
+        self.run_name = run_name
+        self.lock = threading.Lock()
+        # Objects with stage_entered(name)/stage_exited(name), e.g. the --profile recorders
+        self.stage_listeners = []
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+            self.started_at = datetime.now(timezone.utc)
+            self.started = time.perf_counter()
+            self.stages = {}
+            self.counters = {}
+            self.embedding_tokens = {}
+
+    @contextmanager
+    def stage(self, name, items=1):
+        """Times one call of a stage; `items` is what the stage processed (documents, chunks...)."""
+        listeners = list(self.stage_listeners)
+        for listener in listeners:
+            listener.stage_entered(name)
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            for listener in listeners:
+                listener.stage_exited(name)
+            with self.lock:
+                entry = self.stages.setdefault(name, {'calls': 0, 'items': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+                entry['calls'] += 1
+                entry['items'] += items
+                entry['errors'] += int(failed)
+                entry['seconds'] += elapsed
+                entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """Records a point-in-time value (e.g. a backlog size) alongside the counters."""
+        with self.lock:
+            self.counters[name] = value
+
+    def record_embedding_tokens(self, model, tokens):
+        with self.lock:
+            self.embedding_tokens[model] = self.embedding_tokens.get(model, 0) + tokens
+
+    def estimated_cost(self):
+        return sum(
+            tokens / 1_000_000 * EMBEDDING_PRICES_PER_1M_TOKENS.get(model, 0.0)
+            for model, tokens in self.embedding_tokens.items()
+        )
+
+    def report(self):
+        """Returns the run report as a JSON-serializable dict."""
+        with self.lock:
+            duration = time.perf_counter() - self.started
+            stages = {
+                name: dict(entry,
+                           avg_seconds=entry['seconds'] / entry['calls'] if entry['calls'] else 0.0,
+                           items_per_sec=entry['items'] / entry['seconds'] if entry['seconds'] else 0.0)
+                for name, entry in self.stages.items()
+            }
+            return {
+                'run_name': self.run_name,
+                'run_id': self.run_id,
+                'started_at': self.started_at.isoformat(),
+                'duration_seconds': duration,
+                'stages': stages,
+                'counters': dict(self.counters),
+                'embedding_tokens': dict(self.embedding_tokens),
+                'estimated_cost_usd': self.estimated_cost(),
+            }
+
+    def write_json(self, path=None):
+        report = self.report()
+        if path is None:
+            path = os.path.join(REPORT_DIR, f"{self.run_name}_{self.run_id}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        return path
+
+    def write_prometheus(self, path):
+        """Writes a node_exporter textfile-collector file (atomically, via rename)."""
+        report = self.report()
+        labels = f'run="{self.run_name}"'
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_duration_seconds{{{labels}}} {report['duration_seconds']:.3f}",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds{{{labels}}} {time.time():.0f}",
+            f"# TYPE {PROMETHEUS_PREFIX}_estimated_cost_usd gauge",
+            f"{PROMETHEUS_PREFIX}_estimated_cost_usd{{{labels}}} {report['estimated_cost_usd']:.6f}",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds gauge",
+        ]
+        for name, entry in report['stages'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds{{{labels},stage="{name}"}} {entry["seconds"]:.3f}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_calls gauge")
+        for name, entry in report['stages'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_calls{{{labels},stage="{name}"}} {entry["calls"]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_items gauge")
+        for name, entry in report['stages'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_items{{{labels},stage="{name}"}} {entry["items"]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_errors gauge")
+        for name, entry in report['stages'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_errors{{{labels},stage="{name}"}} {entry["errors"]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_embedding_tokens gauge")
+        for model, tokens in report['embedding_tokens'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_embedding_tokens{{{labels},model="{model}"}} {tokens}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events gauge")
+        for name, value in report['counters'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_events{{{labels},name="{name}"}} {value}')
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+    def print_summary(self):
+        report = self.report()
+        print("\n--- 📊 Run Metrics ---")
+        print(f"   {'Stage':<28}{'Calls':>8}{'Items':>9}{'Total s':>10}{'Avg ms':>10}{'Items/s':>10}")
+        for name, entry in sorted(report['stages'].items(), key=lambda kv: kv[1]['seconds'], reverse=True):
+            print(f"   {name:<28}{entry['calls']:>8}{entry['items']:>9}{entry['seconds']:>10.1f}"
+                  f"{entry['avg_seconds'] * 1000:>10.1f}{entry['items_per_sec']:>10.1f}")
+        for name, value in sorted(report['counters'].items()):
+            print(f"   {name}: {value}")
+        tokens = sum(report['embedding_tokens'].values())
+        print(f"   Tokens embedded: {tokens:,} (est. ${report['estimated_cost_usd']:.4f})")
+        print(f"   Wall time: {report['duration_seconds']:.1f}s")
+
+
+# Process-wide default used by the ingestion scripts
+run_metrics = RunMetrics()
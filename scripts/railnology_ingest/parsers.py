@@ -0,0 +1,124 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+
+# ==========================================
+# 🧾 PARSER STAGE
+# ==========================================
+# Turns raw source payloads (eCFR XML, rulebook PDFs) into primary records:
+# one dict per regulation section / operating rule, before chunking.
+
+# The complexity of this regex is due to varied numbering (1.1, 5.2.1, 280-A).
+# You MUST tune this regex if segmentation is incorrect.
+RULE_PATTERN = re.compile(r'\n(\d[\d\.\-]+[A-Z]?)\s+(.*?)(?=\n\d[\d\.\-]+[A-Z]?\s+|$)', re.DOTALL)
+
+
+def clean_xml_text(xml_string):
+    """Parses the raw XML from eCFR and extracts clean text."""
+    try:
+        # Strip XML declaration if present
+        if xml_string.strip().startswith("<?xml"):
+            xml_string = xml_string.split("?>", 1)[-1]
+
+        # Wrap in root to ensure valid XML parsing
+        root = ET.fromstring(f"<root>{xml_string}</root>")
+        return "".join(root.itertext()).strip()
+    except ET.ParseError:
+        return xml_string
+
+def is_reserved_part(raw_text):
+    """True when an eCFR part is only a '[Reserved]' placeholder."""
+    return len(raw_text) < 200 and "Reserved" in raw_text
+
+def parse_cfr_sections(raw_text, part_number):
+    """Splits one part's clean text on the section symbol (§) into Regulation records."""
+    cfr_docs = []
+    for chunk in raw_text.split("§"):
+        if len(chunk) < 50: continue
+
+        base_section_text = "§" + chunk.strip()
+
+        # Metadata Extraction
+        parts = base_section_text.split(" ")
+        section_id_base = parts[1] if len(parts) > 1 else str(part_number)
+
+        cfr_docs.append({
+            "source": "FRA",
+            "document_type": "Regulation",
+            "title": "49 CFR",
+            "part": part_number,
+            "section_id": section_id_base,
+            "text": base_section_text,
+            "url": f"https://www.ecfr.gov/current/title-49/part-{part_number}"
+        })
+    return cfr_docs
+
+def load_pdf_text(pdf_path):
+    """Reads and extracts text from a local PDF file path using PyPDF2."""
+    import PyPDF2
+
+    try:
+        if not os.path.exists(pdf_path):
+            print(f"   ❌ ERROR: PDF file not found at path: {pdf_path}")
+            return None
+
+        text = ""
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            for page in reader.pages:
+                text += page.extract_text() + "\n"
+
+        if len(text.strip()) < 100:
+            print(f"   ⚠️ WARNING: Extracted very little text from PDF. Check PDF quality/format.")
+
+        return text.strip()
+
+    except Exception as e:
+        print(f"   ❌ FATAL PDF PROCESSING ERROR for {pdf_path}: {e}")
+        return None
+
+def infer_rule_category(rule_number):
+    """Simple category inference (very basic and requires manual refinement)."""
+    if rule_number.startswith('1'): return 'General Responsibilities'
+    if rule_number.startswith('2'): return 'Radio and Communication'
+    if rule_number.startswith('5'): return 'Signals and Movement'
+    if rule_number.startswith('6') or rule_number.startswith('9'): return 'Movement Authority'
+    return 'Miscellaneous'
+
+def segment_operating_rules(rulebook_text, rule_data):
+    """Segments a rulebook's raw text into Operating Rule records."""
+    system_name = rule_data['system_name']
+    effective_date = rule_data['effective_date']
+
+    print(f"--- Segmenting {system_name} Rulebook ({len(rulebook_text)} characters) ---")
+
+    matches = RULE_PATTERN.findall('\n' + rulebook_text)
+
+    if not matches:
+        print(f"   ⚠️ WARNING: Segmentation failed. Zero rules extracted. Check regex.")
+        return [{
+            'source': f'{system_name} Committee', 'document_type': 'Operating Rule',
+            'title': rule_data['title'], 'rule_system': system_name, 'rule_number': '0.0',
+            'rule_title': 'Full Manual Text', 'rule_text': rulebook_text, 'category': 'Full Manual',
+            'effective_date': effective_date
+        }]
+
+    rules = []
+    for rule_number, rule_content in matches:
+        content_lines = rule_content.strip().split('\n', 1)
+        rule_title = content_lines[0].strip() if content_lines else "Untitled Rule"
+
+        rules.append({
+            'source': f'{system_name} Committee',
+            'document_type': 'Operating Rule',
+            'title': rule_data['title'],
+            'rule_system': system_name,
+            'rule_number': rule_number,
+            'rule_title': rule_title,
+            'rule_text': rule_content.strip(),
+            'category': infer_rule_category(rule_number),
+            'effective_date': effective_date
+        })
+
+    print(f"Successfully segmented {len(rules)} rules for {system_name}.")
+    return rules
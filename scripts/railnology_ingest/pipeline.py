@@ -0,0 +1,209 @@
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .config import EMBEDDING_MAX_TOKENS
+from .metrics import run_metrics
+from .embedding import pack_batches, last_embedding_error
+from .tokens import count_tokens
+from .sinks import build_chunk_document, chunk_citation
+from .dedup import NearDuplicateIndex, minhash_signature
+
+# ==========================================
+# 🚂 PIPELINE: Source → Parser → Chunker → Embedder → Sink
+# ==========================================
+# Sources hand out IngestJobs (fetch + parse). The pipeline chunks and embeds
+# their records and streams the documents into the sink. Any object with the
+# same methods can be swapped in at each stage.
+
+
+class Pipeline:
+    """Runs IngestJobs through a chunker, an embedder and a sink."""
+
+    def __init__(self, chunker, embedder, sink, dedup=None, dead_letters=None, incremental=False):
+        """
+        `dedup` collapses near-duplicate chunks before embedding: "job" within each job
+        (safe with per-job replace), "run" across the whole run (full rebuilds only, since
+        a later single-job re-run would delete the copy other jobs' citations point to).
+        Chunks that still fail to embed go to `dead_letters` (a DeadLetterStore) for `retry`.
+        `incremental` skips jobs whose change detection found nothing new (the sink must
+        already hold their chunks, i.e. MongoDB without --swap).
+        """
+        self.chunker = chunker
+        self.embedder = embedder
+        self.sink = sink
+        self.dedup = dedup
+        self.dead_letters = dead_letters
+        self.incremental = incremental
+        self.run_index = NearDuplicateIndex() if dedup == "run" else None
+
+    def collapse_duplicate(self, index, doc):
+        """Registers `doc` in the dedup index. Returns its entry if it is new, None if it was collapsed."""
+        signature = minhash_signature(doc['text'])
+        citation = chunk_citation(doc)
+        with index.lock:
+            entry = index.match(signature)
+            if entry is None:
+                return index.add(signature, {'section_id': doc['section_id'], 'citations': [citation], 'written': False})
+            entry['citations'].append(citation)
+            if entry['written']:
+                # The kept copy came from an earlier job and is already in the sink
+                self.sink.set_citations(entry['section_id'], list(entry['citations']))
+        return None
+
+    def ingest_records(self, records, ticket=None):
+        """
+        Chunks, embeds and writes a list of primary records. Returns the number of chunks written
+        (handed to the sink; sink.barrier(ticket) waits until they are stored).
+        """
+        if not records:
+            return 0
+
+        print(f"\n--- Indexing {records[0]['source']} ({len(records)} primary records) ---")
+
+        index = self.run_index or (NearDuplicateIndex() if self.dedup == "job" else None)
+
+        # Pass 1: chunk everything and collapse near-duplicates, so a kept chunk
+        # knows all of its citations before it is written
+        pending = []
+        collapsed = 0
+        for record in records:
+            with run_metrics.stage("split_large_text"):
+                sub_chunks = self.chunker.chunk(record)
+
+            for j, chunk in enumerate(sub_chunks):
+                if isinstance(chunk, str):
+                    chunk = {'text': chunk}
+                doc = build_chunk_document(record, chunk['text'], j, None, len(sub_chunks),
+                                           chunk.get('context'), chunk.get('paragraph'))
+                entry = None
+                if index is not None:
+                    with run_metrics.stage("deduplicate"):
+                        entry = self.collapse_duplicate(index, doc)
+                    if entry is None:
+                        collapsed += 1
+                        continue
+                # The context header is embedded with the chunk but stored in its own field
+                embed_text = f"{chunk['context']}\n{chunk['text']}" if chunk.get('context') else chunk['text']
+                pending.append((doc, embed_text, entry))
+
+        # Pass 2: embed in token-packed batches, then write
+        token_counts = []
+        with run_metrics.stage("count_tokens", items=len(pending)):
+            for doc, embed_text, _ in pending:
+                doc['token_count'] = count_tokens(embed_text)
+                token_counts.append(doc['token_count'])
+        oversized = sum(1 for tokens in token_counts if tokens > EMBEDDING_MAX_TOKENS)
+        if oversized:
+            run_metrics.incr("chunks_over_embedding_limit", oversized)
+
+        written = 0
+        embed_batch = getattr(self.embedder, 'embed_batch', None)
+        for batch in pack_batches(pending, token_counts):
+            with run_metrics.stage("generate_embedding", items=len(batch)):
+                texts = [embed_text for _, embed_text, _ in batch]
+                vectors = embed_batch(texts) if embed_batch else [self.embedder.embed(text) for text in texts]
+
+            for (doc, embed_text, entry), vector in zip(batch, vectors):
+                if entry is not None:
+                    with index.lock:
+                        entry['written'] = bool(vector)
+                        if len(entry['citations']) > 1:
+                            doc['citations'] = list(entry['citations'])
+
+                if not vector:
+                    # Kept for `retry` instead of silently leaving a hole in the index
+                    if self.dead_letters is not None:
+                        self.dead_letters.add(doc, embed_text, last_embedding_error(), self.embedder.model, doc['token_count'])
+                    continue
+
+                doc['embedding'] = vector
+                self.sink.write(doc, ticket)
+                written += 1
+
+        self.sink.flush()
+        if collapsed:
+            run_metrics.incr("duplicate_chunks_collapsed", collapsed)
+        print(f" ✅ Indexed {written} chunks{f' ({collapsed} near-duplicates collapsed)' if collapsed else ''}.")
+        return written
+
+    def run_job(self, job):
+        """
+        Runs one job end-to-end (load, chunk, embed, write, replace) in isolation.
+        Never raises: failures are reported in the returned summary so other jobs keep going.
+        """
+        started = time.time()
+        try:
+            with run_metrics.stage(job.stage):
+                records = job.load()
+
+                if records is None:
+                    return {'name': job.name, 'status': 'failed', 'records': 0, 'chunks': 0,
+                            'error': 'Nothing loaded', 'seconds': time.time() - started}
+
+                changes = job.detect_changes(records) if job.detect_changes else None
+                if changes is not None and changes.unchanged and self.incremental:
+                    run_metrics.incr("jobs_unchanged")
+                    return {'name': job.name, 'status': 'unchanged', 'records': len(records), 'chunks': 0,
+                            'error': None, 'seconds': time.time() - started}
+
+                if changes is not None:
+                    changes.prepare()
+                written_since = datetime.now(timezone.utc)
+                ticket = self.sink.ticket()
+                chunks = self.ingest_records(records, ticket)
+                # Raises (the job fails, its change set is not committed) unless every new chunk is stored
+                self.sink.barrier(ticket)
+                # IDEMPOTENCY: clear the job's scope only once its replacement is in place, i.e. the
+                # chunks from before this run; a failed job leaves the old ones searchable
+                if job.delete_filter is not None:
+                    self.sink.replace(job.delete_filter, before=written_since)
+                if changes is not None:
+                    changes.commit()
+
+            return {'name': job.name, 'status': 'ok', 'records': len(records), 'chunks': chunks,
+                    'error': None, 'seconds': time.time() - started}
+
+        except Exception as e:
+            return {'name': job.name, 'status': 'failed', 'records': 0, 'chunks': 0,
+                    'error': str(e), 'seconds': time.time() - started}
+
+    def run(self, jobs, workers=1, delay=0.0):
+        """
+        Runs jobs sequentially (with an optional polite `delay` between them) or, when
+        workers > 1, as independent jobs in a thread pool so the total is bounded by the largest.
+        """
+        jobs = list(jobs)
+        results = []
+        if not jobs:
+            print("   ℹ️ Nothing to process. Skipping.")
+            return results
+
+        if workers <= 1:
+            for i, job in enumerate(jobs):
+                print(f"[{i+1}/{len(jobs)}] ", end="", flush=True)
+                result = self.run_job(job)
+                results.append(result)
+                if result['status'] == 'unchanged':
+                    print(f"   ⏭️ [{result['name']}] unchanged since the last sync, not re-indexed.")
+                elif result['status'] != 'ok':
+                    print(f"   ❌ [{result['name']}] {result['error']}")
+                if delay and i < len(jobs) - 1:
+                    time.sleep(delay)
+            return results
+
+        workers = min(workers, len(jobs))
+        print(f"   Processing {len(jobs)} job(s) with {workers} worker(s)...")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job") as executor:
+            futures = [executor.submit(self.run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result['status'] == 'ok':
+                    print(f"\n   ✅ [{result['name']}] {result['records']} records in {result['seconds']:.1f}s")
+                elif result['status'] == 'unchanged':
+                    print(f"\n   ⏭️ [{result['name']}] unchanged, not re-indexed")
+                else:
+                    print(f"\n   ❌ [{result['name']}] FAILED after {result['seconds']:.1f}s: {result['error']}")
+
+        return results
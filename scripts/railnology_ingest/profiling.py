@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .metrics import run_metrics
+
+# ==========================================
+# 🔬 SHARED --profile HOOK
+# ==========================================
+# Used by the railnology_ingest CLI (and its rail_data_scraper.py /
+# ingest_rail_content.py wrappers), scrape_jobs.py and test_search.py.
+# Two modes, both stdlib-only:
+#   cprofile - deterministic; writes a .prof dump (snakeviz, pstats, gprof2dot)
+#              (cProfile/pstats are only imported when this mode is chosen)
+#   sample   - low overhead wall-clock sampler; writes collapsed stacks
+#              (.folded) for flamegraph.pl / speedscope / inferno
+# --profile-stages limits collection to run_metrics.stage() blocks with those names.
+
+PROFILE_DIR = (os.getenv("PROFILE_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")).strip()
+DEFAULT_TOP_N = 25
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+
+
+def add_profile_arguments(parser):
+    """Registers the shared --profile options on a script's ArgumentParser."""
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                       help="Profile this run (default mode: cprofile).")
+    group.add_argument("--profile-out", metavar="PATH",
+                       help="Output file (default: scripts/profiles/<script>_<timestamp>.prof|.folded).")
+    group.add_argument("--profile-stages", metavar="STAGE[,STAGE]",
+                       help="Only profile inside these stages, e.g. generate_embedding,insert_many.")
+    group.add_argument("--profile-top", type=int, default=DEFAULT_TOP_N, metavar="N",
+                       help=f"Hot functions to print at exit (default {DEFAULT_TOP_N}).")
+    group.add_argument("--profile-interval", type=float, default=DEFAULT_SAMPLE_INTERVAL_MS, metavar="MS",
+                       help=f"Sampling interval for --profile sample (default {DEFAULT_SAMPLE_INTERVAL_MS}ms).")
+    return parser
+
+
+class _StageFilter:
+    """Tracks, per thread, whether execution is inside one of the selected stages."""
+
+    def __init__(self, stages):
+        self.stages = set(stages)
+        self.local = threading.local()
+
+    def enter(self, name):
+        if name in self.stages:
+            depth = getattr(self.local, 'depth', 0)
+            self.local.depth = depth + 1
+            return depth == 0
+        return False
+
+    def exit(self, name):
+        if name in self.stages:
+            self.local.depth -= 1
+            return self.local.depth == 0
+        return False
+
+
+class CProfileRecorder:
+    """cProfile across threads. cProfile only sees the thread that enabled it, so one Profile per thread is merged at the end."""
+
+    def __init__(self, stages=None):
+        self.filter = _StageFilter(stages) if stages else None
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _thread_profile(self):
+        profile = getattr(self.local, 'profile', None)
+        if profile is None:
+            import cProfile
+            profile = cProfile.Profile()
+            self.local.profile = profile
+            with self.lock:
+                self.profiles.append(profile)
+        return profile
+
+    def _bootstrap_thread(self, *args):
+        # Runs as the first profile event of every new thread, then hands over to cProfile
+        sys.setprofile(None)
+        self._thread_profile().enable()
+
+    def start(self):
+        if self.filter:
+            run_metrics.stage_listeners.append(self)
+        else:
+            threading.setprofile(self._bootstrap_thread)
+            self._thread_profile().enable()
+
+    def stage_entered(self, name):
+        if self.filter.enter(name):
+            self._thread_profile().enable()
+
+    def stage_exited(self, name):
+        if self.filter.exit(name):
+            self._thread_profile().disable()
+
+    def stop(self):
+        if self.filter:
+            run_metrics.stage_listeners.remove(self)
+        else:
+            threading.setprofile(None)
+        for profile in self.profiles:
+            profile.disable()
+
+    def stats(self):
+        import pstats
+
+        profiles = [p for p in self.profiles if p.getstats()]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def write(self, path):
+        stats = self.stats()
+        if stats is None:
+            return None
+        stats.dump_stats(path)
+        return path
+
+    def print_top(self, top_n):
+        stats = self.stats()
+        if stats is None:
+            print("   (no samples collected - did the selected stages run?)")
+            return
+        stats.sort_stats("cumulative").print_stats(top_n)
+
+
+class SamplingRecorder:
+    """Wall-clock stack sampler built on sys._current_frames(); output is flame-graph collapsed stacks."""
+
+    def __init__(self, stages=None, interval_ms=DEFAULT_SAMPLE_INTERVAL_MS):
+        self.filter_stages = set(stages) if stages else None
+        self.interval = max(interval_ms, 0.1) / 1000.0
+        self.stacks = Counter()
+        self.active_threads = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.samples = 0
+
+    def start(self):
+        if self.filter_stages:
+            run_metrics.stage_listeners.append(self)
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.thread.start()
+
+    def stage_entered(self, name):
+        if name in self.filter_stages:
+            ident = threading.get_ident()
+            with self.lock:
+                self.active_threads[ident] = self.active_threads.get(ident, 0) + 1
+
+    def stage_exited(self, name):
+        if name in self.filter_stages:
+            ident = threading.get_ident()
+            with self.lock:
+                self.active_threads[ident] -= 1
+                if not self.active_threads[ident]:
+                    del self.active_threads[ident]
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with self.lock:
+                wanted = set(self.active_threads) if self.filter_stages else None
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or (wanted is not None and ident not in wanted):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        if self.filter_stages:
+            run_metrics.stage_listeners.remove(self)
+
+    def write(self, path):
+        if not self.stacks:
+            return None
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        return path
+
+    def print_top(self, top_n):
+        total = sum(self.stacks.values())
+        if not total:
+            print("   (no samples collected - did the selected stages run?)")
+            return
+        self_counts = Counter()
+        inclusive_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                self_counts[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_counts[frame] += count
+        print(f"   {total} samples every {self.interval * 1000:.1f}ms")
+        print(f"   {'Self %':>7} {'Total %':>8}  Function")
+        for frame, count in self_counts.most_common(top_n):
+            print(f"   {100.0 * count / total:>6.1f}% {100.0 * inclusive_counts[frame] / total:>7.1f}%  {frame}")
+
+
+@contextmanager
+def profile_run(args, run_name):
+    """Profiles the enclosed block when --profile was given; a no-op otherwise."""
+    mode = getattr(args, 'profile', None)
+    if not mode:
+        yield None
+        return
+
+    stages = [s.strip() for s in (args.profile_stages or "").split(",") if s.strip()]
+    if mode == "sample":
+        recorder = SamplingRecorder(stages, args.profile_interval)
+        extension = "folded"
+    else:
+        recorder = CProfileRecorder(stages)
+        extension = "prof"
+
+    out_path = args.profile_out
+    if not out_path:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        out_path = os.path.join(PROFILE_DIR, f"{run_name}_{stamp}.{extension}")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    scope = f"stages: {', '.join(stages)}" if stages else "whole run"
+    print(f"🔬 Profiling enabled ({mode}, {scope}).")
+    started = time.perf_counter()
+    recorder.start()
+    try:
+        yield recorder
+    finally:
+        recorder.stop()
+        print(f"\n--- 🔬 Profile: top {args.profile_top} ({time.perf_counter() - started:.1f}s profiled) ---")
+        recorder.print_top(args.profile_top)
+        written = recorder.write(out_path)
+        if written:
+            print(f"   📝 Profile written to: {written}")
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import random
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+from .config import (
+    SCRIPTS_DIR, SCHEDULER_DIR, SCHEDULER_TASKS, SCHEDULER_TICK_SECONDS, SCHEDULER_MAX_RUNNING,
+    SCHEDULER_RETRY_MINUTES, SCHEDULER_LOCKED_RETRY_MINUTES, SCHEDULER_HOT_DAYS, SCHEDULER_HOT_MIN_QUERIES,
+    SCHEDULER_HOT_MAX_PARTS, REGULATION_QUERY_STATS_COLLECTION, INGEST_CONCURRENCY,
+)
+from .locks import RunLock, EXIT_LOCKED
+
+# ==========================================
+# ⏰ INGESTION SCHEDULER (DAEMON)
+# ==========================================
+# A long-running loop that refreshes each source on its own cadence instead
+# of re-ingesting the whole corpus by hand:
+#   python -m railnology_ingest schedule [--only cfr_hot,jobs] [--once] [--status] [--dry-run]
+#
+#   cfr_hot    hot 49 CFR parts: amended in the last SCHEDULER_HOT_DAYS (regulation_changes)
+#              or often hit by chat queries (regulation_query_stats, counted by server.js)
+#   cfr        every part, incrementally (unchanged parts are not re-embedded)
+#   guidance   FRA advisories and bulletins
+#   rulebooks  the rulebook registry
+#   jobs       scrape_jobs.py
+#
+# Cadence, jitter and priority come from SCHEDULER_TASKS. Each run is a
+# subprocess of the usual CLI, with its own run report and a log under
+# <SCHEDULER_DIR>/logs, so one crash never takes the daemon down. Runs take
+# slots of the upstream locks in locks.py, so at most INGEST_CONCURRENCY runs
+# use a site at once. That includes hand-started runs and runs left over from
+# a killed scheduler. When more tasks are due than SCHEDULER_MAX_RUNNING
+# allows, the lowest priority starts first. Next due times survive restarts
+# (<SCHEDULER_DIR>/state.json).
+
+STATE_PATH = os.path.join(SCHEDULER_DIR, "state.json")
+LOG_DIR = os.path.join(SCHEDULER_DIR, "logs")
+REPORT_DIR = os.path.join(SCHEDULER_DIR, "reports")
+
+
+def hot_parts(db, days=SCHEDULER_HOT_DAYS, min_queries=SCHEDULER_HOT_MIN_QUERIES, limit=SCHEDULER_HOT_MAX_PARTS):
+    """CFR parts to refresh more often: recently amended ones (newest amendment first), then the most queried."""
+    from .changes import recently_changed_parts
+
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    amended = recently_changed_parts(db, since)
+    queried = {doc['_id']: doc['hits'] for doc in db[REGULATION_QUERY_STATS_COLLECTION].aggregate([
+        {"$match": {"day": {"$gte": since}}},
+        {"$group": {"_id": "$part", "hits": {"$sum": "$hits"}}},
+        {"$match": {"hits": {"$gte": min_queries}}},
+    ])}
+    ranked = sorted(amended, key=lambda part: (amended[part], queried.get(part, 0)), reverse=True)
+    ranked += [part for part in sorted(queried, key=queried.get, reverse=True) if part not in amended]
+    return ranked[:limit]
+
+def task_command(name, parts=None, report=None):
+    """Command line of one run of a scheduled task."""
+    if name == "jobs":
+        return [sys.executable, os.path.join(SCRIPTS_DIR, "scrape_jobs.py")]
+
+    domain = "cfr" if name.startswith("cfr") else name
+    command = [sys.executable, "-m", "railnology_ingest", "ingest", "--only", domain]
+    if domain == "cfr":
+        command.append("--incremental")
+    if parts:
+        command += ["--parts", ",".join(str(part) for part in parts)]
+    if report:
+        command += ["--report", report]
+    return command
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "-"
+
+
+class ScheduledRun:
+    """One task run in flight: its subprocess, log file and run report path."""
+
+    def __init__(self, name, command, report, parts=None):
+        self.name = name
+        self.command = command
+        self.report = report
+        self.parts = parts
+        self.started = time.time()
+        if report and os.path.exists(report):
+            os.remove(report)
+        os.makedirs(LOG_DIR, exist_ok=True)
+        self.log = open(os.path.join(LOG_DIR, f"{name}.log"), 'a', encoding='utf-8')
+        self.log.write(f"\n===== {datetime.now():%Y-%m-%d %H:%M:%S} {' '.join(command)}\n")
+        self.log.flush()
+        self.process = subprocess.Popen(command, cwd=SCRIPTS_DIR, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def poll(self):
+        return self.process.poll()
+
+    def status(self, code):
+        if code == EXIT_LOCKED:
+            return "locked"
+        return "ok" if code == 0 else "failed"
+
+    def close(self):
+        self.log.close()
+
+
+class Scheduler:
+    """Starts due tasks (by priority, within SCHEDULER_MAX_RUNNING and the run locks) and records their outcome."""
+
+    def __init__(self, tasks, max_running=SCHEDULER_MAX_RUNNING, state_path=STATE_PATH, dry_run=False):
+        self.tasks = {name: SCHEDULER_TASKS[name] for name in tasks}
+        self.max_running = max_running
+        self.state_path = state_path
+        self.dry_run = dry_run
+        self.running = {}
+        self.db = None
+        self.state = self.load_state()
+
+        now = time.time()
+        for name, task in self.tasks.items():
+            # First start: spread the tasks over their jitter rather than firing all at once
+            self.state.setdefault(name, {}).setdefault('next_run', now + random.uniform(0, task['jitter_minutes'] * 60))
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        if self.dry_run:
+            return
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        partial = self.state_path + ".partial"
+        with open(partial, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file, indent=2)
+        os.replace(partial, self.state_path)
+
+    def next_run(self, name, status, started, now):
+        task = self.tasks[name]
+        every = task['every_hours'] * 3600
+        if status == "locked":
+            base = now + SCHEDULER_LOCKED_RETRY_MINUTES * 60
+        elif status == "failed":
+            base = now + min(every, SCHEDULER_RETRY_MINUTES * 60)
+        else:
+            # Cadence counts from the start of a run; one that overran it is due again (after jitter) when it ends
+            base = max(started + every, now)
+        return base + random.uniform(0, task['jitter_minutes'] * 60)
+
+    def record(self, name, status, started, finished, **extra):
+        entry = self.state[name]
+        entry.update(last_status=status, last_started=started, last_finished=finished,
+                     next_run=self.next_run(name, status, started, finished), **extra)
+        self.save_state()
+
+    def due(self, now):
+        due = [name for name in self.tasks if name not in self.running and self.state[name]['next_run'] <= now]
+        return sorted(due, key=lambda name: (self.tasks[name]['priority'], self.state[name]['next_run']))
+
+    def get_db(self):
+        if self.db is None:
+            from .config import get_mongo_client, get_db_name
+
+            self.db = get_mongo_client()[get_db_name()]
+        return self.db
+
+    def plan(self, name):
+        """(command, parts, report path) of a task's next run; parts is [] when cfr_hot has nothing to do."""
+        parts = None
+        if name == "cfr_hot":
+            parts = hot_parts(self.get_db())
+        # scrape_jobs.py writes no run report
+        report = None if name == "jobs" else os.path.join(REPORT_DIR, f"{name}.json")
+        return task_command(name, parts, report), parts, report
+
+    def start(self, name, now):
+        lock = self.tasks[name]['lock']
+        if not RunLock(lock).available():
+            print(f"⏳ {name}: every {lock} slot is in use; retrying in {SCHEDULER_LOCKED_RETRY_MINUTES:g} min.")
+            self.record(name, "locked", now, now)
+            return False
+
+        try:
+            command, parts, report = self.plan(name)
+        except Exception as e:
+            print(f"⚠️ {name}: could not plan the run: {e}")
+            self.record(name, "failed", now, now)
+            return False
+        if parts == []:
+            print(f"💤 {name}: no hot parts right now.")
+            self.record(name, "idle", now, now, last_parts=[])
+            return False
+
+        scope = f" (Parts {', '.join(map(str, parts))})" if parts else ""
+        if self.dry_run:
+            print(f"▶️ {name}{scope}: {' '.join(command)}")
+            self.record(name, "dry-run", now, now)
+            return True
+        self.running[name] = ScheduledRun(name, command, report, parts)
+        print(f"▶️ {datetime.now():%H:%M:%S} Started {name}{scope} (pid {self.running[name].process.pid}).")
+        return True
+
+    def reap(self):
+        finished = []
+        for name, run in list(self.running.items()):
+            code = run.poll()
+            if code is None:
+                continue
+            now = time.time()
+            status = run.status(code)
+            run.close()
+            del self.running[name]
+            symbol = {"ok": "✅", "locked": "⏳"}.get(status, "❌")
+            print(f"{symbol} {datetime.now():%H:%M:%S} {name} {status} after {(now - run.started) / 60:.1f} min "
+                  f"(exit {code}; log {run.log.name}).")
+            self.record(name, status, run.started, now, last_duration=now - run.started, last_exit=code,
+                        **({"last_parts": run.parts} if run.parts is not None else {}))
+            finished.append(name)
+        return finished
+
+    def slots_in_use(self, lock):
+        return sum(1 for name in self.running if self.tasks[name]['lock'] == lock)
+
+    def tick(self):
+        """Reaps finished runs and starts due ones; returns the names of the tasks handled."""
+        handled = self.reap()
+        now = time.time()
+        for name in self.due(now):
+            if len(self.running) >= self.max_running:
+                break
+            if self.slots_in_use(self.tasks[name]['lock']) >= INGEST_CONCURRENCY.get(self.tasks[name]['lock'], 1):
+                # Another task of ours holds the lock (cfr and cfr_hot): stays due until it is done
+                continue
+            self.start(name, now)
+            if name not in self.running:
+                handled.append(name)
+        return handled
+
+    def run(self, once=False):
+        """Loops until interrupted; with `once`, starts every task now and returns when each has run."""
+        pending = set(self.tasks)
+        if once:
+            for name in self.tasks:
+                self.state[name]['next_run'] = 0
+
+        print(f"⏰ Scheduling {', '.join(self.tasks)} (at most {self.max_running} at once).")
+        try:
+            while True:
+                # In --once mode a task whose lock is busy counts as handled: it is rescheduled, not waited for
+                pending.difference_update(self.tick())
+                if once and not pending:
+                    break
+                upcoming = min([self.state[name]['next_run'] for name in self.tasks if name not in self.running] or
+                               [time.time() + SCHEDULER_TICK_SECONDS])
+                time.sleep(min(SCHEDULER_TICK_SECONDS, max(1.0, upcoming - time.time())))
+        except KeyboardInterrupt:
+            if self.running:
+                print(f"\n   Stopping: waiting for {', '.join(self.running)} to exit...")
+                for run in self.running.values():
+                    run.process.wait()
+                self.reap()
+            print("   Stopped.")
+
+    def print_status(self):
+        print(f"--- ⏰ Scheduled tasks ({self.state_path}) ---")
+        for name, task in self.tasks.items():
+            entry = self.state[name]
+            holders = RunLock(task['lock']).holders()
+            busy = f", {task['lock']} held by pid {', '.join(str(h.get('pid')) for h in holders)}" if holders else ""
+            print(f"{name:<10} every {task['every_hours']:g}h".ljust(22) + f"last {entry.get('last_status', '-'):<7} "
+                  f"{format_time(entry.get('last_started'))}  next {format_time(entry['next_run'])}{busy}")
@@ -0,0 +1,5 @@
+"""
+Read-side helpers for the knowledge_chunks corpus, shared by test_search.py and
+any other retrieval front end. Like the package root, submodules are imported
+explicitly and load their heavy dependencies lazily.
+"""
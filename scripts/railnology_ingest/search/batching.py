@@ -0,0 +1,81 @@
+import time
+import queue
+import threading
+
+from ..config import SEARCH_BATCH_MAX, SEARCH_BATCH_WINDOW_MS
+from .filters import normalize_filters
+
+# ==========================================
+# 📦 MICRO-BATCHED QUERY SCORING
+# ==========================================
+# Concurrent searches against one LocalIndex go through a single scoring
+# thread. It takes the first waiting query and keeps collecting until
+# SEARCH_BATCH_WINDOW_MS has passed or SEARCH_BATCH_MAX queries are queued.
+# The collected queries are stacked into Q, and LocalIndex.search_batch scores
+# them with one Q @ E.T per row range, whatever their filters, followed by a
+# batched top-k. A query therefore waits at most one window plus one batch.
+# Window 0 scores whatever is already queued, with no wait. Wraps the index,
+# so test_search.retrieve() accepts it as-is.
+
+
+class QueryBatcher:
+    """Drop-in for LocalIndex.search() that scores concurrent callers in batches."""
+
+    def __init__(self, index, max_batch=SEARCH_BATCH_MAX, window_ms=SEARCH_BATCH_WINDOW_MS):
+        self.index = index
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self.thread.start()
+
+    def __getattr__(self, name):
+        # name, model, generation, docs, row_ranges... come from the wrapped index
+        return getattr(self.index, name)
+
+    def search(self, query_vector, limit=3, filters=None):
+        request = {'vector': query_vector, 'limit': limit, 'filters': normalize_filters(filters),
+                   'done': threading.Event(), 'results': None, 'error': None}
+        self.queue.put(request)
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['results']
+
+    def stats(self):
+        with self.lock:
+            return {'batches': self.batches, 'queries': self.queries,
+                    'avg_batch': self.queries / self.batches if self.batches else 0.0}
+
+    def _take_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            # Each caller keeps its own top of a search at the largest requested limit
+            limit = max(request['limit'] for request in batch)
+            try:
+                results = self.index.search_batch([r['vector'] for r in batch], limit, [r['filters'] for r in batch])
+                for request, hits in zip(batch, results):
+                    request['results'] = hits[:request['limit']]
+            except Exception as e:
+                for request in batch:
+                    request['error'] = e
+
+            with self.lock:
+                self.batches += 1
+                self.queries += len(batch)
+            for request in batch:
+                request['done'].set()
@@ -0,0 +1,72 @@
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from ..config import QUERY_CACHE_SIZE, GENERATION_CHECK_SECONDS
+
+# ==========================================
+# ⚡ QUERY RESULT CACHE
+# ==========================================
+# The same safety questions come up again and again. Results are cached under
+# (normalized query, filters, options, index generation); a finished ingestion
+# run bumps the generation (swap.bump_index_generation), which makes every
+# older entry unreachable. The generation is polled at most every
+# GENERATION_CHECK_SECONDS, so a hit costs a dict lookup, not a round trip.
+
+TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_query(text):
+    """'  What is the speed limit for Class 3 track? ' -> 'what is the speed limit for class 3 track'"""
+    return TRAILING_PUNCTUATION.sub("", " ".join(text.lower().split()))
+
+
+class QueryCache:
+    """Thread-safe LRU of search results, invalidated by index generation."""
+
+    def __init__(self, generation_source, max_entries=QUERY_CACHE_SIZE, check_seconds=GENERATION_CHECK_SECONDS):
+        self.generation_source = generation_source
+        self.max_entries = max_entries
+        self.check_seconds = check_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.current_generation = None
+        self.checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self):
+        now = time.monotonic()
+        if self.current_generation is None or now - self.checked_at >= self.check_seconds:
+            generation = self.generation_source()
+            with self.lock:
+                if generation != self.current_generation:
+                    self.entries.clear()
+                    self.current_generation = generation
+                self.checked_at = now
+        return self.current_generation
+
+    def key(self, query, filters=None, **options):
+        return (normalize_query(query), json.dumps(filters or {}, sort_keys=True, default=str),
+                json.dumps(options, sort_keys=True), self.generation())
+
+    def get(self, query, filters=None, **options):
+        key = self.key(query, filters, **options)
+        with self.lock:
+            results = self.entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, query, results, filters=None, **options):
+        key = self.key(query, filters, **options)
+        with self.lock:
+            self.entries[key] = results
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,36 @@
+from ..layout import layout_of
+
+# ==========================================
+# 🔍 CHUNK EXPANSION
+# ==========================================
+# Structured chunks are small on purpose. When a caller needs more than the
+# hit itself, expand it to its neighbours or to the whole parent section via
+# parent_section_id / chunk_index (see sinks.build_chunk_document).
+# `collection` may be a layout.ChunkCollection; chunks come back legacy-shaped.
+
+EXPAND_PROJECTION = {"_id": 0, "embedding": 0}
+
+
+def expand_chunk(collection, hit, window=None):
+    """
+    Returns the chunks around `hit` in section order: all of them, or only those within
+    `window` positions of it. Hits from before parent links existed come back alone.
+    """
+    parent = hit.get('parent_section_id')
+    if not parent:
+        return [hit]
+
+    query = {"parent_section_id": parent}
+    if window is not None and hit.get('chunk_index') is not None:
+        query['chunk_index'] = {"$gte": hit['chunk_index'] - window, "$lte": hit['chunk_index'] + window}
+    layout = layout_of(collection)
+    cursor = collection.find(layout.query(query), layout.projection(EXPAND_PROJECTION)).sort(layout.field("chunk_index"), 1)
+    return [layout.decode(chunk) for chunk in cursor] or [hit]
+
+def expanded_text(chunks):
+    """Joins expanded chunks into one text, with the first chunk's context header on top."""
+    if not chunks:
+        return ""
+    body = "\n".join(chunk.get('text', '') for chunk in chunks)
+    context = chunks[0].get('context')
+    return f"{context}\n{body}" if context else body
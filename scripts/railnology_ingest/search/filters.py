@@ -0,0 +1,78 @@
+from ..config import VECTOR_FILTER_FIELDS, VERSION_FILTER_FIELDS, EMBEDDING_DIMENSIONS
+
+# ==========================================
+# 🧮 METADATA FILTERS
+# ==========================================
+# One filter spec for every search backend:
+#   {"document_type": "Operating Rule", "rule_system": "NORAC"}
+#   {"part": [213, 214]}            a list means "any of"
+# atlas_filter() turns it into a $vectorSearch `filter` clause (pre-filtering
+# needs the fields declared as "filter" in the vector index, see
+# vector_index_definition), matches() applies it to one document or
+# partition key for the local index. version_filter() adds the `as_of` date
+# range of point-in-time regulation searches (see versions.py).
+
+
+def normalize_filters(filters):
+    """Drops empty values and rejects fields the vector index cannot filter on."""
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, "", [])}
+    unknown = sorted(set(filters) - set(VECTOR_FILTER_FIELDS))
+    if unknown:
+        raise ValueError(f"Cannot filter on {', '.join(unknown)} (filterable: {', '.join(VECTOR_FILTER_FIELDS)})")
+    return filters
+
+def atlas_filter(filters):
+    """$vectorSearch `filter` clause for a filter spec, or None when nothing is filtered."""
+    clauses = []
+    for key, value in normalize_filters(filters).items():
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": list(value)}})
+        else:
+            clauses.append({key: {"$eq": value}})
+    return combine_filters(*clauses)
+
+def version_filter(as_of, superseded=False):
+    """
+    $vectorSearch clause for chunks in force on `as_of` (a datetime). Live chunks: every
+    non-regulation chunk, and regulation chunks valid since then. Superseded versions
+    (regulation_versions): the one whose [valid_from, valid_to) range holds the date.
+    """
+    if superseded:
+        return {"$and": [{"valid_from": {"$lte": as_of}}, {"valid_to": {"$gt": as_of}}]}
+    return {"$or": [{"document_type": {"$ne": "Regulation"}}, {"valid_from": {"$lte": as_of}}]}
+
+def combine_filters(*clauses):
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def matches(doc, filters):
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            if doc.get(key) not in value:
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+def vector_index_definition(existing=None, dimensions=EMBEDDING_DIMENSIONS,
+                            filter_fields=VECTOR_FILTER_FIELDS + VERSION_FILTER_FIELDS):
+    """
+    Vector search index definition with every filter field declared. An `existing`
+    definition keeps its vector field settings; missing filter fields are added.
+    """
+    fields = list((existing or {}).get('fields') or [])
+    if not any(field.get('type') == 'vector' for field in fields):
+        fields.insert(0, {"type": "vector", "path": "embedding", "numDimensions": dimensions, "similarity": "cosine"})
+
+    declared = {field.get('path') for field in fields if field.get('type') == 'filter'}
+    fields.extend({"type": "filter", "path": path} for path in filter_fields if path not in declared)
+    return {**(existing or {}), "fields": fields}
+
+def parse_filter_value(key, value):
+    """CLI/query-string values: "213,214" -> [213, 214]; parts are numbers, everything else text."""
+    values = [v.strip() for v in str(value).split(",") if v.strip()]
+    if key == "part":
+        values = [int(v) for v in values]
+    return values[0] if len(values) == 1 else values
@@ -0,0 +1,158 @@
+import json
+
+from ..config import VECTOR_FILTER_FIELDS
+from ..dataset import read_manifest, iter_dataset
+from .filters import normalize_filters, matches
+
+# ==========================================
+# 🗂️ LOCAL VECTOR INDEX
+# ==========================================
+# Exact (brute-force) cosine search over a local chunk dataset, for offline
+# runs and search nodes that should not depend on Atlas. Rows are sorted by
+# their filter-field values, so every distinct combination (e.g. Regulation /
+# FRA / part 213) is one contiguous slice of the embeddings matrix. A filtered
+# query only multiplies the slices whose key matches; unfiltered queries scan
+# everything. Scores use Atlas' cosine scale, (1 + cos) / 2.
+#
+# from_snapshot() maps an exported snapshot (snapshot.py) instead of loading a
+# dataset: the matrix stays on disk, shared through the page cache, and
+# documents are decoded only for the rows a search returns.
+
+
+class LocalIndex:
+    """In-memory index: one float32 matrix of unit vectors plus per-slice row ranges."""
+
+    def __init__(self, embeddings, docs, slices, model=None, generation=None):
+        self.embeddings = embeddings
+        self.docs = docs
+        self.slices = slices
+        self.model = model
+        # Datasets are immutable, so their creation time identifies the generation
+        self.generation = generation
+        self.name = "local"
+        self.rows_scanned = 0
+
+    @classmethod
+    def from_dataset(cls, root):
+        import numpy as np
+
+        manifest = read_manifest(root)
+        rows = []
+        for doc in iter_dataset(root, manifest):
+            vector = doc.pop('embedding')
+            rows.append((tuple(str(doc.get(field)) for field in VECTOR_FILTER_FIELDS), doc, vector))
+        rows.sort(key=lambda row: row[0])
+
+        embeddings = np.array([vector for _, _, vector in rows], dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1.0, norms)
+        docs = [doc for _, doc, _ in rows]
+
+        slices = []
+        start = 0
+        for i in range(1, len(rows) + 1):
+            if i == len(rows) or rows[i][0] != rows[start][0]:
+                key = {field: docs[start].get(field) for field in VECTOR_FILTER_FIELDS}
+                slices.append((key, start, i))
+                start = i
+        return cls(embeddings, docs, slices, model=manifest.get('model'), generation=manifest.get('created_at'))
+
+    @classmethod
+    def from_snapshot(cls, path):
+        from ..snapshot import open_snapshot
+
+        manifest, embeddings, docs = open_snapshot(path)
+        slices = [(key, start, end) for key, start, end in manifest['slices']]
+        # A snapshot is immutable, so its id is its generation
+        index = cls(embeddings, docs, slices, model=manifest.get('model'), generation=manifest['snapshot_id'])
+        index.name = f"snapshot {manifest['snapshot_id']}"
+        return index
+
+    @classmethod
+    def open(cls, path):
+        """A snapshot (directory or snapshot root with CURRENT) or a local dataset, whichever `path` holds."""
+        from ..snapshot import is_snapshot
+
+        return cls.from_snapshot(path) if is_snapshot(path) else cls.from_dataset(path)
+
+    def row_ranges(self, filters=None):
+        """Row ranges to scan for a filter spec, adjacent slices merged."""
+        filters = normalize_filters(filters)
+        ranges = []
+        for key, start, end in self.slices:
+            if filters and not matches(key, filters):
+                continue
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def search(self, query_vector, limit=3, filters=None):
+        """Top `limit` chunks by cosine similarity within the slices matching `filters`."""
+        return self.search_batch([query_vector], limit, filters)[0]
+
+    def search_batch(self, query_vectors, limit=3, filters=None):
+        """
+        search() for several queries at once. `filters` is one spec for all of them or a list
+        with one spec per query. Every row any query may see is scored with one
+        (queries x dims) @ (dims x rows) product per contiguous range. Rows outside a query's
+        own filter are masked out before its top-k. Returns one hit list per query.
+        """
+        import numpy as np
+
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+
+        specs = filters if isinstance(filters, list) else [filters] * len(queries)
+        groups = {}
+        for i, spec in enumerate(specs):
+            key = json.dumps(normalize_filters(spec), sort_keys=True, default=str)
+            if key not in groups:
+                groups[key] = {'ranges': self.row_ranges(spec), 'queries': []}
+            groups[key]['queries'].append(i)
+        union = merge_ranges([r for group in groups.values() for r in group['ranges']])
+
+        candidate_scores, candidate_rows = [], []
+        self.rows_scanned = 0
+        for start, end in union:
+            scores = queries @ self.embeddings[start:end].T
+            self.rows_scanned += end - start
+            if len(groups) > 1:
+                for group in groups.values():
+                    allowed = np.zeros(end - start, dtype=bool)
+                    for low, high in group['ranges']:
+                        if low < end and high > start:
+                            allowed[max(low, start) - start:min(high, end) - start] = True
+                    if not allowed.all():
+                        scores[np.ix_(group['queries'], np.flatnonzero(~allowed))] = -np.inf
+            if end - start > limit:
+                top = np.argpartition(-scores, limit, axis=1)[:, :limit]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(end - start), scores.shape)
+            candidate_scores.append(scores)
+            candidate_rows.append(top + start)
+
+        if not candidate_scores:
+            return [[] for _ in range(len(queries))]
+        scores = np.concatenate(candidate_scores, axis=1)
+        rows = np.concatenate(candidate_rows, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :limit]
+        return [
+            [{**self.docs[int(rows[i, j])], 'score': (1.0 + float(scores[i, j])) / 2.0}
+             for j in order[i] if scores[i, j] != -np.inf]
+            for i in range(len(queries))
+        ]
+
+
+def merge_ranges(ranges):
+    """Sorted, non-overlapping union of (start, end) row ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,166 @@
+import re
+import threading
+from datetime import datetime, timezone
+
+from ..config import RERANK_WEIGHTS, RERANK_DOCUMENT_TYPE_PRIORS
+
+# ==========================================
+# 🥇 SECOND-STAGE RERANKER
+# ==========================================
+# $vectorSearch returns a wide candidate set (RERANK_CANDIDATES); this rescores
+# it locally with a handful of cheap features stacked into one NumPy matrix:
+#   score = features (candidates x 5) @ weights (5)
+# Feature extraction only looks at the first LEXICAL_CHARS of each chunk so the
+# whole stage stays in the low milliseconds even for 15,000-character chunks.
+
+FEATURES = ("vector", "lexical", "citation", "recency", "prior")
+LEXICAL_CHARS = 3000
+# Fields reranking reads; add these to the $vectorSearch projection
+RERANK_FIELDS = ("text", "context", "title", "document_type", "part", "section_id", "rule_system",
+                 "rule_number", "effective_date", "last_updated")
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+STOPWORDS = frozenset(
+    "a an the and or of to in on for at by with from is are be was were what which who when where how "
+    "does do must shall may can any all this that these those it its as per not no".split()
+)
+# "213.9", "§ 213.9", "49 CFR 213.9"
+SECTION_REFERENCE = re.compile(r"\b(2\d\d)\.(\d+[a-z]?)\b")
+PART_REFERENCE = re.compile(r"\bpart\s+(2\d\d)\b", re.I)
+RULE_REFERENCE = re.compile(r"\brule\s+(\d[\d.\-]*[A-Z]?)", re.I)
+
+# Rule systems ("GCOR", "NORAC"...) come from the rulebook registry, read on first use
+_rule_systems = None
+_rule_systems_lock = threading.Lock()
+
+
+def query_terms(text):
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS and len(word) > 1]
+
+def rule_systems():
+    """{lowercased name: rule_system} for every rulebook in the registry (RULEBOOK_CONFIG_DIR)."""
+    global _rule_systems
+    if _rule_systems is None:
+        with _rule_systems_lock:
+            if _rule_systems is None:
+                from ..sources import load_rulebook_registry
+                _rule_systems = {rule['system_name'].lower(): rule['system_name'] for rule in load_rulebook_registry()}
+    return _rule_systems
+
+def rule_system_references(query):
+    systems = rule_systems()
+    if not systems:
+        return set()
+    pattern = r"\b(" + "|".join(map(re.escape, sorted(systems, key=len, reverse=True))) + r")\b"
+    return {systems[name.lower()] for name in re.findall(pattern, query, re.I)}
+
+def parse_citations(query):
+    """Regulation and rule references named in a query."""
+    return {
+        'sections': {(int(part), section) for part, section in SECTION_REFERENCE.findall(query)},
+        'parts': {int(part) for part in PART_REFERENCE.findall(query)} | {int(p) for p, _ in SECTION_REFERENCE.findall(query)},
+        'rule_systems': rule_system_references(query),
+        'rules': {rule.rstrip('.') for rule in RULE_REFERENCE.findall(query)},
+    }
+
+def citation_score(doc, citations):
+    if doc.get('document_type') == 'Regulation':
+        part = doc.get('part')
+        section_key = str(doc.get('section_id') or '')
+        for cited_part, section in citations['sections']:
+            if part == cited_part and section_key.startswith(f"{part}_{part}_{section}_".replace('.', '_')):
+                return 1.0
+        return 0.5 if part in citations['parts'] else 0.0
+
+    score = 0.0
+    if doc.get('rule_system') in citations['rule_systems']:
+        score += 0.3
+    if doc.get('rule_number') and str(doc['rule_number']) in citations['rules']:
+        score += 0.7
+    return score
+
+def document_timestamp(doc):
+    """Seconds since the epoch of effective_date (preferred) or last_updated, None when unknown."""
+    for key in ('effective_date', 'last_updated'):
+        value = doc.get(key)
+        if isinstance(value, datetime):
+            return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+        if isinstance(value, str) and value:
+            try:
+                return datetime.fromisoformat(value[:10]).replace(tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                continue
+    return None
+
+def feature_matrix(query, candidates):
+    """Returns the (len(candidates) x len(FEATURES)) float matrix of feature values, each in 0..1."""
+    import numpy as np
+
+    n = len(candidates)
+    features = np.zeros((n, len(FEATURES)), dtype=np.float32)
+
+    # Vector similarity, relative to the best candidate
+    scores = np.array([doc.get('score') or 0.0 for doc in candidates], dtype=np.float32)
+    if scores.max() > 0:
+        features[:, 0] = scores / scores.max()
+
+    # Lexical overlap: IDF over the candidate set, so terms every candidate shares count for little
+    terms = sorted(set(query_terms(query)))
+    if terms:
+        index = {term: i for i, term in enumerate(terms)}
+        present = np.zeros((n, len(terms)), dtype=np.float32)
+        for row, doc in enumerate(candidates):
+            text = f"{doc.get('title') or ''} {doc.get('context') or ''} {(doc.get('text') or '')[:LEXICAL_CHARS]}"
+            for word in set(WORD_PATTERN.findall(text.lower())):
+                column = index.get(word)
+                if column is not None:
+                    present[row, column] = 1.0
+        idf = np.log1p(n / (1.0 + present.sum(axis=0)))
+        features[:, 1] = present @ idf / idf.sum()
+
+    citations = parse_citations(query)
+    if any(citations.values()):
+        features[:, 2] = [citation_score(doc, citations) for doc in candidates]
+
+    timestamps = np.array([document_timestamp(doc) or np.nan for doc in candidates], dtype=np.float64)
+    if not np.isnan(timestamps).all():
+        low, high = np.nanmin(timestamps), np.nanmax(timestamps)
+        spread = (timestamps - low) / (high - low) if high > low else np.ones(n)
+        features[:, 3] = np.nan_to_num(spread, nan=0.0)
+
+    features[:, 4] = [RERANK_DOCUMENT_TYPE_PRIORS.get(doc.get('document_type'), 0.0) for doc in candidates]
+    return features
+
+def rerank(query, candidates, top_k=3, weights=None):
+    """
+    Reorders $vectorSearch candidates by the weighted feature score and returns the best
+    `top_k`, each with a `rerank_score`. The vector score is kept as `score`.
+    """
+    import numpy as np
+
+    if not candidates:
+        return []
+    weights = {**RERANK_WEIGHTS, **(weights or {})}
+    weight_vector = np.array([weights[name] for name in FEATURES], dtype=np.float32)
+
+    scores = feature_matrix(query, candidates) @ weight_vector
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [{**candidates[i], 'rerank_score': float(scores[i])} for i in order]
+
+def precision_at_k(results, relevant, k=3):
+    """Share of the top `k` results matching any spec in `relevant` (see is_relevant)."""
+    if not results:
+        return 0.0
+    hits = sum(1 for doc in results[:k] if any(is_relevant(doc, spec) for spec in relevant))
+    return hits / min(k, len(results))
+
+def is_relevant(doc, spec):
+    """True when `doc` matches every field of a golden-set spec; "section" matches a CFR section like 213.9."""
+    for key, value in spec.items():
+        if key == "section":
+            part = doc.get('part')
+            if not str(doc.get('section_id') or '').startswith(f"{part}_{value}_".replace('.', '_')):
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
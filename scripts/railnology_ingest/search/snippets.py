@@ -0,0 +1,99 @@
+import re
+
+from ..config import SEARCH_TEXT_CHARS, SNIPPET_LEAD_CHARS, SNIPPET_CHARS
+from .rerank import query_terms
+
+# ==========================================
+# ✂️ SEARCH SNIPPETS
+# ==========================================
+# Chunks run up to 15,000 characters, but a search result only needs the
+# passage that matched. Two steps trim it:
+#   1. Atlas: text_window() has $vectorSearch return SEARCH_TEXT_CHARS of the
+#      text ($substrCP), starting SNIPPET_LEAD_CHARS before the first query
+#      term ($indexOfCP), plus text_offset/text_length to say where that cut sits.
+#      Texts that fit are returned whole.
+#   2. Client: snippet() picks the SNIPPET_CHARS window holding the most
+#      distinct query terms and highlights them (**term**).
+# Full text only on request: test_search.py --full-text, search_server.py
+# {"full_text": true}, or `expand N` for the whole section.
+
+HIGHLIGHT = "**{}**"
+# Terms looked up server-side; one $indexOfCP each
+MAX_WINDOW_TERMS = 8
+
+
+def text_window(layout, query, chars=SEARCH_TEXT_CHARS, lead=SNIPPET_LEAD_CHARS):
+    """
+    ($set stage, $project expression for text) that cut each hit's text to `chars` characters
+    around the first term of `query`. `layout` is the collection's chunk layout (layout.py).
+    """
+    text = {"$ifNull": ["$" + layout.field("text"), ""]}
+    terms = list(dict.fromkeys(query_terms(query or "")))[:MAX_WINDOW_TERMS]
+    length = {"$strLenCP": text}
+    first = 0
+    if terms:
+        # $toLower keeps code point positions; $min skips the terms that are absent (null)
+        first = {"$ifNull": [{"$let": {
+            "vars": {"lower": {"$toLower": text}},
+            "in": {"$min": [{"$let": {
+                "vars": {"at": {"$indexOfCP": ["$$lower", term]}},
+                "in": {"$cond": [{"$gte": ["$$at", 0]}, "$$at", None]},
+            }} for term in terms]},
+        }}, 0]}
+    offset = {"$max": [0, {"$min": [{"$subtract": [first, lead]}, {"$subtract": [length, chars]}]}]}
+    stage = {"$set": {"text_length": length, "text_offset": offset}}
+    return stage, {"$substrCP": [text, "$text_offset", chars]}
+
+def term_pattern(query):
+    terms = sorted(set(query_terms(query or "")), key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile(r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, terms)) + r")(?![a-z0-9])", re.I)
+
+def best_window(matches, width):
+    """Start of the `width`-character window holding the most distinct terms (earliest on ties)."""
+    best, best_count = 0, 0
+    for i, match in enumerate(matches):
+        terms = {other.group(0).lower() for other in matches[i:] if other.start() < match.start() + width}
+        if len(terms) > best_count:
+            best, best_count = match.start(), len(terms)
+    return best
+
+def snippet(doc, query, width=SNIPPET_CHARS):
+    """Up to `width` characters of a hit's text around its best match, query terms highlighted."""
+    text = " ".join((doc.get('text') or "").split())
+    pattern = term_pattern(query)
+    matches = list(pattern.finditer(text)) if pattern else []
+
+    start = max(0, best_window(matches, width) - width // 4) if matches else 0
+    start = max(0, min(start, len(text) - width))
+    if start > 0:
+        # Cut on word boundaries
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < start + 20 else start
+    end = min(len(text), start + width)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start + width // 2 else end
+
+    window = text[start:end]
+    if pattern:
+        window = pattern.sub(lambda match: HIGHLIGHT.format(match.group(0)), window)
+    # text may itself be a cut of the stored text (text_window)
+    offset = doc.get('text_offset') or 0
+    length = doc.get('text_length') or offset + len(doc.get('text') or "")
+    before = "…" if start > 0 or offset > 0 else ""
+    after = "…" if end < len(text) or offset + len(doc.get('text') or "") < length else ""
+    return f"{before}{window}{after}"
+
+def trim_hits(hits, query, full_text=False):
+    """Hits with a `snippet` in place of `text` (and its cut offsets), unless `full_text`."""
+    if full_text:
+        return hits
+    trimmed = []
+    for hit in hits:
+        hit = {**hit, 'snippet': snippet(hit, query)}
+        for key in ('text', 'text_offset', 'text_length'):
+            hit.pop(key, None)
+        trimmed.append(hit)
+    return trimmed
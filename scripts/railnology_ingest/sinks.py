@@ -0,0 +1,341 @@
+import time
+import queue
+import threading
+from datetime import datetime, timezone
+
+from .config import WRITE_BATCH_SIZE, WRITE_BATCH_BYTES, WRITER_WORKERS, BULK_WRITE_CONCERN
+from .metrics import run_metrics
+
+# ==========================================
+# ✍️ SINK STAGE
+# ==========================================
+
+def regulation_doc_key(part, section_id):
+    """parent_section_id of the chunks of one CFR section, e.g. 236_236_1005."""
+    return f"{part}_{section_id}".replace('.', '_')
+
+def build_chunk_document(record, text, index, vector, count=1, context=None, paragraph=None):
+    """
+    Builds the knowledge_chunks document for chunk `index` (of `count`) of a primary record.
+    Every chunk of a record shares parent_section_id, so a hit can be expanded to its section.
+    """
+    mongo_doc = {
+        "source": record.get('source'),
+        "document_type": record.get('document_type'),
+        "title": record.get('title'),
+        "text": text,
+        "embedding": vector,
+        "last_updated": datetime.now(timezone.utc),
+    }
+
+    # Add specific fields based on document type
+    if mongo_doc['document_type'] == 'Regulation':
+        # CFR Regulation Fields
+        mongo_doc.update({
+            "part": record.get('part'),
+            "section_id": record.get('section_id'),
+            "url": record.get('url'),
+        })
+        # Point-in-time fields (see versions.py): same text, same hash, whatever the eCFR date
+        for field in ("content_hash", "valid_from", "valid_to"):
+            if record.get(field):
+                mongo_doc[field] = record[field]
+        doc_key = regulation_doc_key(mongo_doc['part'], mongo_doc['section_id'])
+
+    elif mongo_doc['document_type'] == 'Operating Rule':
+        # GCOR/NORAC Fields
+        mongo_doc.update({
+            "rule_system": record.get('rule_system'),
+            "rule_number": record.get('rule_number'),
+            "category": record.get('category'),
+            "effective_date": record.get('effective_date'),
+        })
+        doc_key = f"{record['rule_system']}_{record['rule_number']}".replace('.', '_')
+
+    else:
+        # FRA Advisory/Bulletin Fields
+        mongo_doc.update({
+            "doc_type": record.get('doc_type'),
+            "date_issued": record.get('date_issued'),
+            "applicable_49cfr": record.get('applicable_49cfr'),
+        })
+        doc_key = record['title'].replace(' ', '_').replace('/', '_')[:30]
+
+    mongo_doc['section_id'] = f"{doc_key}_p{index+1}"
+    mongo_doc['parent_section_id'] = doc_key
+    mongo_doc['chunk_index'] = index
+    mongo_doc['chunk_count'] = count
+    if context:
+        mongo_doc['context'] = context
+    if paragraph:
+        mongo_doc['paragraph'] = paragraph
+    return mongo_doc
+
+
+# What a near-duplicate keeps of each chunk it was collapsed into (see dedup.py)
+CITATION_FIELDS = ("section_id", "document_type", "title", "part", "rule_system", "rule_number", "paragraph", "url")
+
+def chunk_citation(doc):
+    return {key: doc[key] for key in CITATION_FIELDS if doc.get(key) is not None}
+
+
+class WriteTicket:
+    """The documents one job handed to a BulkWriter; wait() blocks until each is inserted or failed."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = 0
+        self.failed = 0
+
+    def added(self):
+        with self.condition:
+            self.pending += 1
+
+    def settled(self, count, failed):
+        with self.condition:
+            self.pending -= count
+            self.failed += failed
+            self.condition.notify_all()
+
+    def wait(self):
+        """Returns the number of documents that failed to insert."""
+        with self.condition:
+            while self.pending:
+                self.condition.wait()
+            return self.failed
+
+
+class BulkWriter:
+    """
+    Dedicated insert stage fed by a queue. Documents are batched by count and BSON size
+    and flushed with unordered inserts by a small pool of writer threads, so embedding
+    calls never wait on MongoDB round-trips (and vice versa).
+    """
+
+    def __init__(self, mongo_collection, batch_size=WRITE_BATCH_SIZE, batch_bytes=WRITE_BATCH_BYTES,
+                 workers=WRITER_WORKERS, write_concern=BULK_WRITE_CONCERN):
+        import bson
+        self.encode = bson.encode
+
+        if write_concern:
+            from pymongo.write_concern import WriteConcern
+            w = int(write_concern) if write_concern.isdigit() else write_concern
+            mongo_collection = mongo_collection.with_options(write_concern=WriteConcern(w=w, j=False))
+
+        self.collection = mongo_collection
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.pending = []
+        self.pending_tickets = []
+        self.pending_bytes = 0
+        self.lock = threading.Lock()
+        # Separate lock for counters: a producer may block on a full queue while holding self.lock
+        self.stats_lock = threading.Lock()
+        # Bounded queue applies backpressure when MongoDB falls behind the embedder
+        self.queue = queue.Queue(maxsize=workers * 2)
+
+        self.inserted = 0
+        self.failed = 0
+        self.batch_latencies = []
+        self.started = time.time()
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"bulk-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def add(self, doc, ticket=None):
+        """Queues one document, flushing the current batch if it is full. `ticket` (a WriteTicket) tracks it."""
+        size = len(self.encode(doc))
+        if ticket is not None:
+            ticket.added()
+        with self.lock:
+            if self.pending and self.pending_bytes + size > self.batch_bytes:
+                self._flush_locked()
+            self.pending.append(doc)
+            self.pending_tickets.append(ticket)
+            self.pending_bytes += size
+            if len(self.pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.pending:
+            self.queue.put((self.pending, self.pending_tickets))
+            self.pending = []
+            self.pending_tickets = []
+            self.pending_bytes = 0
+
+    def _worker(self):
+        from pymongo.errors import BulkWriteError
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            batch, tickets = item
+
+            started = time.time()
+            failed_rows = ()
+            try:
+                with run_metrics.stage("insert_many", items=len(batch)):
+                    self.collection.insert_many(batch, ordered=False)
+                inserted = len(batch)
+            except BulkWriteError as e:
+                # Unordered: everything except the reported errors was written
+                inserted = e.details.get('nInserted', 0)
+                failed_rows = {error['index'] for error in e.details.get('writeErrors', [])}
+                print(f"\n   ⚠️ Bulk insert: {len(e.details.get('writeErrors', []))} write error(s) in batch of {len(batch)}.")
+            except Exception as e:
+                inserted = 0
+                failed_rows = range(len(batch))
+                print(f"\n   ❌ Bulk insert failed for batch of {len(batch)}: {e}")
+            self._settle(tickets, failed_rows)
+
+            run_metrics.incr("documents_inserted", inserted)
+            with self.stats_lock:
+                self.inserted += inserted
+                self.failed += len(batch) - inserted
+                self.batch_latencies.append(time.time() - started)
+            print(".", end="", flush=True)
+            self.queue.task_done()
+
+    @staticmethod
+    def _settle(tickets, failed_rows):
+        settled = {}
+        for row, ticket in enumerate(tickets):
+            if ticket is not None:
+                count, failed = settled.get(ticket, (0, 0))
+                settled[ticket] = (count + 1, failed + (row in failed_rows))
+        for ticket, (count, failed) in settled.items():
+            ticket.settled(count, failed)
+
+    def close(self):
+        """Flushes remaining documents, stops the writer threads and returns throughput stats."""
+        self.flush()
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return self.stats()
+
+    def stats(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        latencies = sorted(self.batch_latencies)
+        return {
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'batches': len(latencies),
+            'docs_per_sec': self.inserted / elapsed,
+            'batch_latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'batch_latency_p95': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            'batch_latency_max': latencies[-1] if latencies else 0.0,
+        }
+
+    def report(self):
+        stats = self.close()
+        print(f"\n   ✍️ Writer: {stats['inserted']} docs in {stats['batches']} batches "
+              f"({stats['docs_per_sec']:.1f} docs/sec, batch latency avg {stats['batch_latency_avg'] * 1000:.0f}ms / "
+              f"p95 {stats['batch_latency_p95'] * 1000:.0f}ms / max {stats['batch_latency_max'] * 1000:.0f}ms"
+              f"{', ' + str(stats['failed']) + ' failed' if stats['failed'] else ''})")
+        return stats
+
+
+class MongoSink:
+    """
+    Writes chunk documents to a knowledge_chunks collection through a shared BulkWriter,
+    in the collection's layout (a layout.ChunkCollection; a plain collection is legacy).
+    """
+
+    def __init__(self, mongo_collection):
+        from .layout import layout_of
+
+        self.collection = mongo_collection
+        self.layout = layout_of(mongo_collection)
+        self.writer = BulkWriter(mongo_collection)
+        self.citations = {}
+        self.citations_lock = threading.Lock()
+
+    def replace(self, delete_filter, before=None):
+        """Clears the idempotency scope of a job: its chunks written before `before` (all of them without it)."""
+        query = dict(delete_filter)
+        if before is not None:
+            query['last_updated'] = {"$lt": before}
+        self.collection.delete_many(self.layout.query(query))
+
+    def write(self, doc, ticket=None):
+        self.writer.add(self.layout.encode(doc), ticket)
+
+    def flush(self):
+        self.writer.flush()
+
+    def ticket(self):
+        return WriteTicket()
+
+    def barrier(self, ticket):
+        """Waits until every chunk written with `ticket` is inserted; raises if any was not."""
+        self.writer.flush()
+        failed = ticket.wait()
+        if failed:
+            raise RuntimeError(f"{failed} chunk(s) failed to insert")
+
+    def set_citations(self, section_id, citations):
+        """Replaces the citations of an already written chunk once the writer has drained (latest call wins)."""
+        with self.citations_lock:
+            self.citations[section_id] = citations
+
+    def close(self):
+        stats = self.writer.report()
+        if self.citations:
+            from pymongo import UpdateOne
+
+            with run_metrics.stage("set_citations", items=len(self.citations)):
+                self.collection.bulk_write([
+                    UpdateOne(self.layout.query({"section_id": section_id}), {"$set": {"citations": citations}})
+                    for section_id, citations in self.citations.items()
+                ], ordered=False)
+            print(f"   🪞 Updated citations on {len(self.citations)} chunk(s) with duplicates in later jobs.")
+        return stats
+
+
+class LocalDatasetSink:
+    """
+    Writes the exact documents MongoSink would insert to a local dataset (see dataset.py),
+    so runs need no MongoDB and can be bulk-loaded later.
+    """
+
+    def __init__(self, path, fmt="jsonl", model=None):
+        from .dataset import DatasetWriter
+
+        self.path = path
+        self.writer = DatasetWriter(path, fmt, model=model)
+        self.started = time.time()
+
+    def replace(self, delete_filter, before=None):
+        """No-op: a local dataset always holds exactly one run, so there is nothing stale to clear."""
+
+    def write(self, doc, ticket=None):
+        with run_metrics.stage("dataset_write"):
+            self.writer.write(doc)
+
+    def flush(self):
+        pass
+
+    def ticket(self):
+        return None
+
+    def barrier(self, ticket):
+        """No-op: dataset writes are synchronous and raise on failure."""
+
+    def close(self):
+        manifest = self.writer.close()
+        elapsed = max(time.time() - self.started, 1e-9)
+        # Counted by the writer under its lock: pipeline workers write concurrently
+        print(f"\n   💾 Local dataset: {manifest['total_rows']} docs in {len(manifest['files'])} file(s) "
+              f"({manifest['total_rows'] / elapsed:.1f} docs/sec) at {self.path}")
+        return manifest
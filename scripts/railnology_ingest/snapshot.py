@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import mmap
+import shutil
+from array import array
+from datetime import datetime, timezone
+
+from .config import SNAPSHOT_DIR, SNAPSHOT_KEEP, VECTOR_FILTER_FIELDS
+from .dataset import to_json_value, from_json_value, file_sha256
+from .metrics import run_metrics
+
+# ==========================================
+# 🧊 MEMORY-MAPPED SEARCH SNAPSHOTS
+# ==========================================
+# An export of one knowledge_chunks generation that search processes open with
+# mmap instead of querying Atlas. Worker processes share the page cache, and
+# opening a snapshot reads only the manifest:
+#
+#   <SNAPSHOT_DIR>/CURRENT                       name of the snapshot to serve
+#   <SNAPSHOT_DIR>/<id>/manifest.json            model, generation, row slices, checksums
+#   <SNAPSHOT_DIR>/<id>/embeddings.npy           float32 (rows x dims), unit length
+#   <SNAPSHOT_DIR>/<id>/text.bin + text_offsets.npy    UTF-8 chunk texts, int64 offsets (rows + 1)
+#   <SNAPSHOT_DIR>/<id>/meta.bin + meta_offsets.npy    one compact JSON object per row
+#
+# Rows are sorted by VECTOR_FILTER_FIELDS, and the manifest lists each slice
+# of equal filter values, exactly like LocalIndex. Snapshots are built in
+# <id>.tmp and renamed into place, then CURRENT is swapped atomically, so a
+# snapshot never changes after it appears.
+
+SNAPSHOT_FORMAT = "snapshot-v1"
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+# Rows permuted per step when sorting the embeddings matrix
+COPY_ROWS = 4096
+
+
+class SnapshotWriter:
+    """Streams chunk documents into a new snapshot directory; close() sorts, checksums and renames it into place."""
+
+    def __init__(self, root, snapshot_id, model=None, source=None, generation=None):
+        self.root = root
+        self.snapshot_id = snapshot_id
+        self.directory = os.path.join(root, snapshot_id)
+        self.tmp_directory = f"{self.directory}.tmp"
+        if os.path.exists(self.directory):
+            raise FileExistsError(f"Snapshot already exists: {self.directory}")
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory)
+
+        self.model = model
+        self.source = source
+        self.generation = generation
+        self.dimensions = None
+        self.keys = []
+        self.text_offsets = array('q', [0])
+        self.meta_offsets = array('q', [0])
+        self.vectors = open(self._path("embeddings.unsorted.f32"), 'wb')
+        self.text = open(self._path("text.unsorted.bin"), 'wb')
+        self.meta = open(self._path("meta.unsorted.bin"), 'wb')
+
+    def _path(self, name):
+        return os.path.join(self.tmp_directory, name)
+
+    def add(self, doc):
+        doc = dict(doc)
+        doc.pop('_id', None)
+        vector = array('f', doc.pop('embedding'))
+        if self.dimensions is None:
+            self.dimensions = len(vector)
+        elif len(vector) != self.dimensions:
+            raise ValueError(f"Embedding has {len(vector)} dimensions, snapshot has {self.dimensions}")
+        if sys.byteorder != "little":
+            vector.byteswap()
+        self.vectors.write(vector.tobytes())
+
+        text = (doc.pop('text', None) or "").encode('utf-8')
+        self.text.write(text)
+        self.text_offsets.append(self.text_offsets[-1] + len(text))
+
+        meta = json.dumps({k: to_json_value(v) for k, v in doc.items()}, ensure_ascii=False,
+                          separators=(",", ":")).encode('utf-8')
+        self.meta.write(meta)
+        self.meta_offsets.append(self.meta_offsets[-1] + len(meta))
+        self.keys.append(tuple(str(doc.get(field)) for field in VECTOR_FILTER_FIELDS))
+
+    def close(self):
+        """Writes the sorted files and the manifest, renames the snapshot into place and returns its manifest."""
+        import numpy as np
+
+        for file in (self.vectors, self.text, self.meta):
+            file.close()
+        rows = len(self.keys)
+        dimensions = self.dimensions or 0
+        order = np.array(sorted(range(rows), key=self.keys.__getitem__), dtype=np.int64)
+
+        with run_metrics.stage("snapshot_sort", items=rows):
+            embeddings = np.lib.format.open_memmap(self._path("embeddings.npy"), mode='w+',
+                                                   dtype='<f4', shape=(rows, dimensions))
+            if rows and dimensions:
+                unsorted = np.memmap(self._path("embeddings.unsorted.f32"), dtype='<f4', mode='r',
+                                     shape=(rows, dimensions))
+                for start in range(0, rows, COPY_ROWS):
+                    block = np.array(unsorted[order[start:start + COPY_ROWS]], dtype=np.float32)
+                    norms = np.linalg.norm(block, axis=1, keepdims=True)
+                    embeddings[start:start + len(block)] = block / np.where(norms == 0, 1.0, norms)
+                del unsorted
+            embeddings.flush()
+            del embeddings
+
+            text_offsets = self._reorder_blob("text", np.frombuffer(self.text_offsets, dtype=np.int64), order)
+            meta_offsets = self._reorder_blob("meta", np.frombuffer(self.meta_offsets, dtype=np.int64), order)
+            np.save(self._path("text_offsets.npy"), text_offsets.astype('<i8'))
+            np.save(self._path("meta_offsets.npy"), meta_offsets.astype('<i8'))
+            for name in ("embeddings.unsorted.f32", "text.unsorted.bin", "meta.unsorted.bin"):
+                os.remove(self._path(name))
+
+        sorted_keys = [self.keys[i] for i in order]
+        slices = []
+        start = 0
+        for i in range(1, rows + 1):
+            if i == rows or sorted_keys[i] != sorted_keys[start]:
+                slices.append([self._slice_key(meta_offsets, start), start, i])
+                start = i
+
+        files = sorted(os.listdir(self.tmp_directory))
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'snapshot_id': self.snapshot_id,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'source': self.source,
+            'generation': self.generation,
+            'model': self.model,
+            'dimensions': dimensions,
+            'rows': rows,
+            'slices': slices,
+            'files': {name: file_sha256(self._path(name)) for name in files},
+        }
+        with open(self._path(MANIFEST_NAME), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+
+        os.rename(self.tmp_directory, self.directory)
+        return manifest
+
+    def _reorder_blob(self, name, offsets, order):
+        """Rewrites <name>.unsorted.bin in row `order`; returns the new offsets."""
+        import numpy as np
+
+        lengths = np.diff(offsets)[order]
+        new_offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        with open(self._path(f"{name}.unsorted.bin"), 'rb') as source, open(self._path(f"{name}.bin"), 'wb') as target:
+            blob = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b""
+            for row in order:
+                target.write(blob[offsets[row]:offsets[row + 1]])
+            if offsets[-1]:
+                blob.close()
+        return new_offsets
+
+    def _slice_key(self, meta_offsets, row):
+        with open(self._path("meta.bin"), 'rb') as file:
+            file.seek(int(meta_offsets[row]))
+            meta = json.loads(file.read(int(meta_offsets[row + 1] - meta_offsets[row])))
+        return {field: meta.get(field) for field in VECTOR_FILTER_FIELDS}
+
+
+# --- Reading (search nodes) ---
+
+def set_current_snapshot(root, snapshot_id):
+    tmp_path = os.path.join(root, f"{CURRENT_NAME}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(snapshot_id + "\n")
+    os.replace(tmp_path, os.path.join(root, CURRENT_NAME))
+
+def current_snapshot(root=SNAPSHOT_DIR):
+    """Directory of the snapshot CURRENT points at, or None before the first export."""
+    try:
+        with open(os.path.join(root, CURRENT_NAME), 'r', encoding='utf-8') as file:
+            return os.path.join(root, file.read().strip())
+    except FileNotFoundError:
+        return None
+
+def is_snapshot(path):
+    """True for a snapshot directory or a snapshot root (a directory holding CURRENT)."""
+    if os.path.exists(os.path.join(path, CURRENT_NAME)):
+        return True
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            return json.load(file).get('format') == SNAPSHOT_FORMAT
+    except (FileNotFoundError, ValueError):
+        return False
+
+def _map_blob(path):
+    with open(path, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+
+class SnapshotDocs:
+    """Read-only sequence of chunk documents decoded on access from the mapped text and metadata blobs."""
+
+    def __init__(self, directory):
+        import numpy as np
+
+        self.text = _map_blob(os.path.join(directory, "text.bin"))
+        self.meta = _map_blob(os.path.join(directory, "meta.bin"))
+        self.text_offsets = np.load(os.path.join(directory, "text_offsets.npy"), mmap_mode='r')
+        self.meta_offsets = np.load(os.path.join(directory, "meta_offsets.npy"), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        start, end = int(self.meta_offsets[row]), int(self.meta_offsets[row + 1])
+        doc = {k: from_json_value(v) for k, v in json.loads(self.meta[start:end]).items()}
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        doc['text'] = bytes(self.text[start:end]).decode('utf-8')
+        return doc
+
+
+def open_snapshot(path=SNAPSHOT_DIR):
+    """
+    Maps a snapshot (or the CURRENT one under a snapshot root) without reading its rows.
+    Returns (manifest, embeddings memmap, SnapshotDocs).
+    """
+    import numpy as np
+
+    if os.path.exists(os.path.join(path, CURRENT_NAME)):
+        path = current_snapshot(path)
+    with open(os.path.join(path, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a {SNAPSHOT_FORMAT} snapshot")
+    embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode='r')
+    return manifest, embeddings, SnapshotDocs(path)
+
+def verify_snapshot(path):
+    """Returns a list of checksum problems; empty when the snapshot is intact."""
+    directory = current_snapshot(path) if os.path.exists(os.path.join(path, CURRENT_NAME)) else path
+    with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    problems = []
+    for name, checksum in manifest['files'].items():
+        file_path = os.path.join(directory, name)
+        if not os.path.exists(file_path):
+            problems.append(f"missing {name}")
+        elif file_sha256(file_path) != checksum:
+            problems.append(f"checksum mismatch in {name}")
+    return problems
+
+
+# --- Export ---
+
+def export_snapshot(docs, root=SNAPSHOT_DIR, snapshot_id=None, model=None, source=None, generation=None, total=None):
+    """
+    Writes every document of `docs` (with embeddings) to a new snapshot and, once its files
+    verify against the manifest, makes it CURRENT. Returns the manifest, or None when verification failed.
+    """
+    snapshot_id = snapshot_id or run_metrics.run_id
+    writer = SnapshotWriter(root, snapshot_id, model=model, source=source, generation=generation)
+    print(f"   Writing snapshot {snapshot_id}{f' ({total} chunks)' if total else ''}...", end=" ", flush=True)
+    with run_metrics.stage("snapshot_export"):
+        for i, doc in enumerate(docs, 1):
+            writer.add(doc)
+            if i % 5000 == 0:
+                print(".", end="", flush=True)
+        manifest = writer.close()
+    print("done.")
+
+    with run_metrics.stage("snapshot_verify"):
+        problems = verify_snapshot(writer.directory)
+    if problems:
+        print(f"   ❌ Snapshot {snapshot_id} failed verification, CURRENT unchanged: {'; '.join(problems)}")
+        return None
+
+    set_current_snapshot(root, snapshot_id)
+    print(f"   🧊 Snapshot {snapshot_id}: {manifest['rows']} chunks, {manifest['dimensions']} dims, "
+          f"{len(manifest['slices'])} slices ({manifest['model']}) is now CURRENT in {root}.")
+    return manifest
+
+def prune_snapshots(root=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """Deletes all but the newest `keep` snapshots. CURRENT is never deleted."""
+    current = os.path.basename(current_snapshot(root) or "")
+    snapshots = sorted(name for name in os.listdir(root)
+                       if os.path.isdir(os.path.join(root, name)) and not name.endswith(".tmp"))
+    removed = [name for name in snapshots[:-keep] if name != current] if keep > 0 else []
+    for name in removed:
+        shutil.rmtree(os.path.join(root, name))
+        print(f"   🗑️ Removed old snapshot {name}.")
+    return removed
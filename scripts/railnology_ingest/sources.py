@@ -0,0 +1,347 @@
+import os
+import json
+import glob
+import time
+from datetime import datetime, timezone
+
+from .config import (
+    ECFR_API_URL, ECFR_RENDERER_URL, ECFR_TITLES_URL, ECFR_VERSIONS_URL, ECFR_HISTORY_START, ECFR_REQUEST_DELAY_SECONDS,
+    TARGET_PARTS, FRA_ADVISORY_URL, FRA_BULLETIN_URL,
+    RULEBOOK_CONFIG_DIR, RULEBOOK_REQUIRED_KEYS,
+)
+from .metrics import run_metrics
+from .parsers import clean_xml_text, is_reserved_part, parse_cfr_sections, load_pdf_text, segment_operating_rules
+
+# ==========================================
+# 📥 SOURCE STAGE
+# ==========================================
+# A source yields IngestJobs. Each job fetches and parses one idempotent unit
+# (a CFR part, the FRA guidance listings, one rulebook) and names the filter
+# that scopes its replacement in the sink (None: append-only, nothing to clear).
+
+
+class IngestJob:
+    """
+    One unit of ingestion. `loader()` returns the primary records to index, [] when the
+    unit legitimately has none (e.g. a reserved part), or None when loading failed and
+    existing data must be kept. `detect_changes(records)`, when set, returns a change set
+    (`.unchanged`, `.commit()`) that the pipeline commits once the job has been indexed.
+    """
+
+    def __init__(self, name, delete_filter, loader, stage, detect_changes=None):
+        self.name = name
+        self.delete_filter = delete_filter
+        self.loader = loader
+        self.stage = stage
+        self.detect_changes = detect_changes
+
+    def load(self):
+        return self.loader()
+
+
+# --- 49 CFR (eCFR API) ---
+
+def fetch_cfr_part(part_number, date=None):
+    """Fetches and parses one 49 CFR Part from the eCFR API into Regulation records (as of `date`, default current)."""
+    import requests
+
+    url = f"{ECFR_RENDERER_URL.format(date=date) if date else ECFR_API_URL}?part={part_number}"
+    print(f"   Drafting GET request for Part {part_number}{f' as of {date}' if date else ''}...", end=" ")
+
+    try:
+        with run_metrics.stage("ecfr_http_get"):
+            response = requests.get(url)
+
+        if response.status_code == 404:
+            print(f"   ℹ️ Part {part_number} does not exist (Reserved/Gap). Skipping.")
+            run_metrics.incr("cfr_parts_missing")
+            return []
+
+        response.raise_for_status()
+
+        with run_metrics.stage("clean_xml_text"):
+            raw_text = clean_xml_text(response.text)
+
+        if is_reserved_part(raw_text):
+            print(f"   ℹ️ Part {part_number} is marked 'Reserved'. Skipping.")
+            run_metrics.incr("cfr_parts_reserved")
+            return []
+
+        cfr_docs = parse_cfr_sections(raw_text, part_number)
+        if date:
+            for doc in cfr_docs:
+                doc['url'] = f"https://www.ecfr.gov/on/{date}/title-49/part-{part_number}"
+        print(f"Processing {len(cfr_docs)} sections...", end=" ")
+        return cfr_docs
+
+    except requests.exceptions.RequestException as e:
+        print(f"   ❌ Network/API Error fetching Part {part_number}: {e}")
+        run_metrics.incr("cfr_parts_failed")
+        return None
+
+
+def fetch_ecfr_date():
+    """eCFR's "up to date as of" date for title 49 (YYYY-MM-DD); today (UTC) when the API is unreachable."""
+    import requests
+
+    try:
+        response = requests.get(ECFR_TITLES_URL, timeout=15)
+        response.raise_for_status()
+        for title in response.json().get('titles', []):
+            if title.get('number') == 49 and title.get('up_to_date_as_of'):
+                return title['up_to_date_as_of']
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"   ⚠️ Could not read the eCFR date ({e}); using today's date.")
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+def fetch_cfr_version_dates(part_number, since=ECFR_HISTORY_START):
+    """
+    Dates (YYYY-MM-DD, oldest first) on which sections of a part changed after `since`, preceded
+    by the last one on or before it (the text in force on `since`). None when the API failed.
+    """
+    import requests
+
+    try:
+        with run_metrics.stage("ecfr_http_get"):
+            response = requests.get(ECFR_VERSIONS_URL, params={"part": part_number}, timeout=30)
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        dates = sorted({version['date'] for version in response.json().get('content_versions', []) if version.get('date')})
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"   ❌ Could not list eCFR versions of Part {part_number}: {e}")
+        return None
+    return [date for date in dates if date <= since][-1:] + [date for date in dates if date > since]
+
+
+class CfrSource:
+    """
+    49 CFR parts from the eCFR renderer API, one job per part. Records are stamped with
+    their content hash and `ecfr_date` as valid_from; with a `change_log`
+    (changes.CfrChangeLog) each job also diffs its sections for the change feed.
+    """
+
+    def __init__(self, parts=TARGET_PARTS, change_log=None, ecfr_date=None):
+        self.parts = list(parts)
+        self.change_log = change_log
+        self.ecfr_date = ecfr_date or (change_log and change_log.ecfr_date)
+
+    def load_part(self, part):
+        from .versions import stamp_versions
+
+        records = fetch_cfr_part(part)
+        if records and self.ecfr_date:
+            stamp_versions(records, self.ecfr_date)
+        return records
+
+    def jobs(self):
+        for part in self.parts:
+            yield IngestJob(
+                name=f"49 CFR Part {part}",
+                delete_filter={"part": part, "source": "FRA", "document_type": "Regulation"},
+                loader=lambda part=part: self.load_part(part),
+                stage="fetch_and_process_cfr_part",
+                detect_changes=self.change_log and (lambda records, part=part: self.change_log.diff(part, records)),
+            )
+
+
+class CfrHistorySource:
+    """
+    Superseded 49 CFR section versions since `since`, one append-only job per part, for
+    regulation_versions (versions.RegulationVersions). Versions already stored are skipped.
+    """
+
+    def __init__(self, versions, parts=TARGET_PARTS, since=ECFR_HISTORY_START):
+        self.versions = versions
+        self.parts = list(parts)
+        self.since = since
+        # Every version of the part, kept for the job's HistoryBackfill
+        self.backfilled = {}
+
+    def load_part(self, part):
+        from .sinks import regulation_doc_key
+        from .versions import section_versions, ecfr_datetime
+
+        dates = fetch_cfr_version_dates(part, self.since)
+        if dates is None:
+            return None
+        snapshots = []
+        for date in dates:
+            records = fetch_cfr_part(part, date)
+            if records is None:
+                # A gap would stretch the neighbouring versions over dates we never saw
+                return None
+            snapshots.append((date, records))
+            time.sleep(ECFR_REQUEST_DELAY_SECONDS)
+
+        versions = section_versions(snapshots)
+        self.backfilled[part] = versions
+        stored = self.versions.stored_keys(part)
+        superseded = []
+        for version in versions:
+            if version['valid_to'] is None:
+                continue
+            if (regulation_doc_key(part, version['section_id']), version['content_hash'], version['valid_from']) in stored:
+                continue
+            superseded.append({**version, 'valid_from': ecfr_datetime(version['valid_from']),
+                               'valid_to': ecfr_datetime(version['valid_to'])})
+        print(f"{len(dates)} version date(s), {len(superseded)} superseded section version(s) to store...", end=" ")
+        return superseded
+
+    def jobs(self):
+        from .versions import HistoryBackfill
+
+        for part in self.parts:
+            yield IngestJob(
+                name=f"49 CFR Part {part} history",
+                delete_filter=None,
+                loader=lambda part=part: self.load_part(part),
+                stage="fetch_cfr_part_history",
+                detect_changes=lambda records, part=part: HistoryBackfill(self.versions, part, self.backfilled.pop(part, [])),
+            )
+
+
+# --- FRA Safety Guidance ---
+
+def scrape_fra_advisories(url, doc_type):
+    """
+    Scrapes FRA listing pages using generic link structures for robustness.
+    """
+    import requests
+    from bs4 import BeautifulSoup
+
+    print(f"Starting generic scrape for FRA {doc_type} from: {url}")
+    advisories = []
+
+    last_error = None
+    last_status = None
+
+    for attempt in range(4):
+        try:
+            response = requests.get(url, timeout=15)
+            last_status = response.status_code
+            response.raise_for_status()
+            break
+        except requests.exceptions.RequestException as e:
+            last_error = e
+            if attempt < 3:
+                print(f"   Attempt {attempt+1} failed ({last_status or 'No Status'}). Retrying in {2**(attempt+1)}s...")
+                time.sleep(2 ** (attempt + 1))
+            else:
+                pass
+    else:
+        print(f"Failed to retrieve FRA {doc_type} after 4 attempts.")
+        print(f"   Final Status: {last_status}. Final Error: {last_error}")
+        return []
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+
+    main_content = soup.find('div', class_='field-body') or soup.find('main')
+    if not main_content:
+        print("   Warning: Could not find main content area. Aborting scrape.")
+        return []
+
+    for link in main_content.find_all('a'):
+        title = link.text.strip()
+        pdf_url_rel = link.get('href')
+
+        if not title or not pdf_url_rel:
+            continue
+
+        if ('safety' in title.lower() or doc_type.lower() in title.lower() or 'bulletin' in title.lower()) and (pdf_url_rel.endswith('.pdf') or pdf_url_rel.startswith('/sites/')):
+
+            pdf_url_base = "https://railroads.dot.gov"
+            pdf_url = pdf_url_base + pdf_url_rel if pdf_url_rel.startswith('/') else pdf_url_rel
+
+            date_issued = datetime.now(timezone.utc).isoformat()
+
+            advisories.append({
+                'source': 'FRA',
+                'document_type': 'Safety Guidance',
+                'title': title,
+                'doc_type': doc_type,
+                'date_issued': date_issued,
+                'applicable_49cfr': 'TBD - Requires PDF analysis',
+                'hazard_summary': f"Document available at: {pdf_url}",
+                'recommended_action': "Requires PDF download and text extraction for full content."
+            })
+
+    print(f"Successfully identified {len(advisories)} potential {doc_type} links.")
+    return advisories
+
+
+def load_fra_guidance():
+    """Scrapes both FRA listings; None when neither could be retrieved."""
+    fra_advisories = scrape_fra_advisories(FRA_ADVISORY_URL, 'Safety Advisory')
+    fra_bulletins = scrape_fra_advisories(FRA_BULLETIN_URL, 'Technical Bulletin')
+    all_fra_guidance = fra_advisories + fra_bulletins
+    return all_fra_guidance or None
+
+
+class FraGuidanceSource:
+    """FRA safety advisories and technical bulletins as a single job."""
+
+    def jobs(self):
+        yield IngestJob(
+            name="FRA Safety Guidance",
+            delete_filter={"source": "FRA", "document_type": "Safety Guidance"},
+            loader=load_fra_guidance,
+            stage="scrape_fra_guidance",
+        )
+
+
+# --- Operating Rules (rulebook registry) ---
+
+def load_rulebook_registry(config_dir=RULEBOOK_CONFIG_DIR):
+    """Loads every enabled rulebook definition (*.json) from the registry directory."""
+    if not os.path.isdir(config_dir):
+        print(f"   ⚠️ WARNING: Rulebook registry not found at: {config_dir}")
+        return []
+
+    rulebooks = []
+    for config_path in sorted(glob.glob(os.path.join(config_dir, "*.json"))):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as file:
+                rule_data = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"   ❌ ERROR: Could not read rulebook config {config_path}: {e}")
+            continue
+
+        missing = [key for key in RULEBOOK_REQUIRED_KEYS if not rule_data.get(key)]
+        if missing:
+            print(f"   ❌ ERROR: {os.path.basename(config_path)} is missing {', '.join(missing)}. Skipping.")
+            continue
+        if not rule_data.get('enabled', True):
+            continue
+
+        # Relative PDF paths are resolved against the registry directory, not the CWD
+        if not os.path.isabs(rule_data['pdf_path']):
+            rule_data['pdf_path'] = os.path.normpath(os.path.join(config_dir, rule_data['pdf_path']))
+        rulebooks.append(rule_data)
+
+    return rulebooks
+
+
+def load_rulebook(rule_data):
+    """Extracts and segments one rulebook PDF into Operating Rule records."""
+    rulebook_text = load_pdf_text(rule_data['pdf_path'])
+    if not rulebook_text:
+        return None
+    return segment_operating_rules(rulebook_text, rule_data)
+
+
+class RulebookSource:
+    """Rulebooks from the registry directory, one job per book."""
+
+    def __init__(self, config_dir=RULEBOOK_CONFIG_DIR):
+        self.config_dir = config_dir
+
+    def jobs(self):
+        for rule_data in load_rulebook_registry(self.config_dir):
+            yield IngestJob(
+                name=rule_data['system_name'],
+                # IDEMPOTENCY: only cleared once replacement rules are in hand
+                delete_filter={"rule_system": rule_data['system_name']},
+                loader=lambda rule_data=rule_data: load_rulebook(rule_data),
+                stage="process_rulebook",
+            )
@@ -0,0 +1,230 @@
+import time
+from datetime import datetime, timezone
+
+from .config import (
+    COLLECTION_NAME, ALIAS_COLLECTION_NAME, VECTOR_INDEX_NAME, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS,
+    KEEP_GENERATIONS, SWAP_MIN_COUNT_RATIO, SEARCH_INDEX_TIMEOUT_SECONDS, SWAP_SAMPLE_QUERIES,
+)
+
+# ==========================================
+# 🔁 BLUE/GREEN COLLECTION SWAP
+# ==========================================
+# --swap builds into knowledge_chunks_<run_id>, validates it, then repoints the
+# alias document that readers (test_search.py, server.js) resolve. An alias
+# rather than renameCollection lets the staging vector index be built and
+# queried before promotion.
+
+def resolve_active_collection_name(db, alias=COLLECTION_NAME):
+    """Returns the physical collection currently serving `alias` (the alias itself if never swapped)."""
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one({"_id": alias})
+    return alias_doc['target'] if alias_doc and alias_doc.get('target') else alias
+
+def current_index_generation(db, alias=COLLECTION_NAME):
+    """Counter bumped whenever the chunks behind `alias` change; query caches key on it."""
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one({"_id": alias}, {"generation": 1})
+    return (alias_doc or {}).get('generation', 0)
+
+def bump_index_generation(db, alias=COLLECTION_NAME):
+    """Invalidates every query cache reading `alias`. Safe before the first swap (no target is set)."""
+    from pymongo import ReturnDocument
+
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one_and_update(
+        {"_id": alias},
+        {"$inc": {"generation": 1}, "$set": {"generation_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    print(f"🔖 {alias} generation is now {alias_doc['generation']} (query caches invalidated).")
+    return alias_doc['generation']
+
+def record_collection_model(db, collection_name, model, dimensions, alias=COLLECTION_NAME):
+    """Records which embedding model produced the vectors of a generation (alias doc `models` map)."""
+    db[ALIAS_COLLECTION_NAME].update_one(
+        {"_id": alias},
+        {"$set": {f"models.{collection_name}": {"model": model, "dimensions": dimensions,
+                                                  "recorded_at": datetime.now(timezone.utc)}}},
+        upsert=True,
+    )
+
+def collection_model(db, collection_name=None, alias=COLLECTION_NAME):
+    """
+    {'model', 'dimensions'} recorded for a generation (default: the active one). Generations
+    built before models were recorded report EMBEDDING_MODEL when they hold any chunks.
+    """
+    collection_name = collection_name or resolve_active_collection_name(db, alias)
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one({"_id": alias}, {f"models.{collection_name}": 1})
+    recorded = ((alias_doc or {}).get('models') or {}).get(collection_name)
+    if recorded:
+        return recorded
+    if db[collection_name].count_documents({}, limit=1):
+        return {"model": EMBEDDING_MODEL, "dimensions": EMBEDDING_DIMENSIONS}
+    return None
+
+def record_collection_layout(db, collection_name, layout, alias=COLLECTION_NAME):
+    """Records the chunk document layout of a generation (alias doc `layouts` map, see layout.py)."""
+    db[ALIAS_COLLECTION_NAME].update_one({"_id": alias}, {"$set": {f"layouts.{collection_name}": layout}}, upsert=True)
+
+def collection_layout(db, collection_name=None, alias=COLLECTION_NAME):
+    """'legacy' or 'compact' as recorded for a generation (default: the active one), None if never recorded."""
+    collection_name = collection_name or resolve_active_collection_name(db, alias)
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one({"_id": alias}, {f"layouts.{collection_name}": 1})
+    return ((alias_doc or {}).get('layouts') or {}).get(collection_name)
+
+def check_collection_model(db, collection, embedder):
+    """Refuses to mix vectors from two models in one generation. Returns an error message or None."""
+    recorded = collection_model(db, collection.name)
+    if recorded and recorded['model'] != embedder.model:
+        return (f"{collection.name} was embedded with {recorded['model']}, not {embedder.model}; "
+                f"build a new generation with --swap to change models.")
+    return None
+
+def create_staging_collection(db, run_id, dimensions=None):
+    """
+    Creates an empty knowledge_chunks_<run_id> collection with the same vector index as the live one,
+    resized to `dimensions` when the new generation uses a model of another width.
+    """
+    from pymongo.operations import SearchIndexModel
+    from .search.filters import vector_index_definition
+
+    staging_name = f"{COLLECTION_NAME}_{run_id}"
+    db.create_collection(staging_name)
+    staging = db[staging_name]
+
+    # Mirror the live vector index definition so sample searches and readers behave identically
+    active = db[resolve_active_collection_name(db)]
+    definition = None
+    try:
+        for index in active.list_search_indexes(VECTOR_INDEX_NAME):
+            definition = index.get('latestDefinition') or index.get('definition')
+    except Exception as e:
+        print(f"   ⚠️ Could not read live search index definition ({e}). Using default.")
+
+    # Filter fields are always declared so pre-filtered searches work on the new generation
+    definition = vector_index_definition(definition)
+    if dimensions:
+        for field in definition['fields']:
+            if field.get('type') == 'vector':
+                field['numDimensions'] = dimensions
+
+    staging.create_search_index(SearchIndexModel(definition=definition, name=VECTOR_INDEX_NAME, type="vectorSearch"))
+    print(f"✅ Created staging collection {staging_name} (vector index '{VECTOR_INDEX_NAME}' building).")
+    return staging
+
+def apply_vector_index_definition(collection, dimensions=EMBEDDING_DIMENSIONS):
+    """Creates or updates the vector index on `collection` so every filter field is declared."""
+    from pymongo.operations import SearchIndexModel
+    from .search.filters import vector_index_definition
+
+    current = None
+    for index in collection.list_search_indexes(VECTOR_INDEX_NAME):
+        current = index.get('latestDefinition') or index.get('definition')
+
+    definition = vector_index_definition(current, dimensions=dimensions)
+    if current is None:
+        collection.create_search_index(SearchIndexModel(definition=definition, name=VECTOR_INDEX_NAME, type="vectorSearch"))
+        print(f"✅ Created vector index '{VECTOR_INDEX_NAME}' on {collection.name}.")
+    elif definition != current:
+        collection.update_search_index(VECTOR_INDEX_NAME, definition)
+        print(f"✅ Updated vector index '{VECTOR_INDEX_NAME}' on {collection.name} (rebuilding in the background).")
+    else:
+        print(f"   Vector index '{VECTOR_INDEX_NAME}' on {collection.name} already declares every filter field.")
+    return definition
+
+def wait_for_search_index(collection, timeout=SEARCH_INDEX_TIMEOUT_SECONDS):
+    """Blocks until the vector index on `collection` is queryable. Returns False on timeout."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for index in collection.list_search_indexes(VECTOR_INDEX_NAME):
+            if index.get('queryable'):
+                return True
+        time.sleep(5)
+    return False
+
+def validate_staging_collection(db, staging, embedder):
+    """Checks chunk counts against the live generation and runs sample searches on the staging build."""
+    active = db[resolve_active_collection_name(db)]
+    staged_count = staging.count_documents({})
+    live_count = active.count_documents({}) if active.name != staging.name else 0
+
+    print(f"   Staged chunks: {staged_count} (live: {live_count})")
+    if staged_count == 0:
+        print("   ❌ Validation failed: staging collection is empty.")
+        return False
+    if live_count and staged_count < live_count * SWAP_MIN_COUNT_RATIO:
+        print(f"   ❌ Validation failed: staging holds less than {SWAP_MIN_COUNT_RATIO:.0%} of the live chunks.")
+        return False
+
+    for document_type in active.distinct("document_type"):
+        if not staging.count_documents({"document_type": document_type}, limit=1):
+            print(f"   ❌ Validation failed: no '{document_type}' chunks in staging.")
+            return False
+
+    print("   Waiting for staging vector index to become queryable...", end=" ", flush=True)
+    if not wait_for_search_index(staging):
+        print("\n   ❌ Validation failed: staging vector index never became queryable.")
+        return False
+    print("ready.")
+
+    for query in SWAP_SAMPLE_QUERIES:
+        vector = embedder.embed(query)
+        if not vector:
+            print(f"   ❌ Validation failed: could not embed sample query '{query}'.")
+            return False
+        hits = list(staging.aggregate([
+            {"$vectorSearch": {"index": VECTOR_INDEX_NAME, "path": "embedding",
+                               "queryVector": vector, "numCandidates": 50, "limit": 3}},
+            {"$project": {"_id": 0, "section_id": 1}},
+        ]))
+        if not hits:
+            print(f"   ❌ Validation failed: sample search returned nothing for '{query}'.")
+            return False
+
+    print("   ✅ Staging collection passed validation.")
+    return True
+
+def swap_active_collection(db, staging_name, alias=COLLECTION_NAME):
+    """Atomically points the alias at `staging_name`, keeping previous generations for rollback."""
+    from pymongo import ReturnDocument
+
+    previous = resolve_active_collection_name(db, alias)
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one_and_update(
+        {"_id": alias},
+        {
+            "$set": {"target": staging_name, "swapped_at": datetime.now(timezone.utc)},
+            "$push": {"history": previous},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    print(f"🔁 {alias} now serves from {staging_name} (previous: {previous}).")
+
+    # Drop generations beyond the rollback window
+    history = alias_doc.get('history', [])
+    expired = history[:-KEEP_GENERATIONS] if KEEP_GENERATIONS > 0 else history
+    if expired:
+        update = {"$pull": {"history": {"$in": expired}}}
+        dropped_models = {f"{field}.{name}": "" for name in expired if name not in (staging_name, alias)
+                          for field in ("models", "layouts")}
+        if dropped_models:
+            update["$unset"] = dropped_models
+        db[ALIAS_COLLECTION_NAME].update_one({"_id": alias}, update)
+        for name in expired:
+            if name not in (staging_name, alias):
+                db.drop_collection(name)
+                print(f"   🗑️ Dropped expired generation {name}.")
+
+def rollback_active_collection(db, alias=COLLECTION_NAME):
+    """Points the alias back at the most recent previous generation."""
+    alias_doc = db[ALIAS_COLLECTION_NAME].find_one({"_id": alias})
+    if not alias_doc or not alias_doc.get('history'):
+        print("❌ Nothing to roll back to: no previous generation recorded.")
+        return False
+
+    previous = alias_doc['history'][-1]
+    db[ALIAS_COLLECTION_NAME].update_one(
+        {"_id": alias},
+        {"$set": {"target": previous, "swapped_at": datetime.now(timezone.utc)}, "$pop": {"history": 1}},
+    )
+    print(f"⏪ {alias} rolled back from {alias_doc['target']} to {previous}.")
+    bump_index_generation(db, alias)
+    return True
@@ -0,0 +1,45 @@
+import math
+import threading
+
+from .config import TOKENIZER_ENCODING
+
+# ==========================================
+# 🔢 TOKEN COUNTING
+# ==========================================
+# Exact token counts with tiktoken (the embedding model's own BPE), so chunks
+# and embedding batches can be packed right up to the model limits instead of
+# guessing from characters. tiktoken fetches the BPE file once and caches it;
+# offline hosts point TIKTOKEN_CACHE_DIR at a directory holding that cache.
+# Without it, counts fall back to a deliberately conservative estimate.
+
+# English prose averages ~4 chars per token, CFR citations and tables far fewer
+FALLBACK_CHARS_PER_TOKEN = 3
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """The tiktoken encoding, or None when tiktoken (or its BPE file) is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    print(f"   ⚠️ tiktoken unavailable ({e.__class__.__name__}); "
+                          f"estimating tokens as {FALLBACK_CHARS_PER_TOKEN} chars each.")
+                _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def tokenizer_name():
+    return TOKENIZER_ENCODING if get_encoding() is not None else f"estimate-{FALLBACK_CHARS_PER_TOKEN}cpt"
@@ -0,0 +1,176 @@
+from datetime import datetime, timezone
+
+from .config import REGULATION_VERSIONS_COLLECTION
+from .metrics import run_metrics
+
+# ==========================================
+# 📅 POINT-IN-TIME REGULATIONS
+# ==========================================
+# Regulation chunks carry content_hash (of their section's text) and
+# valid_from, the eCFR date since which that text is in force. The live
+# generation only ever holds the current text. When a sync finds a section
+# modified or removed (changes.py), its chunks and their embeddings are
+# copied into regulation_versions with valid_to set, before the part is
+# rewritten. Embeddings are copied, not recomputed.
+#
+#   python -m railnology_ingest history [--parts 236] [--since 2020-01-01]
+# backfills older versions from the eCFR versioned endpoints. The part is
+# fetched on every date a section changed. Consecutive dates with the same
+# section hash fold into one version, so only real changes are embedded and
+# stored. It also dates the current chunks precisely.
+#
+# Both collections may be in either chunk layout (layout.py); each records its own.
+#
+# test_search.vector_search(as_of=...) runs two range-filtered searches and merges them:
+#   live chunks:          valid_from <= as_of (and every non-regulation chunk)
+#   regulation_versions:  valid_from <= as_of < valid_to
+
+
+def ecfr_datetime(date):
+    """'2024-03-01' -> midnight UTC, the form chunks store so $vectorSearch can range-filter it."""
+    return datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+def stamp_versions(records, valid_from):
+    """Sets content_hash (per section) and valid_from (YYYY-MM-DD) on a part's Regulation records."""
+    from .changes import sections_by_id, section_hash
+
+    hashes = {section_id: section_hash(text) for section_id, text in sections_by_id(records).items()}
+    for record in records:
+        record['content_hash'] = hashes[record['section_id']]
+        record['valid_from'] = ecfr_datetime(valid_from)
+    return records
+
+def section_versions(snapshots):
+    """
+    Folds dated parses of one part, [(date, records)] oldest first, into section versions:
+    one record per run of dates with the same section text, with content_hash and
+    valid_from/valid_to dates (valid_to None while still in force).
+    """
+    from .changes import sections_by_id, section_hash
+
+    open_versions = {}
+    versions = []
+    for date, records in snapshots:
+        templates = {}
+        for record in records:
+            templates.setdefault(record['section_id'], record)
+        texts = sections_by_id(records)
+
+        for section_id, text in texts.items():
+            digest = section_hash(text)
+            current = open_versions.get(section_id)
+            if current and current['content_hash'] == digest:
+                continue
+            if current:
+                current['valid_to'] = date
+            version = {**templates[section_id], 'text': text, 'content_hash': digest, 'valid_from': date, 'valid_to': None}
+            open_versions[section_id] = version
+            versions.append(version)
+
+        # Sections missing from this date's text were removed on it
+        for section_id in [section_id for section_id in open_versions if section_id not in texts]:
+            open_versions.pop(section_id)['valid_to'] = date
+    return versions
+
+
+class RegulationVersions:
+    """Superseded regulation chunks (regulation_versions) next to the live generation `active`."""
+
+    def __init__(self, db, active):
+        from .swap import collection_model
+        from .layout import chunk_collection
+
+        self.db = db
+        self.active = active
+        self.collection = chunk_collection(db, REGULATION_VERSIONS_COLLECTION)
+        # Copied embeddings are only comparable with queries for the model that made them
+        stored = collection_model(db, self.collection.name)
+        live = collection_model(db, active.name)
+        self.compatible = not stored or not live or stored['model'] == live['model']
+        self.collection.create_index(self.collection.layout.index_keys(
+            [("parent_section_id", 1), ("content_hash", 1), ("valid_from", 1)]))
+        self.collection.create_index([("part", 1)])
+
+    def retire(self, part, section_ids, valid_to):
+        """Copies the live chunks of sections that are about to change into regulation_versions, closed at `valid_to`."""
+        from pymongo import ReplaceOne
+        from .sinks import regulation_doc_key
+        from .swap import collection_model, record_collection_model
+        from .layout import layout_of
+
+        if not section_ids:
+            return 0
+        if not self.compatible:
+            print(f"   ⚠️ {self.collection.name} holds another embedding model than {self.active.name}; "
+                  f"superseded Part {part} text not kept.")
+            return 0
+
+        keys = [regulation_doc_key(part, section_id) for section_id in section_ids]
+        live, stored = layout_of(self.active), self.collection.layout
+        with run_metrics.stage("retire_regulation_versions", items=len(keys)):
+            chunks = [live.decode(chunk) for chunk in self.active.find(
+                live.query({"parent_section_id": {"$in": keys}, "document_type": "Regulation"}), live.projection({"_id": 0}))]
+            requests = []
+            for chunk in chunks:
+                chunk['valid_to'] = valid_to
+                # Chunks written before versioning have no valid_from: in force since at least their last write
+                chunk.setdefault('valid_from', chunk.get('last_updated'))
+                requests.append(ReplaceOne(stored.query({"section_id": chunk['section_id'], "valid_from": chunk['valid_from']}),
+                                           stored.replacement(chunk), upsert=True))
+            if requests:
+                self.collection.bulk_write(requests, ordered=False)
+                if not collection_model(self.db, self.collection.name):
+                    recorded = collection_model(self.db, self.active.name) or {}
+                    record_collection_model(self.db, self.collection.name, recorded.get('model'), recorded.get('dimensions'))
+        run_metrics.incr("regulation_chunks_retired", len(chunks))
+        return len(chunks)
+
+    def stored_keys(self, part):
+        """(parent_section_id, content_hash, valid_from as YYYY-MM-DD) of every version already stored for a part."""
+        layout = self.collection.layout
+        docs = self.collection.find({"part": part}, layout.projection({"parent_section_id": 1, "content_hash": 1, "valid_from": 1}))
+        return {(doc['parent_section_id'], doc.get('content_hash'), doc['valid_from'].strftime("%Y-%m-%d"))
+                for doc in map(layout.decode, docs) if doc.get('valid_from')}
+
+
+class HistoryBackfill:
+    """
+    Change set of one `history` job (see IngestJob.detect_changes): once the part's superseded
+    versions are written, it dates the live chunks and sections with their real valid_from and
+    drops copies that `retire` had dated approximately.
+    """
+
+    unchanged = False
+
+    def __init__(self, versions, part, backfilled):
+        self.versions = versions
+        self.part = part
+        self.backfilled = backfilled
+
+    def prepare(self):
+        pass
+
+    def commit(self):
+        from pymongo import UpdateMany, UpdateOne
+        from .config import REGULATION_SECTIONS_COLLECTION
+        from .sinks import regulation_doc_key
+        from .layout import layout_of
+
+        active_layout = layout_of(self.versions.active)
+        live, sections, stale = [], [], {}
+        for version in self.backfilled:
+            key = regulation_doc_key(self.part, version['section_id'])
+            valid_from = ecfr_datetime(version['valid_from'])
+            if version['valid_to'] is None:
+                live.append(UpdateMany(active_layout.query({"parent_section_id": key, "content_hash": version['content_hash']}),
+                                       {"$set": {"valid_from": valid_from}}))
+                sections.append(UpdateOne({"_id": f"{self.part}:{version['section_id']}", "hash": version['content_hash']},
+                                          {"$set": {"valid_from": version['valid_from']}}))
+            stale.setdefault((key, version['content_hash']), []).append(valid_from)
+
+        if live:
+            self.versions.active.bulk_write(live, ordered=False)
+            self.versions.db[REGULATION_SECTIONS_COLLECTION].bulk_write(sections, ordered=False)
+        for (key, content_hash), valid_froms in stale.items():
+            self.versions.collection.delete_many(self.versions.collection.layout.query(
+                {"parent_section_id": key, "content_hash": content_hash, "valid_from": {"$nin": valid_froms}}))
@@ -0,0 +1,17 @@
+@echo off
+echo --- Starting Railnology Ingestion Scheduler ---
+
+:: ----------------------------------------------------------------------
+:: SECURITY WARNING: DO NOT COMMIT REAL KEYS TO GIT
+:: ----------------------------------------------------------------------
+
+if "%MONGO_URI%"=="" echo WARNING: MONGO_URI is not set. Runs will fail until it is.
+if "%OPENAI_API_KEY%"=="" echo WARNING: OPENAI_API_KEY is not set. Runs will fail until it is.
+
+:: Runs until closed. Each source refreshes on its own cadence (see SCHEDULER_TASKS in
+:: railnology_ingest\config.py); logs and state go to scheduler\ next to this file.
+:: Extra arguments are passed through, e.g. run_scheduler.bat --status
+cd /d "%~dp0"
+python -m railnology_ingest schedule %*
+
+pause
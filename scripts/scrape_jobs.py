@@ -1,24 +1,24 @@
-import requests
 import json
 import os
+import sys
+import argparse
 import time
 import logging
 from datetime import datetime
-from dotenv import load_dotenv # Import dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+from railnology_ingest.metrics import run_metrics
+from railnology_ingest.profiling import add_profile_arguments, profile_run
+from railnology_ingest.locks import RunLock, EXIT_LOCKED, print_lock_busy
 
 # ==========================================
 # 🚂 RAILNOLOGY PRODUCTION JOB SCRAPER
 # ==========================================
 
 # CONFIGURATION
-# Now loads strictly from .env or system environment
+# Now loads strictly from .env or system environment (see load_environment)
 API_URL = "https://railnology-api.onrender.com/api/jobs"
 
 # RAPID API CONFIGURATION (JSearch)
-RAPID_API_KEY = os.getenv("RAPID_API_KEY")
+RAPID_API_KEY = None
 RAPID_API_HOST = "jsearch.p.rapidapi.com"
 RAPID_API_URL = f"https://{RAPID_API_HOST}/search"
 
@@ -30,8 +30,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def load_environment():
+    """Loads .env on demand so importing the module (or --help) stays cheap."""
+    global RAPID_API_KEY
+    from dotenv import load_dotenv
+    load_dotenv()
+    RAPID_API_KEY = os.getenv("RAPID_API_KEY")
+
 class RailScraper:
     def __init__(self):
+        import requests
         self.session = requests.Session()
         self.jobs_found = []
 
@@ -116,7 +124,7 @@ class RailScraper:
             try:
                 # Add a delay to be polite to our own API
                 time.sleep(0.2)
-                response = requests.post(API_URL, json=job)
+                response = self.session.post(API_URL, json=job)
                 
                 if response.status_code in [200, 201]:
                     success_count += 1
@@ -128,7 +136,26 @@ class RailScraper:
         
         logger.info(f"--- Finished. Successfully posted {success_count}/{len(self.jobs_found)} jobs. ---")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Railnology production job scraper.")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Shared with the ingestion scheduler, so a manual run and a scheduled one never overlap
+    lock = RunLock("jobs")
+    if not lock.acquire():
+        print_lock_busy("jobs")
+        sys.exit(EXIT_LOCKED)
+    try:
+        with profile_run(args, "scrape_jobs"):
+            run_scraper()
+    finally:
+        lock.release()
+
+def run_scraper():
+    load_environment()
     scraper = RailScraper()
     
     print(f"--- 🕵️‍♀️ Starting Production Job Scraper at {datetime.now()} ---")
@@ -138,12 +165,14 @@ def main():
     search_terms = ["Railroad Conductor", "Locomotive Engineer", "Rail Signal", "Track Inspector"]
     
     for term in search_terms:
-        scraper.fetch_jobs_from_rapidapi(query=term, location="USA")
+        with run_metrics.stage("fetch_jobs_from_rapidapi"):
+            scraper.fetch_jobs_from_rapidapi(query=term, location="USA")
         time.sleep(1) # Respect Rate Limits
             
     # 2. UPLOAD TO DB
     if scraper.jobs_found:
-        scraper.post_jobs_to_api()
+        with run_metrics.stage("post_jobs_to_api", items=len(scraper.jobs_found)):
+            scraper.post_jobs_to_api()
     else:
         logger.warning("No jobs found in this run. Check API Key or Limits.")
 
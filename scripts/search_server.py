@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from railnology_ingest.config import (
+    RERANK_CANDIDATES, SNAPSHOT_DIR, SEARCH_SERVER_HOST, SEARCH_SERVER_PORT, SEARCH_SERVER_WORKERS,
+    SEARCH_BATCH_WINDOW_MS,
+)
+from railnology_ingest.search.snippets import trim_hits
+import test_search
+
+# ==========================================
+# 🛰️ LOCAL SEARCH SERVER (PRE-FORK)
+# ==========================================
+# Serves test_search's retrieval (vector search + rerank) over HTTP from a
+# memory-mapped snapshot (or a local dataset), with no Atlas round trip:
+#   python scripts/search_server.py [--index scripts/snapshots] [--workers 8] [--port 8765]
+#
+#   POST /search   {"query": "...", "filters": {"part": 213}, "top_k": 3}
+#                  ("vector": [...] instead of "query" skips embedding and reranking)
+#                  Hits carry a highlighted `snippet` (search/snippets.py) instead of
+#                  their text; add "full_text": true for the whole text
+#   GET  /health   snapshot, model, rows, worker pid and batching stats
+#
+# The parent maps the index once, binds the socket and forks the workers. The
+# children share the mapped pages and accept() on the same socket. Inside a
+# worker, request threads hand their query vectors to one QueryBatcher, which
+# coalesces those arriving within --batch-window-ms into one matrix product.
+# Without os.fork (Windows) it runs a single worker.
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set on the class by run_worker()
+    index = None
+    embed_query = None
+    rerank_candidates = RERANK_CANDIDATES
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=lambda v: v.isoformat() if hasattr(v, 'isoformat') else str(v)).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(404, {'error': "not found"})
+        self.send_json(200, {
+            'status': "OK",
+            'index': self.index.name,
+            'generation': self.index.generation,
+            'model': self.index.model,
+            'rows': len(self.index.docs),
+            'dimensions': self.index.embeddings.shape[1],
+            'pid': os.getpid(),
+            'batching': self.index.stats(),
+        })
+
+    def do_POST(self):
+        if self.path != "/search":
+            return self.send_json(404, {'error': "not found"})
+        started = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            query = (request.get('query') or "").strip()
+            vector = request.get('vector')
+            if not query and not vector:
+                return self.send_json(400, {'error': "'query' or 'vector' is required"})
+            top_k = int(request.get('top_k') or 3)
+
+            if vector is None:
+                vector = self.embed_query(query)
+                if not vector:
+                    return self.send_json(502, {'error': "query embedding failed"})
+            # Reranking needs the query text
+            candidates = self.rerank_candidates if query else 0
+            results = test_search.search(self.index, query, vector, candidates, top_k, request.get('filters'))
+            results = trim_hits(results, query, full_text=bool(request.get('full_text')))
+        except ValueError as e:
+            return self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            return self.send_json(500, {'error': str(e)})
+
+        self.send_json(200, {'results': results, 'took_ms': (time.perf_counter() - started) * 1000})
+
+
+def run_worker(sock, index, rerank_candidates, batch_window_ms=SEARCH_BATCH_WINDOW_MS):
+    """Serves requests on the shared listening socket until interrupted."""
+    from railnology_ingest.search.batching import QueryBatcher
+
+    SearchHandler.index = QueryBatcher(index, window_ms=batch_window_ms)
+    SearchHandler.embed_query = staticmethod(test_search.get_query_embedder(index.model, index.embeddings.shape[1]))
+    SearchHandler.rerank_candidates = rerank_candidates
+
+    server = ThreadingHTTPServer(sock.getsockname()[:2], SearchHandler, bind_and_activate=False)
+    server.daemon_threads = True
+    server.socket.close()
+    server.socket = sock
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def serve(index, host, port, workers, rerank_candidates, batch_window_ms=SEARCH_BATCH_WINDOW_MS):
+    sock = socket.create_server((host, port), backlog=1024)
+    if workers <= 1 or not hasattr(os, 'fork'):
+        print(f"🛰️ Serving {index.name} on http://{host}:{port} (1 worker)")
+        run_worker(sock, index, rerank_candidates, batch_window_ms)
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, index, rerank_candidates, batch_window_ms)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    print(f"🛰️ Serving {index.name} on http://{host}:{port} ({workers} workers: {', '.join(map(str, children))})")
+
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        print("\n   Stopped.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fork HTTP search server over a memory-mapped knowledge snapshot.")
+    parser.add_argument("--index", default=SNAPSHOT_DIR,
+                        help="Snapshot, snapshot root (serves CURRENT) or local dataset (default: scripts/snapshots).")
+    parser.add_argument("--host", default=SEARCH_SERVER_HOST, help=f"Bind address (default {SEARCH_SERVER_HOST}).")
+    parser.add_argument("--port", type=int, default=SEARCH_SERVER_PORT, help=f"Port (default {SEARCH_SERVER_PORT}).")
+    parser.add_argument("--workers", type=int, default=SEARCH_SERVER_WORKERS,
+                        help=f"Worker processes (default {SEARCH_SERVER_WORKERS}, one per CPU).")
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES,
+                        help=f"Vector candidates to rerank (default {RERANK_CANDIDATES}).")
+    parser.add_argument("--batch-window-ms", type=float, default=SEARCH_BATCH_WINDOW_MS,
+                        help=f"How long a query waits for others to score with (default {SEARCH_BATCH_WINDOW_MS:g}; 0 = no wait).")
+    parser.add_argument("--no-rerank", action="store_true", help="Return the raw vector search top_k.")
+    args = parser.parse_args(argv)
+
+    from railnology_ingest.search.local_index import LocalIndex
+
+    test_search.load_environment()
+    started = time.perf_counter()
+    index = LocalIndex.open(args.index)
+    print(f"✅ Opened {index.name} in {(time.perf_counter() - started) * 1000:.0f}ms "
+          f"({len(index.docs)} chunks, {len(index.slices)} slices, model {index.model})")
+    serve(index, args.host, args.port, args.workers, 0 if args.no_rerank else args.candidates, args.batch_window_ms)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,17 @@
 import os
+import re
 import sys
-from pymongo import MongoClient
-from openai import OpenAI
-from dotenv import load_dotenv
+import argparse
 from pathlib import Path
+from railnology_ingest.metrics import run_metrics
+from railnology_ingest.swap import resolve_active_collection_name, current_index_generation, collection_model
+from railnology_ingest.config import RERANK_CANDIDATES, VECTOR_FILTER_FIELDS, REGULATION_VERSIONS_COLLECTION
+from railnology_ingest.search.filters import atlas_filter, parse_filter_value, version_filter, combine_filters
+from railnology_ingest.search.cache import QueryCache
+from railnology_ingest.search.expand import expand_chunk, expanded_text
+from railnology_ingest.search.snippets import text_window, snippet
+from railnology_ingest.layout import layout_of
+from railnology_ingest.profiling import add_profile_arguments, profile_run
 
 # ==========================================
 # 🔧 ENVIRONMENT SETUP
@@ -14,91 +22,265 @@ current_dir = Path(__file__).resolve().parent
 root_dir = current_dir.parent
 env_path = root_dir / '.env'
 
-print(f"🔍 Looking for .env at: {env_path}")
+# 2. Keys are filled in by load_environment() when the tester actually runs,
+#    so importing this module (or --help) never touches the filesystem or prints.
+MONGO_URI = ""
+OPENAI_API_KEY = ""
 
-# 2. Load environment variables
-load_dotenv(dotenv_path=env_path, override=True)
+def load_environment():
+    global MONGO_URI, OPENAI_API_KEY
+    from dotenv import load_dotenv
+
+    print(f"🔍 Looking for .env at: {env_path}")
+    load_dotenv(dotenv_path=env_path, override=True)
+
+    MONGO_URI = (os.getenv("MONGO_URI") or "").strip()
+    OPENAI_API_KEY = (os.getenv("OPENAI_API_KEY") or "").strip()
 
 # ==========================================
 # 🔎 RAILNOLOGY SEARCH TESTER
 # ==========================================
 
-# 3. CONFIGURATION
-MONGO_URI = (os.getenv("MONGO_URI") or "").strip()
-OPENAI_API_KEY = (os.getenv("OPENAI_API_KEY") or "").strip()
-
 # Database Config
 DB_NAME = "railnology" 
 COLLECTION_NAME = "knowledge_chunks" 
 VECTOR_INDEX_NAME = "default"
 
-def check_environment():
-    if not MONGO_URI or not OPENAI_API_KEY:
+def check_environment(mongo=True, openai=True):
+    if (mongo and not MONGO_URI) or (openai and not OPENAI_API_KEY):
         print("\n❌ CRITICAL ERROR: Missing Keys")
         print(f"   The script found the .env file at {env_path}, but it didn't contain the keys.")
         print("   Please check that 'MONGO_URI' and 'OPENAI_API_KEY' are saved in that file.")
         sys.exit(1)
 
-def get_embedding(client, text):
+def get_embedding(client, text, model="text-embedding-3-small"):
     text = text.replace("\n", " ")
-    response = client.embeddings.create(input=[text], model="text-embedding-3-small")
+    response = client.embeddings.create(input=[text], model=model)
     return response.data[0].embedding
 
-def vector_search(collection, query_vector):
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": VECTOR_INDEX_NAME,
-                "path": "embedding",
-                "queryVector": query_vector,
-                "numCandidates": 100, 
-                "limit": 3 
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "title": 1,
-                "section_id": 1,
-                "part": 1,
-                "text": 1,
-                "score": { "$meta": "vectorSearchScore" }
-            }
-        }
-    ]
-    return list(collection.aggregate(pipeline))
-
-def main():
-    check_environment()
-    
+def get_query_embedder(model=None, dimensions=None):
+    """
+    Returns embed(text) for the model an index generation was built with (None: a generation from
+    before models were recorded, i.e. OpenAI). Local and stub models need no API key or network.
+    """
+    if not model or model.startswith("text-embedding-"):
+        from openai import OpenAI
+
+        check_environment(mongo=False)
+        client = OpenAI(api_key=OPENAI_API_KEY)
+        model = model or "text-embedding-3-small"
+        print(f"🧠 Query embedder: {model}")
+        return lambda text: get_embedding(client, text, model)
+
+    from railnology_ingest.embedding import embedder_for_model
+
+    embedder = embedder_for_model(model, dimensions)
+    print(f"🧠 Query embedder: {embedder.model}")
+    return embedder.embed
+
+def vector_search(collection, query_vector, limit=3, num_candidates=100, filters=None, as_of=None, versions=None,
+                  query=None, full_text=False):
+    """
+    $vectorSearch top `limit`. With `as_of` (a datetime), only text in force on that date: live
+    chunks valid by then, merged with the superseded regulation versions in `versions`
+    (the regulation_versions collection) whose validity range holds the date. Collections may be
+    layout.ChunkCollections in either layout; hits always come back legacy-shaped.
+    Unless `full_text`, each hit's text is cut server-side around the first term of `query`
+    (search/snippets.py), with text_offset/text_length telling where.
+    """
+    if as_of is None:
+        return run_vector_search(collection, query_vector, limit, num_candidates, atlas_filter(filters), query, full_text)
+
+    hits = run_vector_search(collection, query_vector, limit, num_candidates,
+                             combine_filters(atlas_filter(filters), version_filter(as_of)), query, full_text)
+    if versions is not None:
+        hits += run_vector_search(versions, query_vector, limit, num_candidates,
+                                  combine_filters(atlas_filter(filters), version_filter(as_of, superseded=True)),
+                                  query, full_text)
+    return sorted(hits, key=lambda hit: hit['score'], reverse=True)[:limit]
+
+def run_vector_search(collection, query_vector, limit, num_candidates, vector_filter=None, query=None, full_text=False):
+    vector_stage = {
+        "index": VECTOR_INDEX_NAME,
+        "path": "embedding",
+        "queryVector": query_vector,
+        "numCandidates": max(num_candidates, limit), 
+        "limit": limit 
+    }
+    # Pre-filter inside the index (fields must be declared: railnology_ingest index-definition --apply)
+    if vector_filter:
+        vector_stage["filter"] = vector_filter
+
+    projection = {
+        "_id": 0,
+        "title": 1,
+        "section_id": 1,
+        "part": 1,
+        "text": 1,
+        "context": 1,
+        "paragraph": 1,
+        "parent_section_id": 1,
+        "chunk_index": 1,
+        # Read by the reranker
+        "document_type": 1,
+        "rule_system": 1,
+        "rule_number": 1,
+        "effective_date": 1,
+        "last_updated": 1,
+        "valid_from": 1,
+        "valid_to": 1,
+        "score": { "$meta": "vectorSearchScore" }
+    }
+    layout = layout_of(collection)
+    pipeline = [{"$vectorSearch": vector_stage}]
+    if not full_text:
+        window_stage, projection['text'] = text_window(layout, query)
+        projection.update(text_offset=1, text_length=1)
+        pipeline.append(window_stage)
+    pipeline.append({"$project": layout.projection(projection)})
+    return [layout.decode(hit) for hit in collection.aggregate(pipeline)]
+
+def retrieve(collection, query_vector, limit, filters=None, as_of=None, versions=None, query=None, full_text=False):
+    """Vector hits from Atlas or, for a LocalIndex, from the matching local slices (full text: nothing to transfer)."""
+    if hasattr(collection, 'row_ranges'):
+        if as_of is not None:
+            raise ValueError("as_of searches need MongoDB: local indexes hold the current text only")
+        return collection.search(query_vector, limit=limit, filters=filters)
+    return vector_search(collection, query_vector, limit=limit, num_candidates=max(100, limit * 4), filters=filters,
+                         as_of=as_of, versions=versions, query=query, full_text=full_text)
+
+def search(collection, query, query_vector, rerank_candidates=RERANK_CANDIDATES, top_k=3, filters=None,
+           as_of=None, versions=None, full_text=False):
+    """Top `top_k` hits for a query: vector search alone, or reranked from a wider candidate set."""
+    if not rerank_candidates:
+        with run_metrics.stage("vector_search"):
+            return retrieve(collection, query_vector, top_k, filters, as_of, versions, query, full_text)
+
+    from railnology_ingest.search.rerank import rerank
+
+    with run_metrics.stage("vector_search"):
+        candidates = retrieve(collection, query_vector, rerank_candidates, filters, as_of, versions, query, full_text)
+    with run_metrics.stage("rerank", items=len(candidates)):
+        return rerank(query, candidates, top_k=top_k)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Interactive Railnology vector search tester.")
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES,
+                        help=f"Vector search candidates to rerank (default {RERANK_CANDIDATES}).")
+    parser.add_argument("--no-rerank", action="store_true", help="Show the raw vector search top 3.")
+    parser.add_argument("--local", metavar="PATH",
+                        help="Search a local chunk dataset (ingest --sink local) or a memory-mapped snapshot "
+                             "(`snapshot` command; pass scripts/snapshots for the CURRENT one) instead of Atlas.")
+    for field in VECTOR_FILTER_FIELDS:
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, metavar="VALUE[,VALUE]",
+                            help=f"Only search chunks with this {field}.")
+    parser.add_argument("--as-of", metavar="YYYY-MM-DD",
+                        help="Search the regulations as they read on this date (e.g. of an incident).")
+    parser.add_argument("--full-text", action="store_true",
+                        help="Fetch and print each hit's whole text instead of a highlighted snippet.")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    filters = {field: parse_filter_value(field, getattr(args, field))
+               for field in VECTOR_FILTER_FIELDS if getattr(args, field)}
+    with profile_run(args, "test_search"):
+        run_search_loop(0 if args.no_rerank else args.candidates, filters, args.local, args.as_of, args.full_text)
+
+def open_local_index(path):
+    """Loads a local dataset or snapshot index and the query embedder matching the model that built it."""
+    from railnology_ingest.search.local_index import LocalIndex
+
+    index = LocalIndex.open(path)
+    print(f"✅ Loaded local index {path} ({len(index.docs)} chunks, {len(index.slices)} slices, model {index.model})")
+    return index, get_query_embedder(index.model, index.embeddings.shape[1])
+
+def run_search_loop(rerank_candidates=RERANK_CANDIDATES, filters=None, local_path=None, as_of=None, full_text=False):
+    load_environment()
+    versions = None
+
     try:
-        mongo = MongoClient(MONGO_URI)
-        db = mongo[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-        
-        count = collection.count_documents({})
-        print(f"✅ Connected to {DB_NAME}.{COLLECTION_NAME}")
-        print(f"📊 Total Knowledge Chunks: {count}")
+        if local_path:
+            collection, embed_query = open_local_index(local_path)
+            cache = QueryCache(lambda: collection.generation)
+        else:
+            from pymongo import MongoClient
+            from railnology_ingest.layout import chunk_collection
+
+            check_environment(openai=False)
+            mongo = MongoClient(MONGO_URI)
+            db = mongo[DB_NAME]
+            collection = chunk_collection(db, resolve_active_collection_name(db))
+            recorded = collection_model(db, collection.name) or {}
+            embed_query = get_query_embedder(recorded.get('model'), recorded.get('dimensions'))
+            # Cleared as soon as an ingestion run bumps the generation
+            cache = QueryCache(lambda: current_index_generation(db))
+
+            count = collection.count_documents({})
+            print(f"✅ Connected to {DB_NAME}.{collection.name} ({collection.layout.name} layout)")
+            print(f"📊 Total Knowledge Chunks: {count}")
+
+            if as_of:
+                # Superseded versions only count if their vectors come from the query's model
+                stored = collection_model(db, REGULATION_VERSIONS_COLLECTION)
+                if stored and stored['model'] == recorded.get('model', stored['model']):
+                    versions = chunk_collection(db, REGULATION_VERSIONS_COLLECTION)
+                else:
+                    print(f"⚠️ No comparable {REGULATION_VERSIONS_COLLECTION}; as_of only drops text newer than {as_of}.")
         
     except Exception as e:
         print(f"❌ Connection Error: {e}")
         return
 
+    if filters:
+        print(f"🧮 Filters: {filters}")
+    as_of_date = None
+    if as_of:
+        from railnology_ingest.versions import ecfr_datetime
+
+        as_of_date = ecfr_datetime(as_of)
+        print(f"📅 Regulations as of {as_of}")
+
     print("\n🚂 RAILNOLOGY AI SEARCH TEST")
     print("-----------------------------------")
-    print("Type 'exit' to quit.\n")
+    print("Type 'expand N' to read the whole section of result N, 'exit' to quit.\n")
     
+    results = []
     while True:
         query = input("Ask Railly a question: ")
         if query.lower() in ['exit', 'quit']:
             break
+
+        expand = re.fullmatch(r"expand\s+(\d+)", query.strip().lower())
+        if expand:
+            if not 1 <= int(expand.group(1)) <= len(results):
+                print("   No such result. Run a search first.")
+                continue
+            if local_path:
+                print("   Expanding needs MongoDB; not available with --local.")
+                continue
+            hit = results[int(expand.group(1)) - 1]
+            with run_metrics.stage("expand_chunk"):
+                chunks = expand_chunk(collection, hit)
+            print(f"\n   📖 {len(chunks)} chunk(s) of {hit.get('parent_section_id') or hit.get('section_id')}:\n")
+            print(expanded_text(chunks))
+            continue
             
         print("   ... Thinking ...")
         
         try:
-            query_vector = get_embedding(openai_client, query)
-            results = vector_search(collection, query_vector)
+            with run_metrics.stage("query_cache"):
+                results = cache.get(query, filters, candidates=rerank_candidates, as_of=as_of)
+            if results is not None:
+                print(f"   ⚡ Cached result (hits: {cache.hits}, misses: {cache.misses})")
+            else:
+                with run_metrics.stage("get_embedding"):
+                    query_vector = embed_query(query)
+                results = search(collection, query, query_vector, rerank_candidates, filters=filters,
+                                 as_of=as_of_date, versions=versions, full_text=full_text)
+                if results:
+                    cache.put(query, results, filters, candidates=rerank_candidates, as_of=as_of)
             
             if not results:
                 print(f"   ❌ No matches found via index '{VECTOR_INDEX_NAME}'.")
@@ -108,8 +290,15 @@ def main():
                     if doc.get('part') == 0:
                         source_label = f"INDUSTRY INTEL: {doc.get('title')}"
 
-                    print(f"\n   [{i+1}] {source_label} (Match: {doc.get('score', 0):.4f})")
-                    print(f"       \"{doc.get('text', '')[:200].replace(chr(10), ' ')}...\"")
+                    if doc.get('paragraph'):
+                        source_label += f" {doc['paragraph']}"
+
+                    rerank_label = f", Rerank: {doc['rerank_score']:.3f}" if 'rerank_score' in doc else ""
+                    print(f"\n   [{i+1}] {source_label} (Match: {doc.get('score', 0):.4f}{rerank_label})")
+                    if full_text:
+                        print(f"       {doc.get('text', '')}")
+                    else:
+                        print(f"       \"{snippet(doc, query)}\"")
                     
         except Exception as e:
             print(f"   ⚠️ Error: {e}")
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from railnology_ingest.search.batching import QueryBatcher
+
+
+class FakeIndex:
+    """search_batch returns, per query, `limit` hits naming the query they answer."""
+
+    name = "fake-index"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def search_batch(self, vectors, limit, filters):
+        self.calls.append((list(vectors), limit, list(filters)))
+        if self.fail:
+            raise RuntimeError("index unavailable")
+        return [[{"query": vector[0], "rank": rank} for rank in range(limit)] for vector in vectors]
+
+def search_concurrently(batcher, requests):
+    """Runs batcher.search(*args) for each request on its own thread; returns results (or errors) in order."""
+    results = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def worker(i, args):
+        start.wait()
+        try:
+            results[i] = batcher.search(*args)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_concurrent_queries_share_a_batch_and_get_their_own_results():
+    index = FakeIndex()
+    batcher = QueryBatcher(index, max_batch=8, window_ms=500)
+    results = search_concurrently(batcher, [([i], i + 1, {"part": 213, "source": ""} if i == 2 else None) for i in range(4)])
+
+    assert len(index.calls) == 1
+    vectors, limit, filters = index.calls[0]
+    assert sorted(vectors) == [[0], [1], [2], [3]] and limit == 4
+    # Filters are normalized once per caller, before they reach the index
+    assert sorted(filters, key=len) == [{}, {}, {}, {"part": 213}]
+    for i, hits in enumerate(results):
+        assert [hit['query'] for hit in hits] == [i] * (i + 1)
+    assert batcher.stats() == {'batches': 1, 'queries': 4, 'avg_batch': 4.0}
+
+def test_batches_are_capped_at_max_batch():
+    index = FakeIndex()
+    batcher = QueryBatcher(index, max_batch=2, window_ms=200)
+    results = search_concurrently(batcher, [([i], 1) for i in range(5)])
+
+    assert [len(vectors) for vectors, _, _ in index.calls] == [2, 2, 1]
+    assert [hits[0]['query'] for hits in results] == [0, 1, 2, 3, 4]
+
+def test_errors_reach_every_caller_in_the_batch():
+    batcher = QueryBatcher(FakeIndex(fail=True), window_ms=200)
+    results = search_concurrently(batcher, [([0], 3), ([1], 3)])
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    with pytest.raises(RuntimeError):
+        batcher.search([2], 3)
+
+def test_index_attributes_pass_through():
+    assert QueryBatcher(FakeIndex(), window_ms=0).name == "fake-index"
@@ -0,0 +1,52 @@
+from railnology_ingest.search.cache import QueryCache, normalize_query
+
+
+class Generation:
+    def __init__(self):
+        self.value = 1
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.value
+
+
+def test_normalize_query():
+    assert normalize_query("  What is the speed limit\tfor Class 3 track?! ") == "what is the speed limit for class 3 track"
+
+def test_hits_ignore_case_spacing_and_filter_order():
+    cache = QueryCache(Generation(), check_seconds=0)
+    cache.put("Speed limit?", ["hit"], filters={"part": 213, "source": "FRA"}, top_k=3)
+
+    assert cache.get("speed   LIMIT", filters={"source": "FRA", "part": 213}, top_k=3) == ["hit"]
+    assert cache.get("speed limit", filters={"part": 214}, top_k=3) is None
+    assert cache.get("speed limit", filters={"part": 213, "source": "FRA"}, top_k=5) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_a_new_generation_drops_every_entry():
+    generation = Generation()
+    cache = QueryCache(generation, check_seconds=0)
+    cache.put("speed limit", ["old"])
+    generation.value = 2
+
+    assert cache.get("speed limit") is None
+    assert cache.entries == {}
+
+def test_generation_is_polled_at_most_every_check_seconds():
+    generation = Generation()
+    cache = QueryCache(generation, check_seconds=3600)
+    cache.put("speed limit", ["hit"])
+    generation.value = 2
+
+    assert cache.get("speed limit") == ["hit"]
+    assert generation.reads == 1
+
+def test_least_recently_used_entries_go_first():
+    cache = QueryCache(Generation(), max_entries=2, check_seconds=0)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from railnology_ingest.changes import CfrChangeLog, section_diff, section_hash, sections_by_id
+from railnology_ingest.config import REGULATION_CHANGES_COLLECTION, REGULATION_SECTIONS_COLLECTION
+
+SPEEDS = "§ 213.9 Speeds.\n(a) Class 1 track: 10 mph.\n(b) Class 2 track: 25 mph."
+CURVES = "§ 213.57 Curves.\n(a) Maximum elevation is 7 inches."
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for the change log."""
+
+    def __init__(self):
+        self.docs = {}
+        self.inserted = []
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+    def create_index(self, keys):
+        pass
+
+    def find(self, query):
+        return [doc for doc in self.docs.values() if all(doc.get(key) == value for key, value in query.items())]
+
+    def insert_many(self, docs, ordered=True):
+        self.inserted.extend(docs)
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            self.docs[request._filter["_id"]] = request._doc
+
+    def delete_many(self, query):
+        removed = set(query["section_id"]["$in"])
+        self.docs = {key: doc for key, doc in self.docs.items()
+                     if not (doc['part'] == query['part'] and doc['section_id'] in removed)}
+
+class FakeDb(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+def records(**sections):
+    return [{"document_type": "Regulation", "part": 213, "section_id": section_id.replace("_", "."), "text": text}
+            for section_id, text in sections.items()]
+
+def sync(db, ecfr_date, parsed, **options):
+    log = CfrChangeLog(db, ecfr_date, **options)
+    changes = log.diff(213, parsed)
+    changes.prepare()
+    changes.commit()
+    return log, changes
+
+
+def test_section_hash_ignores_reflowed_whitespace():
+    assert section_hash(SPEEDS) == section_hash(SPEEDS.replace("\n", "  \n ").replace(" mph", "\tmph"))
+    assert section_hash(SPEEDS) != section_hash(SPEEDS.replace("25", "30"))
+
+def test_section_diff_shows_the_changed_paragraph():
+    diff = section_diff(SPEEDS, SPEEDS.replace("25 mph", "30 mph"))
+    assert "-(b) Class 2 track: 25 mph." in diff.splitlines()
+    assert "+(b) Class 2 track: 30 mph." in diff.splitlines()
+    assert not any(line.startswith(("---", "+++", "-(a)", "+(a)")) for line in diff.splitlines())
+    assert section_diff(SPEEDS, SPEEDS.replace("25", "30"), max_chars=10).endswith("... (diff truncated)")
+
+def test_sections_by_id_joins_repeated_sections():
+    assert sections_by_id(records(**{"213_9": "(a)"}) + records(**{"213_9": "(b)"})) == {"213.9": "(a)\n(b)"}
+
+def test_first_sync_only_seeds_the_section_state():
+    db = FakeDb()
+    _, changes = sync(db, "2024-01-01", records(**{"213_9": SPEEDS, "213_57": CURVES}))
+    assert changes.events == [] and not changes.unchanged
+    assert len(db[REGULATION_SECTIONS_COLLECTION].docs) == 2
+
+def test_sync_records_added_modified_and_removed_sections():
+    db = FakeDb()
+    sync(db, "2024-01-01", records(**{"213_9": SPEEDS, "213_57": CURVES}))
+
+    parsed = records(**{"213_9": SPEEDS.replace("25", "30"), "213_11": "§ 213.11 Restoration."})
+    _, changes = sync(db, "2025-06-01", parsed)
+    assert sorted((event['section_id'], event['change']) for event in changes.events) == [
+        ("213.11", "added"), ("213.57", "removed"), ("213.9", "modified"),
+    ]
+    modified = next(event for event in changes.events if event['change'] == "modified")
+    assert modified['previous_hash'] == section_hash(SPEEDS) and modified['hash'] == section_hash(parsed[0]['text'])
+    assert modified['ecfr_date'] == "2025-06-01"
+    assert db[REGULATION_CHANGES_COLLECTION].inserted == changes.events
+    assert sorted(doc['section_id'] for doc in db[REGULATION_SECTIONS_COLLECTION].docs.values()) == ["213.11", "213.9"]
+    # Changed sections are in force from this eCFR date
+    assert parsed[0]['valid_from'] == datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+def test_unchanged_sections_keep_their_first_valid_from():
+    db = FakeDb()
+    sync(db, "2024-01-01", records(**{"213_9": SPEEDS}))
+    parsed = records(**{"213_9": SPEEDS})
+    _, changes = sync(db, "2025-06-01", parsed)
+
+    assert changes.unchanged
+    assert parsed[0]['valid_from'] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def test_deferred_log_commits_only_when_told():
+    db = FakeDb()
+    sync(db, "2024-01-01", records(**{"213_9": SPEEDS}))
+    log, changes = sync(db, "2025-06-01", records(**{"213_9": SPEEDS.replace("25", "30")}), deferred=True)
+
+    assert log.pending == [changes] and db[REGULATION_CHANGES_COLLECTION].inserted == []
+    assert log.commit_pending() == 1
+    assert log.pending == [] and [event['change'] for event in db[REGULATION_CHANGES_COLLECTION].inserted] == ["modified"]
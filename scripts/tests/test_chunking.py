@@ -0,0 +1,107 @@
+import pytest
+
+from railnology_ingest import tokens
+from railnology_ingest.chunking import StructuredChunker, split_cfr_paragraphs, split_subrules
+from railnology_ingest.embedding import StubEmbedder
+from railnology_ingest.pipeline import Pipeline
+from railnology_ingest.search.expand import expand_chunk, expanded_text
+
+HEADING = "§ 213.9 Classes of track: operating speed limits."
+SECTION = f"""{HEADING}
+(a) Except as provided in paragraph (b) of this section, the following maximum allowable operating speeds apply:
+(1) Class 1 track: 10 miles per hour for freight trains.
+(2) Class 2 track: 25 miles per hour for freight trains.
+(i) Excepted track is limited to 10 miles per hour.
+(ii) Not more than five cars placarded as hazardous materials.
+(b) If a segment of track does not meet all of the requirements for its intended class, it is reclassified."""
+LEAD_IN = SECTION.split("\n")[1]
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", None)
+    monkeypatch.setattr(tokens, "_encoding_loaded", True)
+
+def regulation(text=SECTION):
+    return {"source": "FRA", "document_type": "Regulation", "title": "Track Safety Standards", "part": 213,
+            "section_id": "213.9", "url": "https://www.ecfr.gov/current/title-49/part-213", "text": text}
+
+class RecordingSink:
+    def __init__(self):
+        self.docs = []
+
+    def write(self, doc, ticket=None):
+        self.docs.append(doc)
+
+    def flush(self):
+        pass
+
+class Cursor(list):
+    def sort(self, key, direction):
+        return Cursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        def matches(doc):
+            for key, condition in query.items():
+                value = doc.get(key)
+                if isinstance(condition, dict):
+                    if not condition["$gte"] <= value <= condition["$lte"]:
+                        return False
+                elif value != condition:
+                    return False
+            return True
+        return Cursor(doc for doc in self.docs if matches(doc))
+
+
+def test_split_cfr_paragraphs_nests_markers():
+    paths = [path for path, _ in split_cfr_paragraphs(SECTION)]
+    assert paths == [(), ("a",), ("a", "1"), ("a", "2"), ("a", "2", "i"), ("a", "2", "ii"), ("b",)]
+
+def test_roman_numerals_only_where_one_is_due():
+    paths = [path for path, _ in split_cfr_paragraphs("(h) Eighth.\n(i) Ninth, not a roman numeral.")]
+    assert paths == [("h",), ("i",)]
+
+def test_split_subrules():
+    text = "Rule 6.27 Movement at restricted speed.\nA. Trains must stop.\n1. Within half the range.\na) Of vision.\nB. Other."
+    assert [path for path, _ in split_subrules(text)] == [(), ("A",), ("A", "1"), ("A", "1", "a"), ("B",)]
+
+def test_small_chunks_carry_their_parents_lead_in():
+    chunks = StructuredChunker(target_tokens=30, max_tokens=60).chunk(regulation())
+    by_paragraph = {chunk['paragraph']: chunk for chunk in chunks}
+
+    assert by_paragraph["(a)(2)(i)"]['text'].startswith("(i) Excepted track")
+    assert by_paragraph["(a)(2)(i)"]['context'].split("\n") == [
+        f"Track Safety Standards {HEADING}", LEAD_IN, "(2) Class 2 track: 25 miles per hour for freight trains.",
+    ]
+    # A paragraph whose own text is in the chunk is not repeated in the header
+    assert by_paragraph["(a)"]['context'] == f"Track Safety Standards {HEADING}"
+    assert by_paragraph["(b)"]['context'] == f"Track Safety Standards {HEADING}"
+
+def test_paragraphs_are_packed_up_to_the_target():
+    chunks = StructuredChunker(target_tokens=1000).chunk(regulation())
+    assert len(chunks) == 1
+    assert chunks[0]['text'] == SECTION and chunks[0]['paragraph'] == "(a)-(b)"
+
+def test_chunks_link_to_their_parent_section_and_expand_back_to_it():
+    sink = RecordingSink()
+    pipeline = Pipeline(StructuredChunker(target_tokens=30, max_tokens=60), StubEmbedder(dimensions=4), sink)
+    assert pipeline.ingest_records([regulation()]) == 7
+
+    assert {doc['parent_section_id'] for doc in sink.docs} == {"213_213_9"}
+    assert [doc['chunk_index'] for doc in sink.docs] == list(range(7))
+    assert {doc['chunk_count'] for doc in sink.docs} == {7}
+    assert sink.docs[4]['section_id'] == "213_213_9_p5" and sink.docs[4]['paragraph'] == "(a)(2)(i)"
+
+    collection = FakeCollection(list(reversed(sink.docs)))
+    neighbours = expand_chunk(collection, sink.docs[4], window=1)
+    assert [doc['paragraph'] for doc in neighbours] == ["(a)(2)", "(a)(2)(i)", "(a)(2)(ii)"]
+    section = expand_chunk(collection, sink.docs[4])
+    assert expanded_text(section) == f"Track Safety Standards {HEADING}\n{SECTION}"
+
+def test_hits_without_parent_links_expand_to_themselves():
+    hit = {"text": "Legacy chunk", "section_id": "213.9"}
+    assert expand_chunk(FakeCollection([]), hit) == [hit]
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from railnology_ingest.dataset import DatasetWriter, iter_dataset, read_manifest, verify_files
+
+
+def chunk(i, **fields):
+    return {
+        "source": "FRA",
+        "document_type": "Regulation",
+        "title": "Track Safety Standards",
+        "text": f"Chunk {i}",
+        "section_id": f"213.{i}",
+        "part": 213,
+        "embedding": [float(i), 0.5, -1.0],
+        "last_updated": datetime(2024, 3, 1, tzinfo=timezone.utc),
+        **fields,
+    }
+
+def write_dataset(root, fmt, docs):
+    writer = DatasetWriter(str(root), fmt=fmt, model="stub")
+    for doc in docs:
+        writer.write(doc)
+    return writer.close()
+
+def sample_docs():
+    # The first chunk has none of the optional fields the later ones carry
+    return [
+        chunk(1),
+        chunk(2, context="Subpart A", paragraph="(a)", parent_section_id="213_213_2", content_hash="abc",
+              valid_from=datetime(2020, 1, 1, tzinfo=timezone.utc), citations=["213.9"], token_count=42),
+        chunk(3, context="Subpart B", token_count=7),
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "parquet"])
+def test_round_trip_keeps_optional_fields(tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    docs = sample_docs()
+    manifest = write_dataset(tmp_path / "dataset", fmt, docs)
+
+    assert manifest['total_rows'] == len(docs)
+    assert verify_files(str(tmp_path / "dataset"), read_manifest(str(tmp_path / "dataset"))) == []
+    loaded = sorted(iter_dataset(str(tmp_path / "dataset")), key=lambda doc: doc['text'])
+    assert loaded == docs
+
+def test_rows_per_file_splits_files(tmp_path):
+    writer = DatasetWriter(str(tmp_path / "dataset"), rows_per_file=2)
+    for i in range(5):
+        writer.write(chunk(i))
+    manifest = writer.close()
+
+    assert [entry['rows'] for entry in manifest['files']] == [2, 2, 1]
+    assert [doc['text'] for doc in iter_dataset(str(tmp_path / "dataset"))] == [f"Chunk {i}" for i in range(5)]
+
+def test_mismatched_dimensions_are_rejected(tmp_path):
+    writer = DatasetWriter(str(tmp_path / "dataset"))
+    writer.write(chunk(1))
+    with pytest.raises(ValueError):
+        writer.write(chunk(2, embedding=[1.0]))
+
+def test_refuses_non_empty_directory(tmp_path):
+    (tmp_path / "stray.txt").write_text("x")
+    with pytest.raises(FileExistsError):
+        DatasetWriter(str(tmp_path))
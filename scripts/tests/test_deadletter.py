@@ -0,0 +1,95 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from railnology_ingest.deadletter import DeadLetterStore, backoff_seconds, retry_dead_letters
+
+NOW = 1_700_000_000.0
+# Past the first backoff of entries added now
+TOMORROW = time.time() + 86400
+
+
+class FlakyEmbedder:
+    """Embeds every text except those containing `failing`."""
+
+    model = "test-model"
+
+    def __init__(self, failing="never"):
+        self.failing = failing
+        self.calls = []
+
+    def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        return [[] if self.failing in text else [0.5, 0.5] for text in texts]
+
+def chunk(section_id, text):
+    return {"section_id": section_id, "parent_section_id": section_id.rsplit("_p", 1)[0], "text": text,
+            "document_type": "Regulation", "part": 213, "embedding": [],
+            "valid_from": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+
+def dead_letters(root, *docs, model="test-model"):
+    store = DeadLetterStore(str(root), run_id="run-1", target={"collection": "knowledge_chunks"})
+    for doc in docs:
+        store.add(doc, f"context\n{doc['text']}", "timeout", model, token_count=5)
+    return store
+
+
+def test_entries_are_partial_until_the_run_closes(tmp_path):
+    store = dead_letters(tmp_path, chunk("213_213_9_p1", "Speeds."))
+    assert store.files() == [] and store.pending() == 1
+    assert os.path.exists(store.path + ".partial")
+
+    assert store.close() == 1
+    assert store.files() == [store.path]
+    entry, = store.read(store.path)
+    assert entry['reason'] == "timeout" and entry['attempts'] == 0 and entry['target'] == {"collection": "knowledge_chunks"}
+    assert 'embedding' not in entry['doc']
+
+def test_retry_round_trip_restores_the_documents(tmp_path):
+    first, second = chunk("213_213_9_p1", "Speeds."), chunk("213_213_9_p2", "Curves.")
+    store = dead_letters(tmp_path, first, second)
+    store.close()
+
+    written = []
+    stats = retry_dead_letters(store, FlakyEmbedder(), written.extend, now=TOMORROW)
+    assert stats['recovered'] == 2 and stats['failed'] == 0 and stats['next_attempt_at'] is None
+    assert [doc['section_id'] for doc in written] == ["213_213_9_p1", "213_213_9_p2"]
+    # Everything but the vector and write time comes back as it went in, datetimes included
+    assert {k: v for k, v in written[0].items() if k not in ("embedding", "last_updated")} == \
+        {k: v for k, v in first.items() if k != "embedding"}
+    assert written[0]['embedding'] == [0.5, 0.5]
+    assert store.files() == [] and store.pending() == 0
+
+def test_failed_retries_back_off(tmp_path):
+    store = dead_letters(tmp_path, chunk("213_213_9_p1", "Speeds."), chunk("213_213_9_p2", "Curves."))
+    store.close()
+
+    written = []
+    stats = retry_dead_letters(store, FlakyEmbedder(failing="Curves"), written.extend, now=NOW)
+    # Not due yet: added with a first backoff from the real clock
+    assert stats['not_due'] == 2 and written == []
+
+    due = max(entry['next_attempt_at'] for entry in store.read(store.path))
+    stats = retry_dead_letters(store, FlakyEmbedder(failing="Curves"), written.extend, now=due)
+    assert stats['recovered'] == 1 and stats['failed'] == 1
+    entry, = store.read(store.path)
+    assert entry['section_id'] == "213_213_9_p2" and entry['attempts'] == 1
+    assert entry['next_attempt_at'] == stats['next_attempt_at'] == due + backoff_seconds(1)
+
+def test_obsolete_and_foreign_entries(tmp_path):
+    store = dead_letters(tmp_path, chunk("213_213_9_p1", "Speeds."), chunk("213_213_11_p1", "Gauge."))
+    store.add(chunk("213_213_13_p1", "Other model."), "Other model.", "timeout", "other-model")
+    store.close()
+
+    written = []
+    embedder = FlakyEmbedder()
+    stats = retry_dead_letters(store, embedder, written.extend, is_obsolete=lambda entry: "213_213_11" in entry['section_id'],
+                               now=TOMORROW)
+    assert (stats['recovered'], stats['obsolete'], stats['skipped']) == (1, 1, 1)
+    assert embedder.calls == [["context\nSpeeds."]]
+    # Kept for a retry worker running the other model
+    assert [entry['model'] for entry in store.read(store.path)] == ["other-model"]
+
+def test_backoff_is_capped():
+    assert backoff_seconds(0) < backoff_seconds(1) < backoff_seconds(2)
+    assert backoff_seconds(50) == backoff_seconds(60)
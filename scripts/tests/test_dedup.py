@@ -0,0 +1,74 @@
+import pytest
+
+from railnology_ingest import tokens
+from railnology_ingest.chunking import CharacterChunker
+from railnology_ingest.dedup import NearDuplicateIndex, estimated_similarity, minhash_signature, shingles
+from railnology_ingest.embedding import StubEmbedder
+from railnology_ingest.pipeline import Pipeline
+
+BOILERPLATE = " ".join(f"the railroad shall inspect item {i} before each trip" for i in range(60))
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", None)
+    monkeypatch.setattr(tokens, "_encoding_loaded", True)
+
+class RecordingSink:
+    def __init__(self):
+        self.docs = []
+        self.citations = {}
+
+    def write(self, doc, ticket=None):
+        self.docs.append(doc)
+
+    def flush(self):
+        pass
+
+    def set_citations(self, section_id, citations):
+        self.citations[section_id] = citations
+
+def rule(number, text, system="GCOR"):
+    return {"source": system, "document_type": "Operating Rule", "rule_system": system, "rule_number": number,
+            "rule_text": text, "title": f"{system} rules"}
+
+
+def test_shingles():
+    assert shingles("Stop. Look, and LISTEN!", size=2) == {"stop look", "look and", "and listen"}
+    assert shingles("Stop", size=5) == {"stop"}
+
+def test_signatures_of_near_duplicates_agree():
+    signature = minhash_signature(BOILERPLATE)
+    assert signature == minhash_signature(BOILERPLATE.upper())
+    assert estimated_similarity(signature, minhash_signature(BOILERPLATE + " and after")) >= 0.9
+    assert estimated_similarity(signature, minhash_signature("Trains must stop short of a red signal.")) < 0.2
+
+def test_index_matches_only_above_the_threshold():
+    index = NearDuplicateIndex(threshold=0.9)
+    first = index.add(minhash_signature(BOILERPLATE), {"section_id": "a"})
+    assert index.match(minhash_signature(BOILERPLATE + " and after")) is first
+    assert index.match(minhash_signature("Trains must stop short of a red signal.")) is None
+
+def test_pipeline_collapses_near_duplicates_into_the_first_copy():
+    sink = RecordingSink()
+    pipeline = Pipeline(CharacterChunker(), StubEmbedder(dimensions=8), sink, dedup="job")
+    written = pipeline.ingest_records([
+        rule("1.1", BOILERPLATE),
+        rule("6.27", "Trains must stop short of a red signal."),
+        rule("1.1", BOILERPLATE + " and after", system="NORAC"),
+    ])
+
+    assert written == 2
+    kept = sink.docs[0]
+    assert kept['section_id'] == "GCOR_1_1_p1" and len(kept['embedding']) == 8
+    assert [citation['rule_system'] for citation in kept['citations']] == ["GCOR", "NORAC"]
+    assert 'citations' not in sink.docs[1]
+
+def test_pipeline_updates_citations_of_a_chunk_written_by_an_earlier_job():
+    sink = RecordingSink()
+    pipeline = Pipeline(CharacterChunker(), StubEmbedder(dimensions=8), sink, dedup="run")
+    pipeline.ingest_records([rule("1.1", BOILERPLATE)])
+    assert pipeline.ingest_records([rule("1.1", BOILERPLATE, system="NORAC")]) == 0
+
+    assert len(sink.docs) == 1
+    assert [citation['rule_system'] for citation in sink.citations["GCOR_1_1_p1"]] == ["GCOR", "NORAC"]
@@ -0,0 +1,61 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from railnology_ingest import embedding
+from railnology_ingest.embedding import (
+    LocalEmbedder, OpenAIEmbedder, StubEmbedder, embedder_for_model, last_embedding_error,
+)
+
+
+class FakeEmbeddingsApi:
+    """client.embeddings: rejects any request holding a text with "bad" in it."""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, input, model):
+        self.requests.append(list(input))
+        if any("bad" in text for text in input):
+            raise ValueError("invalid input")
+        # The API does not promise response order; `index` says which input a vector belongs to
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)), usage=SimpleNamespace(total_tokens=len(input)))
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(embedding.time, "sleep", lambda seconds: None)
+    return SimpleNamespace(embeddings=FakeEmbeddingsApi())
+
+
+def test_stub_vectors_are_deterministic_unit_vectors():
+    stub = StubEmbedder(dimensions=16)
+    vector = stub.embed("Movement at restricted speed.")
+    assert len(vector) == 16 and math.isclose(sum(v * v for v in vector), 1.0, rel_tol=1e-9)
+    assert vector == StubEmbedder(dimensions=16).embed("Movement at restricted speed.")
+    assert stub.embed("line one\nline two") == stub.embed("line one line two")
+    assert stub.embed_batch(["a", "b"]) == [stub.embed("a"), stub.embed("b")]
+
+def test_batch_results_follow_input_order(client):
+    embedder = OpenAIEmbedder(client, model="text-embedding-3-small")
+    assert embedder.embed_batch(["one", "three", "seven55"]) == [[3.0], [5.0], [7.0]]
+    assert client.embeddings.requests == [["one", "three", "seven55"]]
+
+def test_a_failed_batch_is_retried_text_by_text(client):
+    embedder = OpenAIEmbedder(client, model="text-embedding-3-small")
+    assert embedder.embed_batch(["one", "bad one", "three"]) == [[3.0], [], [5.0]]
+    # Three attempts at the batch, then one request per text (three for the bad one)
+    assert client.embeddings.requests[:3] == [["one", "bad one", "three"]] * 3
+    assert sorted(map(tuple, client.embeddings.requests[3:])) == [("bad one",)] * 3 + [("one",), ("three",)]
+    assert last_embedding_error() == "ValueError: invalid input"
+
+def test_embedder_for_model():
+    stub = embedder_for_model("stub-shake256", dimensions=8)
+    assert isinstance(stub, StubEmbedder) and stub.dimensions == 8
+    with pytest.raises(ValueError):
+        embedder_for_model("cohere-embed-v3")
+
+def test_local_embedder_needs_a_model_directory(tmp_path):
+    with pytest.raises(ValueError, match="LOCAL_EMBEDDING_MODEL_PATH"):
+        LocalEmbedder(model_path=str(tmp_path / "missing"))
@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from railnology_ingest.search.filters import (
+    atlas_filter, combine_filters, matches, normalize_filters, parse_filter_value, vector_index_definition,
+    version_filter,
+)
+
+
+@pytest.mark.parametrize("key, value, expected", [
+    ("part", "213", 213),
+    ("part", "213, 214,", [213, 214]),
+    ("rule_system", "NORAC", "NORAC"),
+    ("document_type", "Regulation,Operating Rule", ["Regulation", "Operating Rule"]),
+    ("source", " FRA ", "FRA"),
+])
+def test_parse_filter_value(key, value, expected):
+    assert parse_filter_value(key, value) == expected
+
+def test_parse_filter_value_rejects_non_numeric_parts():
+    with pytest.raises(ValueError):
+        parse_filter_value("part", "two-thirteen")
+
+def test_normalize_filters_drops_empty_values_and_rejects_unknown_fields():
+    assert normalize_filters({"part": 213, "source": "", "rule_system": None, "category": []}) == {"part": 213}
+    with pytest.raises(ValueError):
+        normalize_filters({"title": "Track Safety"})
+
+def test_atlas_filter():
+    assert atlas_filter({}) is None
+    assert atlas_filter({"part": 213}) == {"part": {"$eq": 213}}
+    assert atlas_filter({"part": [213, 214], "source": "FRA"}) == {
+        "$and": [{"part": {"$in": [213, 214]}}, {"source": {"$eq": "FRA"}}]}
+
+def test_version_filter_and_combine():
+    as_of = datetime(2021, 6, 1, tzinfo=timezone.utc)
+    superseded = version_filter(as_of, superseded=True)
+    assert superseded == {"$and": [{"valid_from": {"$lte": as_of}}, {"valid_to": {"$gt": as_of}}]}
+    assert combine_filters(None, superseded) == superseded
+    assert combine_filters({"part": 1}, superseded) == {"$and": [{"part": 1}, superseded]}
+
+def test_matches():
+    doc = {"part": 213, "document_type": "Regulation"}
+    assert matches(doc, {"part": [213, 214], "document_type": "Regulation"})
+    assert not matches(doc, {"part": 214})
+
+def test_vector_index_definition_keeps_existing_vector_settings():
+    existing = {"fields": [{"type": "vector", "path": "embedding", "numDimensions": 384, "similarity": "dotProduct"},
+                           {"type": "filter", "path": "part"}]}
+    definition = vector_index_definition(existing, filter_fields=("part", "source"))
+    assert definition['fields'][0]['numDimensions'] == 384
+    assert [field['path'] for field in definition['fields'] if field['type'] == 'filter'] == ["part", "source"]
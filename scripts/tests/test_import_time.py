@@ -0,0 +1,9 @@
+import pytest
+
+import bench_import_time
+
+
+@pytest.mark.parametrize("module", bench_import_time.ENTRY_POINTS)
+def test_entry_points_import_no_heavy_dependency(module):
+    _, imported = bench_import_time.measure(module, repeat=1)
+    assert not {name for name in imported if name.split(".")[0] in bench_import_time.HEAVY_MODULES}
@@ -0,0 +1,135 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("bson")
+from bson import ObjectId
+
+from railnology_ingest.layout import (
+    LEGACY, ChunkCollection, CompactLayout, SourceRegistry, layout_for, migrate_chunks, object_id_at, source_id,
+)
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for the layout code."""
+
+    def __init__(self, docs=None):
+        self.docs = {}
+        for doc in docs or []:
+            self.docs[doc.get('_id', len(self.docs))] = doc
+
+    def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query['_id'], {'_id': query['_id']}).update(update['$set'])
+
+    def find_one(self, query, projection=None):
+        doc = self.docs.get(query['_id'])
+        return {k: v for k, v in doc.items() if k not in ('_id', 'last_updated')} if doc else None
+
+    def find(self, query=None, batch_size=None):
+        return iter(list(self.docs.values()))
+
+    def with_options(self, **kwargs):
+        return self
+
+    def insert_many(self, batch, ordered=False):
+        for doc in batch:
+            self.docs[doc.get('_id', len(self.docs))] = doc
+
+
+class FakeDb(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+WRITTEN = datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+def regulation_chunk(**fields):
+    return {
+        "source": "FRA",
+        "document_type": "Regulation",
+        "title": "Track Safety Standards",
+        "url": "https://www.ecfr.gov/current/title-49/part-213",
+        "part": 213,
+        "section_id": "213.9",
+        "parent_section_id": "213_213_9",
+        "chunk_index": 0,
+        "chunk_count": 2,
+        "text": "Maximum allowable operating speeds.",
+        "context": "Subpart A",
+        "embedding": [0.1, 0.2],
+        "last_updated": WRITTEN,
+        **fields,
+    }
+
+
+def test_compact_round_trip_through_a_fresh_registry():
+    db = FakeDb()
+    doc = regulation_chunk(valid_from=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    stored = CompactLayout(SourceRegistry(db)).encode(doc)
+
+    assert {"title", "url", "text", "section_id", "last_updated"}.isdisjoint(stored)
+    assert stored['t'] == doc['text'] and stored['sid'] == "213.9" and stored['psid'] == "213_213_9"
+    # Filter fields keep their names so $vectorSearch can pre-filter on them
+    assert {"document_type", "source", "part", "valid_from"} <= set(stored)
+    assert isinstance(stored['_id'], ObjectId) and stored['_id'].generation_time == WRITTEN
+
+    # Another process only has knowledge_sources to go on
+    assert CompactLayout(SourceRegistry(db)).decode(stored) == doc
+
+def test_sources_are_shared_by_chunks_of_one_source():
+    db = FakeDb()
+    layout = CompactLayout(SourceRegistry(db))
+    first = layout.encode(regulation_chunk())
+    second = layout.encode(regulation_chunk(section_id="213.11", text="Other text"))
+    other = layout.encode(regulation_chunk(part=214, title="Railroad Workplace Safety"))
+
+    assert first['src'] == second['src'] != other['src']
+    assert len(db['knowledge_sources'].docs) == 2
+    assert source_id({"part": 213, "source": "FRA"}) == source_id({"source": "FRA", "part": 213, "title": None})
+
+def test_compact_query_projection_and_fields():
+    layout = CompactLayout(SourceRegistry(FakeDb()))
+    query = layout.query({"$or": [{"section_id": "213.9"}, {"last_updated": {"$lt": WRITTEN}}], "part": 213})
+    assert query == {"$or": [{"sid": "213.9"}, {"_id": {"$lt": ObjectId.from_datetime(WRITTEN)}}], "part": 213}
+
+    projection = layout.projection({"_id": 0, "title": 1, "text": 1, "last_updated": 1, "score": {"$meta": "x"}})
+    assert projection == {"src": 1, "t": 1, "last_updated": 1, "score": {"$meta": "x"}}
+    assert layout.index_keys([("parent_section_id", 1), ("chunk_index", 1)]) == [("psid", 1), ("ci", 1)]
+    with pytest.raises(ValueError):
+        layout.field("title")
+
+def test_replacement_never_carries_an_id_but_keeps_the_write_time():
+    layout = CompactLayout(SourceRegistry(FakeDb()))
+    replacement = layout.replacement(regulation_chunk())
+    assert "_id" not in replacement and replacement['last_updated'] == WRITTEN
+    assert LEGACY.replacement({"_id": 1, "text": "x"}) == {"text": "x"}
+
+    # Replaced (or upserted) in place under an _id of another time
+    stored = {"_id": object_id_at(datetime(2026, 1, 1, tzinfo=timezone.utc)), **replacement}
+    assert layout.decode(stored)['last_updated'] == WRITTEN
+
+def test_legacy_layout_is_the_identity():
+    doc = regulation_chunk()
+    assert LEGACY.encode(doc) is doc and LEGACY.decode(doc) is doc
+    assert LEGACY.query({"section_id": "1"}) == {"section_id": "1"}
+    assert layout_for(FakeDb(), None) is LEGACY
+    with pytest.raises(ValueError):
+        layout_for(FakeDb(), "columnar")
+
+def test_object_id_at_keeps_the_write_time():
+    assert object_id_at(WRITTEN).generation_time == WRITTEN
+
+def test_migrate_chunks_to_compact_and_back():
+    db = FakeDb()
+    docs = [regulation_chunk(section_id=f"213.{i}", chunk_index=i) for i in range(5)]
+    legacy = ChunkCollection(FakeCollection([dict(doc) for doc in docs]))
+    compact = ChunkCollection(FakeCollection(), CompactLayout(SourceRegistry(db)))
+
+    assert migrate_chunks(legacy, compact, batch_size=2, workers=2)['inserted'] == 5
+    assert all('t' in doc and 'title' not in doc for doc in compact.docs.values())
+
+    back = ChunkCollection(FakeCollection())
+    migrate_chunks(compact, back, batch_size=2, workers=1)
+    restored = sorted(back.docs.values(), key=lambda doc: doc['section_id'])
+    assert restored == docs
@@ -0,0 +1,75 @@
+import os
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from railnology_ingest.dataset import DatasetWriter
+from railnology_ingest.loader import load_dataset
+
+
+class FakeCollection:
+    name = "knowledge_chunks"
+
+    def __init__(self, docs=None, drop_texts=()):
+        self.docs = list(docs or [])
+        # Inserts "acknowledged" without storing, to fake a silent loss
+        self.drop_texts = set(drop_texts)
+        self.lock = threading.Lock()
+
+    def insert_many(self, docs, ordered=True):
+        with self.lock:
+            self.docs.extend(doc for doc in docs if doc['text'] not in self.drop_texts)
+
+    def count_documents(self, query):
+        return len(self.docs)
+
+    def delete_many(self, query):
+        deleted, self.docs = len(self.docs), []
+        return SimpleNamespace(deleted_count=deleted)
+
+    def find(self, query, projection=None, batch_size=None):
+        return [{key: doc.get(key) for key in ("section_id", "text")} for doc in self.docs]
+
+def write_dataset(root, count=5):
+    writer = DatasetWriter(str(root), model="stub")
+    for i in range(count):
+        writer.write({"source": "FRA", "document_type": "Regulation", "part": 213, "section_id": f"213_213_{i}_p1",
+                      "text": f"Chunk {i}", "embedding": [float(i), 1.0],
+                      "last_updated": datetime(2024, 3, 1, tzinfo=timezone.utc)})
+    return writer.close()
+
+
+def test_load_verifies_counts_and_content(tmp_path):
+    write_dataset(tmp_path)
+    collection = FakeCollection()
+    assert load_dataset(collection, str(tmp_path), workers=2, batch_size=2)
+    assert sorted(doc['text'] for doc in collection.docs) == [f"Chunk {i}" for i in range(5)]
+    assert collection.docs[0]['last_updated'] == datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+def test_damaged_dataset_loads_nothing(tmp_path):
+    manifest = write_dataset(tmp_path)
+    with open(os.path.join(str(tmp_path), manifest['files'][0]['embeddings_path']), 'ab') as file:
+        file.write(b"\0")
+    collection = FakeCollection()
+    assert not load_dataset(collection, str(tmp_path))
+    assert collection.docs == []
+
+def test_lost_rows_fail_the_load(tmp_path):
+    write_dataset(tmp_path)
+    assert not load_dataset(FakeCollection(drop_texts={"Chunk 3"}), str(tmp_path))
+
+def test_load_appends_unless_told_to_drop_existing(tmp_path):
+    write_dataset(tmp_path)
+    old = {"section_id": "old", "text": "Old chunk"}
+
+    collection = FakeCollection(docs=[old])
+    assert load_dataset(collection, str(tmp_path))
+    assert len(collection.docs) == 6
+
+    collection = FakeCollection(docs=[old])
+    assert load_dataset(collection, str(tmp_path), drop_existing=True)
+    assert len(collection.docs) == 5 and old not in collection.docs
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from railnology_ingest import locks
+from railnology_ingest.locks import RunLock, acquire_run_locks, release_run_locks
+
+
+@pytest.fixture
+def lock_dir(tmp_path, monkeypatch):
+    original = RunLock
+    monkeypatch.setattr(locks, "RunLock", lambda name, slots=None: original(name, slots, lock_dir=str(tmp_path)))
+    return str(tmp_path)
+
+
+def test_slots_limit_concurrent_holders(tmp_path):
+    first, second, third = (RunLock("cfr", slots=2, lock_dir=str(tmp_path)) for _ in range(3))
+    assert first.acquire() and second.acquire()
+    assert not third.acquire() and not third.available()
+    assert {holder['pid'] for holder in third.holders()} == {os.getpid()}
+
+    first.release()
+    assert third.available()
+    assert [holder['pid'] for holder in third.holders()] == [os.getpid()]
+    second.release()
+    assert third.holders() == []
+
+def test_context_manager_releases_the_slot(tmp_path):
+    with RunLock("jobs", slots=1, lock_dir=str(tmp_path)) as acquired:
+        assert acquired
+        assert not RunLock("jobs", slots=1, lock_dir=str(tmp_path)).available()
+    assert RunLock("jobs", slots=1, lock_dir=str(tmp_path)).available()
+
+def test_acquire_run_locks_is_all_or_nothing(lock_dir):
+    busy = locks.RunLock("guidance")
+    assert busy.acquire()
+
+    held, blocked = acquire_run_locks(["cfr", "guidance", "rulebooks"])
+    assert (held, blocked) == ([], "guidance")
+    # The cfr slot taken on the way was given back
+    assert locks.RunLock("cfr").available()
+
+    busy.release()
+    held, blocked = acquire_run_locks(["cfr", "guidance"])
+    assert blocked is None and [lock.name for lock in held] == ["cfr", "guidance"]
+    release_run_locks(held)
+    assert locks.RunLock("cfr").available() and locks.RunLock("guidance").available()
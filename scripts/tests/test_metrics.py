@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from railnology_ingest.metrics import PROMETHEUS_PREFIX, RunMetrics
+
+
+class Listener:
+    def __init__(self):
+        self.events = []
+
+    def stage_entered(self, name):
+        self.events.append(("enter", name))
+
+    def stage_exited(self, name):
+        self.events.append(("exit", name))
+
+
+def test_stages_count_calls_items_and_errors():
+    metrics = RunMetrics("test")
+    listener = Listener()
+    metrics.stage_listeners.append(listener)
+    with metrics.stage("embed", items=10):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.stage("embed", items=5):
+            raise ValueError("API down")
+
+    entry = metrics.report()['stages']['embed']
+    assert (entry['calls'], entry['items'], entry['errors']) == (2, 15, 1)
+    assert entry['max_seconds'] <= entry['seconds'] and entry['avg_seconds'] == pytest.approx(entry['seconds'] / 2)
+    assert listener.events == [("enter", "embed"), ("exit", "embed")] * 2
+
+def test_counters_and_embedding_cost():
+    metrics = RunMetrics("test")
+    metrics.incr("chunks")
+    metrics.incr("chunks", 4)
+    metrics.set("dead_letters_pending", 3)
+    metrics.set("dead_letters_pending", 1)
+    metrics.record_embedding_tokens("text-embedding-3-small", 2_000_000)
+    metrics.record_embedding_tokens("unpriced-model", 5_000_000)
+
+    report = metrics.report()
+    assert report['counters'] == {"chunks": 5, "dead_letters_pending": 1}
+    assert report['estimated_cost_usd'] == pytest.approx(0.04)
+
+def test_reset_starts_a_new_run():
+    metrics = RunMetrics("test")
+    metrics.incr("chunks")
+    metrics.reset()
+    assert metrics.report()['counters'] == {}
+
+def test_report_files(tmp_path):
+    metrics = RunMetrics("nightly")
+    with metrics.stage("insert_many", items=3):
+        pass
+    metrics.incr("documents_inserted", 3)
+
+    with open(metrics.write_json(str(tmp_path / "report.json")), encoding='utf-8') as file:
+        assert json.load(file)['counters'] == {"documents_inserted": 3}
+
+    with open(metrics.write_prometheus(str(tmp_path / "ingest.prom")), encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    assert f'{PROMETHEUS_PREFIX}_stage_items{{run="nightly",stage="insert_many"}} 3' in lines
+    assert f'{PROMETHEUS_PREFIX}_events{{run="nightly",name="documents_inserted"}} 3' in lines
+    assert not (tmp_path / "ingest.prom.tmp").exists()
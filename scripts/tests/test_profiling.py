@@ -0,0 +1,46 @@
+import argparse
+import pstats
+import time
+
+from railnology_ingest.metrics import run_metrics
+from railnology_ingest.profiling import add_profile_arguments, profile_run
+
+
+def profile_args(*argv):
+    return add_profile_arguments(argparse.ArgumentParser()).parse_args(list(argv))
+
+def busy_stage_work(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+def outside_work():
+    sum(range(100))
+
+
+def test_no_profile_is_a_no_op():
+    with profile_run(profile_args(), "test") as recorder:
+        assert recorder is None
+
+def test_cprofile_only_inside_the_selected_stages(tmp_path):
+    out = str(tmp_path / "run.prof")
+    with profile_run(profile_args("--profile", "--profile-stages", "embed", "--profile-out", out), "test"):
+        outside_work()
+        with run_metrics.stage("embed"):
+            busy_stage_work(0.01)
+        with run_metrics.stage("insert_many"):
+            outside_work()
+    assert run_metrics.stage_listeners == []
+
+    functions = {name for _, _, name in pstats.Stats(out).stats}
+    assert "busy_stage_work" in functions and "outside_work" not in functions
+
+def test_sampler_writes_collapsed_stacks(tmp_path):
+    out = str(tmp_path / "run.folded")
+    with profile_run(profile_args("--profile", "sample", "--profile-interval", "1", "--profile-out", out), "test"):
+        busy_stage_work(0.2)
+
+    with open(out, encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_stage_work (test_profiling.py" in line for line in lines)
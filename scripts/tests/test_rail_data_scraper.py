@@ -0,0 +1,26 @@
+import pytest
+
+import rail_data_scraper
+from railnology_ingest import cli
+
+
+@pytest.fixture
+def cli_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rail_data_scraper, "cli_main", lambda argv, **kwargs: calls.append((argv, kwargs)))
+    return calls
+
+
+def test_scraper_wrapper_runs_an_ingest(cli_calls):
+    rail_data_scraper.main(["--swap", "--report", "r.json"])
+    assert cli_calls == [(["ingest", "--swap", "--report", "r.json"], {"run_name": "rail_data_scraper"})]
+
+def test_scraper_wrapper_rollback_keeps_the_other_arguments(cli_calls):
+    rail_data_scraper.main(["--rollback"])
+    rail_data_scraper.main(["--swap", "--rollback"])
+    assert [argv for argv, _ in cli_calls] == [["rollback"], ["rollback", "--swap"]]
+
+def test_rollback_rejects_ingest_options():
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["rollback", "--swap"])
+    assert exit_info.value.code == 2
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from railnology_ingest.search import rerank
+from railnology_ingest.sources import load_rulebook_registry
+
+
+def write_rulebook(directory, system_name, **extra):
+    rule_data = {"system_name": system_name, "title": f"{system_name} rules", "effective_date": "2025-01-01",
+                 "pdf_path": f"{system_name}.pdf", **extra}
+    (directory / f"{system_name.lower()}.json").write_text(json.dumps(rule_data))
+
+def test_rule_systems_come_from_the_registry(tmp_path, monkeypatch):
+    write_rulebook(tmp_path, "CROR")
+    write_rulebook(tmp_path, "UP-TT")
+    write_rulebook(tmp_path, "NORAC", enabled=False)
+    monkeypatch.setattr(rerank, "_rule_systems", {
+        rule['system_name'].lower(): rule['system_name'] for rule in load_rulebook_registry(str(tmp_path))
+    })
+
+    citations = rerank.parse_citations("Does cror rule 42 match up-tt, or NORAC?")
+    assert citations['rule_systems'] == {"CROR", "UP-TT"}
+    assert citations['rules'] == {"42"}
+
+def test_citations_without_a_registry(monkeypatch):
+    monkeypatch.setattr(rerank, "_rule_systems", {})
+    assert rerank.parse_citations("GCOR rule 6.27 and 49 CFR 213.9") == {
+        'sections': {(213, "9")}, 'parts': {213}, 'rule_systems': set(), 'rules': {"6.27"},
+    }
+
+def section_chunk(section, score, **fields):
+    part = int(section.split(".")[0])
+    return {"document_type": "Regulation", "part": part, "section_id": f"{part}_{section}_p1".replace(".", "_"),
+            "score": score, **fields}
+
+def test_citation_score(monkeypatch):
+    monkeypatch.setattr(rerank, "_rule_systems", {"gcor": "GCOR"})
+    citations = rerank.parse_citations("49 CFR 213.9 vs GCOR rule 6.27")
+    assert rerank.citation_score(section_chunk("213.9", 0.8), citations) == 1.0
+    assert rerank.citation_score(section_chunk("213.11", 0.8), citations) == 0.5
+    assert rerank.citation_score(section_chunk("236.1005", 0.8), citations) == 0.0
+    rule = {"document_type": "Operating Rule", "rule_system": "GCOR", "rule_number": "6.27"}
+    assert rerank.citation_score(rule, citations) == pytest.approx(1.0)
+    assert rerank.citation_score({**rule, "rule_number": "6.28"}, citations) == pytest.approx(0.3)
+
+def test_document_timestamp():
+    assert rerank.document_timestamp({"effective_date": "2024-01-02", "last_updated": "bad"}) == \
+        datetime(2024, 1, 2, tzinfo=timezone.utc).timestamp()
+    assert rerank.document_timestamp({"last_updated": datetime(2024, 1, 2)}) == \
+        datetime(2024, 1, 2, tzinfo=timezone.utc).timestamp()
+    assert rerank.document_timestamp({"effective_date": "n/a"}) is None
+
+def test_rerank_promotes_the_cited_section(monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(rerank, "_rule_systems", {})
+    candidates = [section_chunk("213.11", 0.92, text="Restoration of track."),
+                  section_chunk("213.9", 0.90, text="Maximum allowable operating speeds by class of track."),
+                  section_chunk("236.1005", 0.40, text="Positive train control.")]
+
+    ranked = rerank.rerank("What does 213.9 say about operating speeds?", candidates, top_k=2)
+    assert [doc['section_id'] for doc in ranked] == ["213_213_9_p1", "213_213_11_p1"]
+    assert ranked[0]['score'] == 0.90 and ranked[0]['rerank_score'] > ranked[1]['rerank_score']
+    # Vector score only: the original order
+    plain = rerank.rerank("speeds", candidates, weights={"lexical": 0, "citation": 0, "recency": 0, "prior": 0})
+    assert [doc['score'] for doc in plain] == [0.92, 0.90, 0.40]
+    assert rerank.rerank("speeds", []) == []
+
+def test_precision_at_k():
+    results = [section_chunk("213.9", 0.9), section_chunk("213.11", 0.8), {"document_type": "Operating Rule"}]
+    assert rerank.precision_at_k(results, [{"section": "213.9"}, {"document_type": "Operating Rule"}]) == pytest.approx(2 / 3)
+    assert rerank.precision_at_k(results[:1], [{"section": "213.9"}], k=3) == 1.0
+    assert rerank.precision_at_k([], [{"section": "213.9"}]) == 0.0
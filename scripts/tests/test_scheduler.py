@@ -0,0 +1,71 @@
+import sys
+
+import pytest
+
+from railnology_ingest import scheduler
+from railnology_ingest.config import SCHEDULER_LOCKED_RETRY_MINUTES, SCHEDULER_RETRY_MINUTES
+from railnology_ingest.locks import EXIT_LOCKED
+from railnology_ingest.scheduler import Scheduler, ScheduledRun, task_command
+
+HOUR = 3600
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: 0.0)
+
+def make_scheduler(tmp_path, tasks=("cfr_hot", "cfr", "guidance", "jobs", "rulebooks")):
+    return Scheduler(tasks, state_path=str(tmp_path / "state.json"), dry_run=True)
+
+
+def test_next_run_after_success_counts_from_the_start(tmp_path, no_jitter):
+    runner = make_scheduler(tmp_path)
+    every = runner.tasks['guidance']['every_hours'] * HOUR
+    assert runner.next_run("guidance", "ok", NOW, NOW + 60) == NOW + every
+    # A run that overran its cadence is due again as soon as it ends
+    assert runner.next_run("guidance", "ok", NOW, NOW + 2 * every) == NOW + 2 * every
+
+def test_next_run_retries_failed_and_locked_runs_sooner(tmp_path, no_jitter):
+    runner = make_scheduler(tmp_path)
+    assert runner.next_run("rulebooks", "failed", NOW, NOW) == NOW + SCHEDULER_RETRY_MINUTES * 60
+    assert runner.next_run("rulebooks", "locked", NOW, NOW) == NOW + SCHEDULER_LOCKED_RETRY_MINUTES * 60
+    # ...but never later than the task's own cadence
+    runner.tasks['cfr_hot'] = {**runner.tasks['cfr_hot'], 'every_hours': 0.25}
+    assert runner.next_run("cfr_hot", "failed", NOW, NOW) == NOW + min(0.25 * HOUR, SCHEDULER_RETRY_MINUTES * 60)
+
+def test_next_run_adds_at_most_the_jitter(tmp_path):
+    runner = make_scheduler(tmp_path)
+    task = runner.tasks['jobs']
+    base = NOW + task['every_hours'] * HOUR
+    for _ in range(20):
+        assert base <= runner.next_run("jobs", "ok", NOW, NOW) <= base + task['jitter_minutes'] * 60
+
+def test_due_tasks_start_lowest_priority_first(tmp_path):
+    runner = make_scheduler(tmp_path)
+    for name, next_run in {"cfr_hot": NOW + 10, "cfr": NOW - 5, "guidance": NOW - 50, "jobs": NOW - 60,
+                           "rulebooks": NOW - 100}.items():
+        runner.state[name]['next_run'] = next_run
+    # Same priority (guidance, jobs): the one due longest goes first
+    assert runner.due(NOW) == ["cfr", "jobs", "guidance", "rulebooks"]
+
+    runner.running['cfr'] = object()
+    assert runner.due(NOW) == ["jobs", "guidance", "rulebooks"]
+
+def test_record_persists_the_next_run(tmp_path, no_jitter):
+    runner = Scheduler(["guidance"], state_path=str(tmp_path / "state.json"))
+    runner.record("guidance", "ok", NOW, NOW + 60, last_exit=0)
+    restarted = Scheduler(["guidance"], state_path=str(tmp_path / "state.json"))
+    assert restarted.state['guidance']['next_run'] == NOW + runner.tasks['guidance']['every_hours'] * HOUR
+    assert restarted.state['guidance']['last_status'] == "ok"
+
+def test_run_status_comes_from_the_exit_code():
+    assert [ScheduledRun.status(None, code) for code in (0, 1, EXIT_LOCKED)] == ["ok", "failed", "locked"]
+
+def test_task_command():
+    assert task_command("cfr_hot", [213, 236], "r.json") == [
+        sys.executable, "-m", "railnology_ingest", "ingest", "--only", "cfr", "--incremental",
+        "--parts", "213,236", "--report", "r.json",
+    ]
+    assert task_command("guidance")[-2:] == ["--only", "guidance"]
+    assert task_command("jobs")[-1].endswith("scrape_jobs.py")
@@ -0,0 +1,70 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import search_server
+from railnology_ingest.embedding import StubEmbedder
+from railnology_ingest.search.batching import QueryBatcher
+from railnology_ingest.search.local_index import LocalIndex
+from railnology_ingest.snapshot import export_snapshot
+
+STUB = StubEmbedder(dimensions=8)
+
+
+@pytest.fixture
+def server_url(tmp_path, monkeypatch):
+    docs = [
+        {"document_type": "Regulation", "source": "FRA", "part": 213, "section_id": f"213_213_{i}_p1",
+         "text": f"Track inspection rule {i}: " + "inspect the track " * 30, "embedding": STUB.embed(f"chunk {i}")}
+        for i in range(4)
+    ]
+    export_snapshot(docs, root=str(tmp_path), snapshot_id="snap-1", model=STUB.model)
+    monkeypatch.setattr(search_server.SearchHandler, "index", QueryBatcher(LocalIndex.open(str(tmp_path)), window_ms=0))
+    monkeypatch.setattr(search_server.SearchHandler, "embed_query", staticmethod(STUB.embed))
+    monkeypatch.setattr(search_server.SearchHandler, "rerank_candidates", 4)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), search_server.SearchHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_health(server_url):
+    status, body = request(f"{server_url}/health")
+    assert status == 200
+    assert (body['generation'], body['model'], body['rows'], body['dimensions']) == ("snap-1", STUB.model, 4, 8)
+
+def test_vector_search_returns_snippets(server_url):
+    status, body = request(f"{server_url}/search", {"vector": STUB.embed("chunk 2"), "top_k": 2})
+    assert status == 200
+    hits = body['results']
+    assert len(hits) == 2 and hits[0]['section_id'] == "213_213_2_p1"
+    assert 'text' not in hits[0] and hits[0]['snippet']
+
+def test_query_search_reranks_and_can_return_full_text(server_url):
+    status, body = request(f"{server_url}/search", {"query": "track inspection", "filters": {"part": 213},
+                                                    "top_k": 3, "full_text": True})
+    assert status == 200
+    assert len(body['results']) == 3
+    assert all('rerank_score' in hit and hit['text'].startswith("Track inspection") for hit in body['results'])
+
+def test_bad_requests(server_url):
+    assert request(f"{server_url}/search", {"top_k": 3})[0] == 400
+    assert request(f"{server_url}/search", {"query": "speed", "filters": {"title": "x"}})[0] == 400
+    assert request(f"{server_url}/nowhere")[0] == 404
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+pytest.importorskip("pymongo")
+from pymongo.errors import BulkWriteError
+
+from railnology_ingest.sinks import BulkWriter, MongoSink, WriteTicket
+
+
+class FakeCollection:
+    """insert_many that rejects documents marked "bad", as an unordered insert would."""
+
+    name = "knowledge_chunks"
+
+    def __init__(self):
+        self.batches = []
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def insert_many(self, docs, ordered=True):
+        with self.lock:
+            self.batches.append([doc['text'] for doc in docs])
+        errors = [{'index': i, 'errmsg': "duplicate key"} for i, doc in enumerate(docs) if doc.get('bad')]
+        if errors:
+            raise BulkWriteError({'nInserted': len(docs) - len(errors), 'writeErrors': errors})
+
+    def delete_many(self, query):
+        self.deleted.append(query)
+
+
+def test_batches_are_cut_by_count_and_by_size():
+    collection = FakeCollection()
+    writer = BulkWriter(collection, batch_size=3, batch_bytes=200, workers=1, write_concern="")
+    for i in range(5):
+        writer.add({'text': f"chunk {i}"})
+    writer.add({'text': "x" * 150})
+    stats = writer.close()
+
+    assert collection.batches == [["chunk 0", "chunk 1", "chunk 2"], ["chunk 3", "chunk 4"], ["x" * 150]]
+    assert (stats['inserted'], stats['failed'], stats['batches']) == (6, 0, 3)
+
+def test_tickets_count_only_their_own_failures():
+    collection = FakeCollection()
+    writer = BulkWriter(collection, batch_size=4, workers=2, write_concern="")
+    first, second = WriteTicket(), WriteTicket()
+    for i in range(6):
+        writer.add({'text': f"first {i}", 'bad': i == 4}, first)
+        writer.add({'text': f"second {i}"}, second)
+    writer.flush()
+
+    assert first.wait() == 1 and second.wait() == 0
+    assert first.pending == second.pending == 0
+    stats = writer.close()
+    assert (stats['inserted'], stats['failed']) == (11, 1)
+
+def test_sink_barrier_raises_when_a_chunk_of_the_job_failed():
+    collection = FakeCollection()
+    sink = MongoSink(collection)
+    ticket = sink.ticket()
+    sink.write({'text': "kept"}, ticket)
+    sink.barrier(ticket)
+
+    failing = sink.ticket()
+    sink.write({'text': "rejected", 'bad': True}, failing)
+    with pytest.raises(RuntimeError, match="1 chunk"):
+        sink.barrier(failing)
+    sink.writer.close()
+
+def test_sink_replace_only_clears_chunks_written_before_the_job():
+    sink = MongoSink(FakeCollection())
+    sink.replace({"part": 213}, before="2024-01-01")
+    sink.replace({"part": 214})
+    assert sink.collection.deleted == [{"part": 213, "last_updated": {"$lt": "2024-01-01"}}, {"part": 214}]
+    sink.writer.close()
@@ -0,0 +1,80 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from railnology_ingest.search.local_index import LocalIndex, merge_ranges
+from railnology_ingest.snapshot import (
+    current_snapshot, export_snapshot, is_snapshot, open_snapshot, prune_snapshots, verify_snapshot,
+)
+
+WRITTEN = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def chunks():
+    return [
+        {"_id": 1, "document_type": "Regulation", "source": "FRA", "part": 236, "section_id": "236_236_1005_p1",
+         "text": "Positive train control — requirements.", "embedding": [0.0, 3.0, 0.0], "last_updated": WRITTEN},
+        {"_id": 2, "document_type": "Operating Rule", "source": "GCOR", "rule_system": "GCOR", "rule_number": "6.27",
+         "section_id": "GCOR_6_27_p1", "text": "Movement at restricted speed.", "embedding": [1.0, 0.0, 0.0]},
+        {"_id": 3, "document_type": "Regulation", "source": "FRA", "part": 213, "section_id": "213_213_9_p1",
+         "text": "Maximum allowable operating speeds.", "embedding": [2.0, 2.0, 0.0], "last_updated": WRITTEN},
+    ]
+
+
+def test_export_round_trip(tmp_path):
+    root = str(tmp_path)
+    manifest = export_snapshot(chunks(), root=root, snapshot_id="snap-1", model="test-model", generation=7)
+
+    assert manifest['rows'] == 3 and manifest['dimensions'] == 3 and manifest['generation'] == 7
+    assert current_snapshot(root) == os.path.join(root, "snap-1")
+    assert is_snapshot(root) and verify_snapshot(root) == []
+
+    _, embeddings, docs = open_snapshot(root)
+    # Sorted by filter fields, so every slice is one contiguous row range
+    assert [doc['section_id'] for doc in docs] == ["GCOR_6_27_p1", "213_213_9_p1", "236_236_1005_p1"]
+    assert [(key['document_type'], key['part'], start, end) for key, start, end in manifest['slices']] == [
+        ("Operating Rule", None, 0, 1), ("Regulation", 213, 1, 2), ("Regulation", 236, 2, 3),
+    ]
+    assert docs[2]['text'] == "Positive train control — requirements." and docs[2]['last_updated'] == WRITTEN
+    assert "_id" not in docs[0] and "embedding" not in docs[0]
+    # Stored as unit vectors
+    assert embeddings[1].tolist() == pytest.approx([0.70710677, 0.70710677, 0.0])
+
+def test_a_corrupt_snapshot_fails_verification(tmp_path):
+    root = str(tmp_path)
+    export_snapshot(chunks(), root=root, snapshot_id="snap-1")
+    with open(os.path.join(root, "snap-1", "text.bin"), 'ab') as file:
+        file.write(b"!")
+    assert verify_snapshot(root) == ["checksum mismatch in text.bin"]
+
+def test_local_index_searches_within_the_filtered_slices(tmp_path):
+    export_snapshot(chunks(), root=str(tmp_path), snapshot_id="snap-1")
+    index = LocalIndex.open(str(tmp_path))
+    assert index.generation == "snap-1"
+
+    hits = index.search([1.0, 0.1, 0.0], limit=2)
+    assert [hit['section_id'] for hit in hits] == ["GCOR_6_27_p1", "213_213_9_p1"]
+    assert hits[0]['score'] > hits[1]['score']
+
+    hits = index.search([1.0, 0.1, 0.0], limit=2, filters={"document_type": "Regulation"})
+    assert [hit['section_id'] for hit in hits] == ["213_213_9_p1", "236_236_1005_p1"]
+    assert index.rows_scanned == 2
+
+    per_query = index.search_batch([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], limit=1, filters=[{"part": 213}, {"part": 236}])
+    assert [[hit['section_id'] for hit in hits] for hits in per_query] == [["213_213_9_p1"], ["236_236_1005_p1"]]
+
+def test_prune_keeps_the_newest_and_current(tmp_path):
+    root = str(tmp_path)
+    for snapshot_id in ("snap-1", "snap-2", "snap-3"):
+        export_snapshot(chunks(), root=root, snapshot_id=snapshot_id)
+    with open(os.path.join(root, "CURRENT"), 'w', encoding='utf-8') as file:
+        file.write("snap-1\n")
+
+    assert prune_snapshots(root, keep=1) == ["snap-2"]
+    assert sorted(name for name in os.listdir(root) if name != "CURRENT") == ["snap-1", "snap-3"]
+
+def test_merge_ranges():
+    assert merge_ranges([(5, 8), (0, 2), (2, 4), (7, 9)]) == [(0, 4), (5, 9)]
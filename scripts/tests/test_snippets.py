@@ -0,0 +1,111 @@
+import pytest
+
+from railnology_ingest.layout import LEGACY, CompactLayout
+from railnology_ingest.search.snippets import best_window, snippet, term_pattern, text_window, trim_hits
+
+
+def evaluate(expression, doc, variables=None):
+    """Evaluates the aggregation operators text_window() uses, on one document."""
+    variables = variables or {}
+    if isinstance(expression, str) and expression.startswith("$$"):
+        return variables[expression[2:]]
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc.get(expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(item, doc, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+
+    (op, args), = expression.items()
+    if op == "$let":
+        bound = {**variables, **{name: evaluate(value, doc, variables) for name, value in args['vars'].items()}}
+        return evaluate(args['in'], doc, bound)
+    if op == "$cond":
+        condition, then, otherwise = args
+        return evaluate(then if evaluate(condition, doc, variables) else otherwise, doc, variables)
+    values = evaluate(args, doc, variables)
+    if op == "$ifNull":
+        return values[0] if values[0] is not None else values[1]
+    if op == "$strLenCP":
+        return len(values)
+    if op == "$toLower":
+        return values.lower()
+    if op == "$indexOfCP":
+        return values[0].find(values[1])
+    if op == "$gte":
+        return values[0] >= values[1]
+    if op == "$subtract":
+        return values[0] - values[1]
+    if op in ("$min", "$max"):
+        present = [value for value in values if value is not None]
+        return (min if op == "$min" else max)(present) if present else None
+    if op == "$substrCP":
+        text, start, length = values
+        return text[start:start + length]
+    raise NotImplementedError(op)
+
+def run_window(doc, query, layout=LEGACY, chars=100, lead=10):
+    """What the $set + $project stages of text_window() return for one stored document."""
+    stage, text_expression = text_window(layout, query, chars=chars, lead=lead)
+    stored = {**doc, **{key: evaluate(value, doc) for key, value in stage['$set'].items()}}
+    return stored['text_offset'], stored['text_length'], evaluate(text_expression, stored)
+
+
+LONG_TEXT = "General provisions. " * 20 + "The Maximum allowable speed on Class 3 track is 60 mph. " + "Other. " * 20
+
+
+def test_window_starts_lead_characters_before_the_first_term():
+    offset, length, text = run_window({"text": LONG_TEXT}, "maximum speed")
+    first = LONG_TEXT.find("Maximum")
+    assert (offset, length) == (first - 10, len(LONG_TEXT))
+    assert text == LONG_TEXT[offset:offset + 100]
+
+def test_window_never_runs_past_the_end():
+    offset, _, text = run_window({"text": LONG_TEXT}, "other")
+    assert offset == LONG_TEXT.find("Other") - 10
+    offset, _, text = run_window({"text": LONG_TEXT + "zebra"}, "zebra")
+    assert offset == len(LONG_TEXT) + 5 - 100 and text.endswith("zebra") and len(text) == 100
+
+@pytest.mark.parametrize("query", ["", "no such words", None])
+def test_window_without_a_match_is_the_start(query):
+    offset, _, text = run_window({"text": LONG_TEXT}, query)
+    assert offset == 0 and text == LONG_TEXT[:100]
+
+def test_short_texts_come_back_whole():
+    assert run_window({"text": "Class 3 track speed."}, "speed") == (0, 20, "Class 3 track speed.")
+    assert run_window({}, "speed") == (0, 0, "")
+
+def test_window_reads_the_compact_text_field():
+    stage, text_expression = text_window(CompactLayout(sources=None), "speed")
+    assert text_expression['$substrCP'][0] == {"$ifNull": ["$t", ""]}
+
+
+def test_snippet_highlights_the_densest_window():
+    text = "speed " + "filler words here. " * 30 + "Maximum speed for Class 3 track." + " more" * 40
+    result = snippet({"text": text}, "maximum speed class track", width=80)
+    assert "**Maximum** **speed** for **Class** 3 **track**" in result
+    assert result.startswith("…") and result.endswith("…")
+
+def test_snippet_marks_a_server_side_cut():
+    doc = {"text": "the speed limit applies", "text_offset": 500, "text_length": 2000}
+    assert snippet(doc, "speed") == "…the **speed** limit applies…"
+    assert snippet({"text": "the speed limit applies"}, "speed") == "the **speed** limit applies"
+
+def test_snippet_without_terms_is_the_start():
+    assert snippet({"text": "one two\nthree"}, "") == "one two three"
+    assert snippet({"text": "a " * 200}, "", width=10).endswith("…")
+
+def test_terms_match_whole_words_only():
+    pattern = term_pattern("rail speed")
+    assert [match.group(0) for match in pattern.finditer("Railroad speed, rail speedometer")] == ["speed", "rail"]
+    assert term_pattern("the of") is None
+
+def test_best_window_prefers_more_distinct_terms():
+    pattern = term_pattern("brake test")
+    text = "brake brake brake " + "x" * 100 + " brake test"
+    assert best_window(list(pattern.finditer(text)), 20) == text.rindex("brake test")
+
+def test_trim_hits():
+    hits = [{"text": "air brake test", "text_offset": 0, "text_length": 14, "score": 0.9}]
+    assert trim_hits(hits, "brake") == [{"snippet": "air **brake** test", "score": 0.9}]
+    assert trim_hits(hits, "brake", full_text=True) is hits
@@ -0,0 +1,39 @@
+import json
+import os
+
+from railnology_ingest.sources import RulebookSource, load_rulebook_registry
+
+
+def write_config(directory, filename, **rule_data):
+    with open(os.path.join(directory, filename), 'w', encoding='utf-8') as file:
+        json.dump(rule_data, file)
+
+def rulebook(system_name, **extra):
+    return {"system_name": system_name, "title": f"{system_name} rules", "effective_date": "2025-01-01",
+            "pdf_path": f"pdfs/{system_name}.pdf", **extra}
+
+
+def test_registry_loads_enabled_and_complete_rulebooks(tmp_path):
+    write_config(tmp_path, "cror.json", **rulebook("CROR"))
+    write_config(tmp_path, "norac.json", **rulebook("NORAC", enabled=False))
+    write_config(tmp_path, "timetable.json", **rulebook("UP-TT", pdf_path="/srv/rulebooks/up.pdf"))
+    write_config(tmp_path, "broken.json", **{k: v for k, v in rulebook("BNSF").items() if k != "effective_date"})
+    (tmp_path / "notes.json").write_text("{not json")
+
+    rulebooks = load_rulebook_registry(str(tmp_path))
+    assert [rule['system_name'] for rule in rulebooks] == ["CROR", "UP-TT"]
+    # Relative PDF paths are resolved against the registry, absolute ones kept
+    assert rulebooks[0]['pdf_path'] == os.path.join(str(tmp_path), "pdfs", "CROR.pdf")
+    assert rulebooks[1]['pdf_path'] == "/srv/rulebooks/up.pdf"
+
+def test_missing_registry_yields_no_jobs(tmp_path):
+    assert load_rulebook_registry(str(tmp_path / "missing")) == []
+    assert list(RulebookSource(str(tmp_path / "missing")).jobs()) == []
+
+def test_one_job_per_rulebook_scoped_to_its_rule_system(tmp_path):
+    write_config(tmp_path, "cror.json", **rulebook("CROR"))
+    write_config(tmp_path, "gcor.json", **rulebook("GCOR"))
+
+    jobs = list(RulebookSource(str(tmp_path)).jobs())
+    assert [job.name for job in jobs] == ["CROR", "GCOR"]
+    assert [job.delete_filter for job in jobs] == [{"rule_system": "CROR"}, {"rule_system": "GCOR"}]
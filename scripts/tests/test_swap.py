@@ -0,0 +1,122 @@
+import pytest
+
+pytest.importorskip("pymongo")
+
+from railnology_ingest import swap
+from railnology_ingest.config import ALIAS_COLLECTION_NAME, COLLECTION_NAME
+from railnology_ingest.swap import (
+    collection_layout, collection_model, current_index_generation, record_collection_layout, record_collection_model,
+    resolve_active_collection_name, rollback_active_collection, swap_active_collection,
+)
+
+
+class AliasCollection:
+    """The update operators swap.py uses on collection_aliases, on documents held in memory."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[query["_id"]] = {"_id": query["_id"]}
+        for path, value in update.get("$set", {}).items():
+            *parents, key = path.split(".")
+            target = doc
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[key] = value
+        for path in update.get("$unset", {}):
+            parent, key = path.split(".")
+            doc.get(parent, {}).pop(key, None)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+        for key, value in update.get("$push", {}).items():
+            doc.setdefault(key, []).append(value)
+        for key, condition in update.get("$pull", {}).items():
+            doc[key] = [item for item in doc.get(key, []) if item not in condition["$in"]]
+        for key, end in update.get("$pop", {}).items():
+            doc[key] = doc[key][:-1] if end == 1 else doc[key][1:]
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        self.update_one(query, update, upsert)
+        return self.docs[query["_id"]]
+
+class Collection:
+    def __init__(self, count=0):
+        self.count = count
+
+    def count_documents(self, query, limit=None):
+        return self.count
+
+class FakeDb(dict):
+    def __init__(self, *names):
+        super().__init__({ALIAS_COLLECTION_NAME: AliasCollection()})
+        for name in names:
+            self[name] = Collection(count=10)
+        self.dropped = []
+
+    def __missing__(self, name):
+        return Collection()
+
+    def drop_collection(self, name):
+        self.dropped.append(name)
+        self.pop(name, None)
+
+def history(db):
+    return db[ALIAS_COLLECTION_NAME].docs[COLLECTION_NAME].get('history', [])
+
+
+def test_the_alias_resolves_to_itself_until_the_first_swap():
+    db = FakeDb()
+    assert resolve_active_collection_name(db) == COLLECTION_NAME
+    assert current_index_generation(db) == 0
+
+def test_swaps_keep_only_the_rollback_window(monkeypatch):
+    monkeypatch.setattr(swap, "KEEP_GENERATIONS", 2)
+    db = FakeDb(COLLECTION_NAME, "gen_1", "gen_2", "gen_3")
+    for name in ("gen_1", "gen_2"):
+        swap_active_collection(db, name)
+        record_collection_model(db, name, "model-a", 1536)
+    assert resolve_active_collection_name(db) == "gen_2"
+    assert history(db) == [COLLECTION_NAME, "gen_1"]
+
+    swap_active_collection(db, "gen_3")
+    assert history(db) == ["gen_1", "gen_2"]
+    # The original collection is never dropped; gen_1 is still within the window
+    assert db.dropped == []
+
+    swap_active_collection(db, "gen_4")
+    assert history(db) == ["gen_2", "gen_3"] and db.dropped == ["gen_1"]
+    assert collection_model(db, "gen_1") is None and collection_model(db, "gen_2")['model'] == "model-a"
+
+def test_rollback_repoints_the_alias_and_invalidates_caches():
+    db = FakeDb("gen_1", "gen_2")
+    swap_active_collection(db, "gen_1")
+    swap_active_collection(db, "gen_2")
+
+    assert rollback_active_collection(db)
+    assert resolve_active_collection_name(db) == "gen_1"
+    assert history(db) == [COLLECTION_NAME] and current_index_generation(db) == 1
+
+    assert rollback_active_collection(db)
+    assert resolve_active_collection_name(db) == COLLECTION_NAME
+    # Nothing left: the caller exits non-zero
+    assert not rollback_active_collection(db)
+
+def test_models_and_layouts_are_recorded_per_generation():
+    db = FakeDb(COLLECTION_NAME)
+    # Built before models were recorded: assumed to be the configured model
+    assert collection_model(db)['model'] == swap.EMBEDDING_MODEL
+    assert collection_model(db, "empty_generation") is None
+
+    record_collection_model(db, "gen_1", "local-minilm", 384)
+    record_collection_layout(db, "gen_1", "compact")
+    swap_active_collection(db, "gen_1")
+    assert collection_model(db)['dimensions'] == 384
+    assert collection_layout(db) == "compact" and collection_layout(db, COLLECTION_NAME) is None
@@ -0,0 +1,61 @@
+import pytest
+
+from railnology_ingest import tokens
+from railnology_ingest.chunking import CharacterChunker, split_to_token_limit
+from railnology_ingest.embedding import pack_batches
+from railnology_ingest.tokens import FALLBACK_CHARS_PER_TOKEN, count_tokens, tokenizer_name
+
+
+class WordEncoding:
+    """Stands in for a tiktoken encoding: one token per word."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+@pytest.fixture
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", WordEncoding())
+    monkeypatch.setattr(tokens, "_encoding_loaded", True)
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", None)
+    monkeypatch.setattr(tokens, "_encoding_loaded", True)
+
+
+def test_count_tokens_uses_the_encoding(word_tokens):
+    assert count_tokens("Trains must stop short of a red signal.") == 8
+    assert tokenizer_name() == tokens.TOKENIZER_ENCODING
+
+def test_count_tokens_estimate_rounds_up(estimated_tokens):
+    assert count_tokens("x" * (FALLBACK_CHARS_PER_TOKEN * 10 + 1)) == 11
+    assert tokenizer_name() == f"estimate-{FALLBACK_CHARS_PER_TOKEN}cpt"
+
+def test_split_to_token_limit_keeps_sentences_under_the_budget(word_tokens):
+    text = " ".join(f"Sentence {i} has exactly six words." for i in range(40))
+    pieces = split_to_token_limit(text, max_tokens=25)
+
+    assert all(count_tokens(piece) <= 25 for piece in pieces)
+    assert all(piece.endswith(".") for piece in pieces)
+    assert " ".join(pieces) == text
+    assert split_to_token_limit("Short enough.", max_tokens=25) == ["Short enough."]
+
+def test_dense_text_is_re_split_until_it_fits(word_tokens):
+    # Short words: the first character estimate is far too generous
+    text = "Intro words that are long enough to skew things. " + "a b c d e f g h i j. " * 10
+    assert all(count_tokens(piece) <= 12 for piece in split_to_token_limit(text.strip(), max_tokens=12))
+
+def test_character_chunker(word_tokens):
+    record = {"document_type": "Operating Rule", "rule_text": "One. Two three. Four five six."}
+    assert CharacterChunker().chunk(record) == [record['rule_text']]
+    pieces = CharacterChunker(max_tokens=3).chunk(record)
+    assert " ".join(pieces) == record['rule_text'] and all(count_tokens(piece) <= 3 for piece in pieces)
+    assert CharacterChunker().chunk({"document_type": "Regulation", "text": ""}) == []
+
+def test_pack_batches_respects_both_caps():
+    items = list("abcdefg")
+    assert pack_batches(items, [1] * 7, max_inputs=3, max_tokens=100) == [["a", "b", "c"], ["d", "e", "f"], ["g"]]
+    assert pack_batches(items, [40, 40, 30, 90, 10, 5, 200], max_inputs=10, max_tokens=100) == [
+        ["a", "b"], ["c"], ["d", "e"], ["f"], ["g"],
+    ]
+    assert pack_batches([], []) == []
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+from railnology_ingest.changes import section_hash
+from railnology_ingest.versions import ecfr_datetime, section_versions, stamp_versions
+
+
+def part_213(**sections):
+    return [{"document_type": "Regulation", "part": 213, "section_id": section_id.replace("_", "."), "text": text}
+            for section_id, text in sections.items()]
+
+
+def test_ecfr_datetime():
+    assert ecfr_datetime("2024-03-01") == datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+def test_stamp_versions_hashes_whole_sections():
+    records = part_213(**{"213_9": "(a) Ten mph."}) + part_213(**{"213_9": "(b) Twenty-five mph."})
+    stamp_versions(records, "2024-03-01")
+    assert {record['content_hash'] for record in records} == {section_hash("(a) Ten mph.\n(b) Twenty-five mph.")}
+    assert {record['valid_from'] for record in records} == {datetime(2024, 3, 1, tzinfo=timezone.utc)}
+
+def test_section_versions_fold_unchanged_dates():
+    versions = section_versions([
+        ("2019-01-01", part_213(**{"213_9": "Ten mph.", "213_11": "Restoration."})),
+        # Reflowed only: the same version
+        ("2020-06-01", part_213(**{"213_9": "Ten  mph.", "213_11": "Restoration."})),
+        ("2022-02-01", part_213(**{"213_9": "Fifteen mph.", "213_11": "Restoration."})),
+        ("2024-03-01", part_213(**{"213_9": "Fifteen mph."})),
+    ])
+
+    assert [(v['section_id'], v['text'], v['valid_from'], v['valid_to']) for v in versions] == [
+        ("213.9", "Ten mph.", "2019-01-01", "2022-02-01"),
+        ("213.11", "Restoration.", "2019-01-01", "2024-03-01"),
+        ("213.9", "Fifteen mph.", "2022-02-01", None),
+    ]
+    assert versions[2]['content_hash'] == section_hash("Fifteen mph.") and versions[2]['part'] == 213
+
+def test_a_removed_section_that_returns_opens_a_new_version():
+    versions = section_versions([
+        ("2019-01-01", part_213(**{"213_9": "Ten mph."})),
+        ("2020-01-01", []),
+        ("2021-01-01", part_213(**{"213_9": "Ten mph."})),
+    ])
+    assert [(v['valid_from'], v['valid_to']) for v in versions] == [("2019-01-01", "2020-01-01"), ("2021-01-01", None)]
@@ -29,7 +29,18 @@ const IS_QA_ENV = NODE_ENV === 'qa';
 // Database switching: Uses 'railnology_qa' database if NODE_ENV is set to 'qa'
 const DB_NAME = IS_QA_ENV ? "railnology_qa" : "railnology"; 
 const COLLECTION_KNOWLEDGE = "knowledge_chunks"; // Correct collection name
+// Blue/green rebuilds (rail_data_scraper.py --swap) repoint this alias instead of rewriting in place
+const COLLECTION_ALIASES = "collection_aliases";
+const ALIAS_CACHE_MS = 30000;
 const VECTOR_INDEX_NAME = "default"; 
+// Pre-filter inside $vectorSearch once the index declares the filter fields
+// (python -m railnology_ingest index-definition --apply); otherwise filter afterwards with $match
+const VECTOR_PREFILTER = process.env.VECTOR_PREFILTER === '1';
+const RETRIEVAL_CACHE_SIZE = Number(process.env.RETRIEVAL_CACHE_SIZE || 1000);
+// Regulation hits per CFR part and day; the ingestion scheduler refreshes often-queried parts sooner
+const COLLECTION_QUERY_STATS = "regulation_query_stats";
+// Compact chunk layout (railnology_ingest layout.py): short field names, source strings stored once per source
+const COLLECTION_KNOWLEDGE_SOURCES = "knowledge_sources";
 
 // Global list of authorized QA team emails (Load from ENV in production)
 const QA_TEAM_EMAILS = [
@@ -85,6 +96,85 @@ if (MONGO_URI) {
 
 const api = express.Router();
 
+// Resolves the physical collection currently serving knowledge_chunks (cached briefly)
+let knowledgeAliasCache = { name: COLLECTION_KNOWLEDGE, expiresAt: 0 };
+
+let knowledgeGeneration = 0;
+
+// Query vectors must come from the model that built the active generation (recorded per collection by ingestion)
+const DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small";
+let knowledgeEmbeddingModel = DEFAULT_EMBEDDING_MODEL;
+
+// "legacy" or "compact", recorded per collection by ingestion (python -m railnology_ingest migrate)
+let knowledgeLayout = "legacy";
+
+async function getKnowledgeCollectionName() {
+  if (Date.now() < knowledgeAliasCache.expiresAt) return knowledgeAliasCache.name;
+  try {
+    const alias = await db.collection(COLLECTION_ALIASES).findOne({ _id: COLLECTION_KNOWLEDGE });
+    knowledgeAliasCache = { name: (alias && alias.target) || COLLECTION_KNOWLEDGE, expiresAt: Date.now() + ALIAS_CACHE_MS };
+    const recorded = alias && alias.models && alias.models[knowledgeAliasCache.name];
+    knowledgeEmbeddingModel = (recorded && recorded.model) || DEFAULT_EMBEDDING_MODEL;
+    knowledgeLayout = (alias && alias.layouts && alias.layouts[knowledgeAliasCache.name]) || "legacy";
+    // Every ingestion run bumps the generation (railnology_ingest swap.bump_index_generation)
+    const generation = (alias && alias.generation) || 0;
+    if (generation !== knowledgeGeneration) {
+      knowledgeGeneration = generation;
+      retrievalCache.clear();
+    }
+  } catch (e) {
+    console.error("⚠️ Alias lookup failed, using last known collection:", e.message);
+  }
+  return knowledgeAliasCache.name;
+}
+
+// Source documents of compact chunks (a few hundred, they never change under an id)
+const knowledgeSourceCache = new Map();
+
+// Compact hits back to the legacy shape the answer code reads: t -> text, sid -> section_id, src -> title/doc_type
+async function decodeCompactHits(results) {
+  const missing = [...new Set(results.map(doc => doc.src))].filter(id => id && !knowledgeSourceCache.has(id));
+  if (missing.length > 0) {
+    const sources = await db.collection(COLLECTION_KNOWLEDGE_SOURCES)
+      .find({ _id: { $in: missing } }, { projection: { title: 1, doc_type: 1 } }).toArray();
+    sources.forEach(source => knowledgeSourceCache.set(source._id, source));
+  }
+  return results.map(({ t, sid, src, ...doc }) => {
+    const source = knowledgeSourceCache.get(src) || {};
+    return { ...doc, section_id: sid, text: t, title: source.title, doc_type: source.doc_type };
+  });
+}
+
+// Retrieval results of recent questions, keyed on normalized query + domain + index generation
+const retrievalCache = new Map();
+
+function normalizeQuery(text) {
+  return String(text || "").toLowerCase().replace(/\s+/g, " ").replace(/[\s?.!]+$/, "").trim();
+}
+
+async function getRetrievalCacheKey(query, filterDomain) {
+  await getKnowledgeCollectionName();
+  return `${knowledgeGeneration}|${filterDomain || ""}|${normalizeQuery(query)}`;
+}
+
+function cacheRetrieval(key, results) {
+  if (!results || results.length === 0) return;
+  retrievalCache.set(key, results);
+  if (retrievalCache.size > RETRIEVAL_CACHE_SIZE) {
+    retrievalCache.delete(retrievalCache.keys().next().value);
+  }
+}
+
+function recordRegulationHits(results) {
+  const parts = [...new Set(results.filter(doc => doc.document_type === "Regulation" && doc.part).map(doc => doc.part))];
+  if (parts.length === 0) return;
+  const day = new Date().toISOString().slice(0, 10);
+  // Not awaited: counting must never slow down or fail an answer
+  db.collection(COLLECTION_QUERY_STATS).bulkWrite(parts.map(part => ({
+    updateOne: { filter: { _id: `${part}:${day}` }, update: { $inc: { hits: 1 }, $setOnInsert: { part, day } }, upsert: true }
+  })), { ordered: false }).catch(e => console.error("⚠️ Query stats update failed:", e.message));
+}
+
 async function getEmbedding(text) {
   // CRITICAL CHECK: Ensure OpenAI object exists before calling it
   if (!openai) {
@@ -92,9 +182,15 @@ async function getEmbedding(text) {
       return [];
   }
   
+  if (!knowledgeEmbeddingModel.startsWith("text-embedding-")) {
+      // Local/offline generations can only be queried from the Python tooling
+      console.error(`❌ getEmbedding Failed: active knowledge generation uses ${knowledgeEmbeddingModel}, not an OpenAI model.`);
+      return [];
+  }
+
   try {
     const response = await openai.embeddings.create({
-      model: "text-embedding-3-small",
+      model: knowledgeEmbeddingModel,
       input: text.replace(/\n/g, " "),
     });
     return response.data[0].embedding;
@@ -162,83 +258,102 @@ api.post('/chat', async (req, res) => {
     // 4. PERFORM PURE VECTOR SEARCH (Stable Production RAG)
     console.log(`🔍 Raillie Processing: "${query}" (Domain: ${filterDomain || 'All'}) (User: ${user.email})`);
     
-    const queryVector = await getEmbedding(query);
+    // Repeat questions skip the embedding call and $vectorSearch until the next ingestion run
+    const retrievalKey = await getRetrievalCacheKey(query, filterDomain);
+    let results = retrievalCache.get(retrievalKey);
+    if (results) {
+        // Refresh LRU position
+        retrievalCache.delete(retrievalKey);
+        retrievalCache.set(retrievalKey, results);
+        console.log(`⚡ Retrieval cache hit: ${results.length} chunks.`);
+    } else {
+        const queryVector = await getEmbedding(query);
     
-    // --- CRITICAL DEBUG CHECK ---
-    if (!queryVector || queryVector.length === 0) {
-        console.log("❌ RAG ABORTED: Query vector is empty. Check OpenAI API key or network connection.");
-        // This clean return prevents the downstream MongoDB call from crashing the server
-        return res.status(200).json({ 
-            answer: "Error: Could not process query vector. Please check the backend connection or API key.", 
-            sources: [] 
-        });
-    }
-    // ----------------------------
+        // --- CRITICAL DEBUG CHECK ---
+        if (!queryVector || queryVector.length === 0) {
+            console.log("❌ RAG ABORTED: Query vector is empty. Check OpenAI API key or network connection.");
+            // This clean return prevents the downstream MongoDB call from crashing the server
+            return res.status(200).json({ 
+                answer: "Error: Could not process query vector. Please check the backend connection or API key.", 
+                sources: [] 
+            });
+        }
+        // ----------------------------
     
-    // Check if database connection is available before trying to query
-    if (!db) {
-         console.error("❌ RAG ABORTED: Database connection is not available.");
-         return res.status(200).json({ 
-            answer: "Error: Database connection is unavailable. Cannot perform vector search.", 
-            sources: [] 
-        });
-    }
+        // Check if database connection is available before trying to query
+        if (!db) {
+             console.error("❌ RAG ABORTED: Database connection is not available.");
+             return res.status(200).json({ 
+                answer: "Error: Database connection is unavailable. Cannot perform vector search.", 
+                sources: [] 
+            });
+        }
 
 
-    const collection = db.collection(COLLECTION_KNOWLEDGE); 
+        const collection = db.collection(await getKnowledgeCollectionName()); 
     
-    const pipeline = [];
-    let domainFilter = {};
-
-    // Determine the required filter logic for the $match stage (post vector search)
-    if (filterDomain) {
-        if (String(filterDomain).match(/^\d+$/)) { 
-            // CFR PART filter (e.g., filterDomain = "213")
-            domainFilter = { "document_type": "Regulation", "part": { "$eq": Number(filterDomain) } };
-        } else if (filterDomain === "GCOR" || filterDomain === "NORAC") {
-            // Operating Rule System filter
-            domainFilter = { "document_type": "Operating Rule", "rule_system": { "$eq": filterDomain } };
-        } else if (filterDomain === "ADVISORY") {
-            // FRA Guidance filter
-            domainFilter = { "document_type": "Safety Guidance", "source": "FRA" };
+        const pipeline = [];
+        let domainFilter = {};
+
+        // Determine the required filter logic for the $match stage (post vector search)
+        if (filterDomain) {
+            if (String(filterDomain).match(/^\d+$/)) { 
+                // CFR PART filter (e.g., filterDomain = "213")
+                domainFilter = { "document_type": { "$eq": "Regulation" }, "part": { "$eq": Number(filterDomain) } };
+            } else if (filterDomain === "ADVISORY") {
+                // FRA Guidance filter
+                domainFilter = { "document_type": { "$eq": "Safety Guidance" }, "source": { "$eq": "FRA" } };
+            } else {
+                // Operating Rule System filter: any rulebook in the registry (scripts/rulebooks), e.g. "GCOR", "NORAC"
+                domainFilter = { "document_type": { "$eq": "Operating Rule" }, "rule_system": { "$eq": String(filterDomain) } };
+            }
         }
-    }
     
-    // A. Vector Search Step (Semantic Search)
-    pipeline.push({
-      "$vectorSearch": {
-        "index": VECTOR_INDEX_NAME,
-        "path": "embedding",
-        "queryVector": queryVector,
-        // Reduced pool for speed and stability
-        "numCandidates": 10, 
-        "limit": 5, // Find 5 candidates based on vector search
-        // NOTE: The $filter stage is REMOVED to avoid the index crash.
-      }
-    });
+        // A. Vector Search Step (Semantic Search)
+        pipeline.push({
+          "$vectorSearch": {
+            "index": VECTOR_INDEX_NAME,
+            "path": "embedding",
+            "queryVector": queryVector,
+            // Reduced pool for speed and stability
+            "numCandidates": 10, 
+            "limit": 5, // Find 5 candidates based on vector search
+            // NOTE: The filter clause needs the fields declared in the index, see VECTOR_PREFILTER.
+            ...(VECTOR_PREFILTER && Object.keys(domainFilter).length > 0 ? { "filter": domainFilter } : {}),
+          }
+        });
     
-    // B. Filtering Stage (REINTRODUCED AS $MATCH)
-    // Only apply the match filter if a specific domain was requested.
-    if (Object.keys(domainFilter).length > 0) {
-        pipeline.push({ "$match": domainFilter });
-    }
-
-    // C. Final Projection
-    // Final limit after matching (ensures we only pass 3 relevant chunks to the LLM)
-    pipeline.push({ "$limit": 3 }); 
+        // B. Filtering Stage (REINTRODUCED AS $MATCH)
+        // Only apply the match filter if a specific domain was requested and the index did not pre-filter.
+        if (!VECTOR_PREFILTER && Object.keys(domainFilter).length > 0) {
+            pipeline.push({ "$match": domainFilter });
+        }
 
-    pipeline.push({
-      "$project": {
-        "_id": 0, "part": 1, "section_id": 1, "text": 1, "title": 1, "document_type": 1, "rule_system": 1, "doc_type": 1,
-        "score": { "$meta": "vectorSearchScore" }
-      }
-    });
+        // C. Final Projection
+        // Final limit after matching (ensures we only pass 3 relevant chunks to the LLM)
+        pipeline.push({ "$limit": 3 }); 
+
+        const compact = knowledgeLayout === "compact";
+        pipeline.push({
+          "$project": compact ? {
+            "_id": 0, "part": 1, "sid": 1, "t": 1, "src": 1, "document_type": 1, "rule_system": 1,
+            "score": { "$meta": "vectorSearchScore" }
+          } : {
+            "_id": 0, "part": 1, "section_id": 1, "text": 1, "title": 1, "document_type": 1, "rule_system": 1, "doc_type": 1,
+            "score": { "$meta": "vectorSearchScore" }
+          }
+        });
     
-    // Using standard aggregate without maxTimeMS override for Production stability
-    const results = await collection.aggregate(pipeline).toArray();
+        // Using standard aggregate without maxTimeMS override for Production stability
+        results = await collection.aggregate(pipeline).toArray();
+        if (compact) results = await decodeCompactHits(results);
     
-    // DEBUG LOGGING: Log the result count to diagnose RAG failures
-    console.log(`🔎 MongoDB Vector Search Results Found: ${results.length} chunks.`);
+        // DEBUG LOGGING: Log the result count to diagnose RAG failures
+        console.log(`🔎 MongoDB Vector Search Results Found: ${results.length} chunks.`);
+        cacheRetrieval(retrievalKey, results);
+    }
+
+    if (results.length > 0) recordRegulationHits(results);
 
     // --- 5. GENERATE ANSWER ---
     let sources = [];
@@ -371,17 +486,20 @@ api.get('/diag/db', async (req, res) => {
         // List all collection names in the current connected database
         const collections = await db.listCollections().toArray();
         const collectionNames = collections.map(c => c.name);
-        const knowledgeCollectionExists = collectionNames.includes(COLLECTION_KNOWLEDGE);
+        const activeKnowledgeCollection = await getKnowledgeCollectionName();
+        const knowledgeCollectionExists = collectionNames.includes(activeKnowledgeCollection);
 
         let knowledgeCount = 0;
         if (knowledgeCollectionExists) {
-            knowledgeCount = await db.collection(COLLECTION_KNOWLEDGE).countDocuments({});
+            knowledgeCount = await db.collection(activeKnowledgeCollection).countDocuments({});
         }
 
         res.json({
             status: "OK",
             db_name: DB_NAME,
             expected_knowledge_collection: COLLECTION_KNOWLEDGE,
+            active_knowledge_collection: activeKnowledgeCollection,
+            knowledge_embedding_model: knowledgeEmbeddingModel,
             knowledge_collection_exists: knowledgeCollectionExists,
             knowledge_document_count: knowledgeCount,
             all_collections_found: collectionNames,